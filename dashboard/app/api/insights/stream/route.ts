@@ -0,0 +1,78 @@
+import { getInsightsBrief, getTimelineEvents } from "@/lib/insights";
+
+export const dynamic = "force-dynamic";
+
+const PUSH_INTERVAL_MS = 700;
+const KEEPALIVE_MS = 2000;
+
+// Server-sent events: pushes { brief, event } whenever the fused brief changes,
+// with a comment heartbeat so subscribers can tell "unchanged" from "stalled".
+export async function GET(req: Request) {
+  const encoder = new TextEncoder();
+  let timer: ReturnType<typeof setInterval> | null = null;
+
+  const stop = () => {
+    if (timer) clearInterval(timer);
+    timer = null;
+  };
+
+  const stream = new ReadableStream<Uint8Array>({
+    start(controller) {
+      let lastKey = "";
+      let lastSentAt = 0;
+      let busy = false;
+
+      const send = (chunk: string) => {
+        try {
+          controller.enqueue(encoder.encode(chunk));
+          lastSentAt = Date.now();
+        } catch {
+          stop();
+        }
+      };
+
+      const tick = async () => {
+        if (busy) return;
+        busy = true;
+        try {
+          const [brief, events] = await Promise.all([getInsightsBrief(), getTimelineEvents(1)]);
+          const event = events[0] ?? null;
+          // brief.timestamp changes every fusion tick, so it is sent but not compared
+          const key = JSON.stringify({ brief: { ...brief, timestamp: undefined }, event });
+          if (key !== lastKey) {
+            lastKey = key;
+            send(`data: ${JSON.stringify({ brief, event })}\n\n`);
+          } else if (Date.now() - lastSentAt >= KEEPALIVE_MS) {
+            send(": keepalive\n\n");
+          }
+        } catch {
+          // Fusion failed this tick; subscribers flag the snapshot stale on their own
+        } finally {
+          busy = false;
+        }
+      };
+
+      void tick();
+      timer = setInterval(tick, PUSH_INTERVAL_MS);
+      req.signal.addEventListener("abort", () => {
+        stop();
+        try {
+          controller.close();
+        } catch {
+          // already closed
+        }
+      });
+    },
+    cancel() {
+      stop();
+    },
+  });
+
+  return new Response(stream, {
+    headers: {
+      "Content-Type": "text/event-stream",
+      "Cache-Control": "no-cache, no-transform",
+      Connection: "keep-alive",
+    },
+  });
+}
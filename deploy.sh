@@ -22,6 +22,7 @@ ORANGEPI_START_CMD="${ORANGEPI_START_CMD:-cd ~/voice-assistant && source ~/voice
 deploy_jetson() {
   echo ">> Deploying jetson/stream.py → Jetson"
   scp $SSH_OPTS "$DIR/jetson/stream.py" "$JETSON_SSH:$JETSON_REMOTE_FILE"
+  scp $SSH_OPTS "$DIR/jetson/bench_depth.py" "$JETSON_SSH:$(dirname "$JETSON_REMOTE_FILE")/"
   echo "   Restarting stream.py..."
   ssh $SSH_OPTS "$JETSON_SSH" "$JETSON_STOP_CMD"
   sleep 1
@@ -33,6 +34,7 @@ deploy_spark() {
   echo ">> Deploying spark/spark_server.py → Spark"
   scp $SSH_OPTS "$DIR/spark/spark_server.py" "$SPARK_SSH:$SPARK_REMOTE_FILE"
   scp $SSH_OPTS "$DIR/spark/start_vllm.sh" "$SPARK_SSH:~/cam-inference/start_vllm.sh"
+  scp $SSH_OPTS "$DIR/spark/bench_detector.py" "$DIR/spark/eval_cascade.py" "$SPARK_SSH:~/cam-inference/"
   ssh $SSH_OPTS "$SPARK_SSH" "chmod +x ~/cam-inference/start_vllm.sh"
   echo "   Restarting spark_server.py (vLLM containers are NOT restarted)..."
   ssh $SSH_OPTS "$SPARK_SSH" "$SPARK_STOP_CMD"
@@ -44,6 +46,10 @@ deploy_spark() {
 deploy_orangepi() {
   echo ">> Deploying orangepi/voice_server.py → Orange Pi"
   scp $SSH_OPTS "$DIR/orangepi/voice_server.py" "$ORANGEPI_SSH:$ORANGEPI_REMOTE_FILE"
+  scp $SSH_OPTS "$DIR/orangepi/eval_intents.py" "$DIR/orangepi/intent_corpus.tsv" "$DIR/orangepi/bench_startup.py" \
+    "$DIR/orangepi/bench_voice.py" "$DIR/orangepi/voice_corpus.tsv" "$DIR/orangepi/bench_stt.py" \
+    "$DIR/orangepi/bench_barge_in.py" \
+    "$ORANGEPI_SSH:$(dirname "$ORANGEPI_REMOTE_FILE")/"
   echo "   Restarting voice_server.py..."
   ssh $SSH_OPTS "$ORANGEPI_SSH" "$ORANGEPI_STOP_CMD"
   sleep 1
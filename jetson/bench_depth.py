@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Depth lookup benchmark: full-frame rs.align vs stream.py's ROI-only mapping.
+
+Replays recorded D435 color/depth pairs (a .bag file) without real-time
+pacing, so both methods see exactly the same frames. Per frame it times:
+  align    rs.align(color).process() + median depth under each box
+  roi      stream.box_depths() on the raw depth frame
+  filters  the DEPTH_FILTERS chain, which stream.py runs off the hot path
+           at DEPTH_FILTER_HZ (its amortized cost per frame is reported)
+
+Boxes come from YOLO on the color frame with --model (which also gives the
+sustained FPS each method allows next to inference), else from a fixed grid
+of --boxes person-sized boxes. Agreement is the median |align - roi| over
+boxes where both found depth.
+
+Record a bag on the Jetson (stop stream.py first, it holds the camera):
+  python3 bench_depth.py --record pairs.bag --seconds 15
+Replay it (same venv as stream.py):
+  python3 bench_depth.py pairs.bag [--model yolo11s.engine] [--filters decimation,spatial,hole_filling]
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pyrealsense2 as rs
+
+import stream
+
+
+def record(path, seconds):
+    pipeline = rs.pipeline()
+    config = rs.config()
+    config.enable_stream(rs.stream.color, 640, 480, rs.format.bgr8, 30)
+    config.enable_stream(rs.stream.depth, 640, 480, rs.format.z16, 30)
+    config.enable_record_to_file(path)
+    pipeline.start(config)
+    print(f"Recording {seconds:g}s to {path}")
+    try:
+        t_end = time.time() + seconds
+        while time.time() < t_end:
+            pipeline.wait_for_frames()
+    finally:
+        pipeline.stop()
+
+
+def grid_boxes(n, width=640, height=480):
+    cols = max(1, int(np.ceil(np.sqrt(n))))
+    bw, bh = width // (cols + 1), int(height * 0.6)
+    return [[int(width * (i + 1) / (cols + 1) - bw / 2), int(height * 0.2),
+             int(width * (i + 1) / (cols + 1) + bw / 2), int(height * 0.2) + bh] for i in range(n)]
+
+
+def aligned_depths(depth, depth_scale, boxes):
+    """Same ROI and statistic as stream.box_depths, read from an aligned depth image."""
+    out = []
+    for x1, y1, x2, y2 in boxes:
+        mx, my = (x2 - x1) * (1 - stream.DEPTH_ROI_FRAC) / 2, (y2 - y1) * (1 - stream.DEPTH_ROI_FRAC) / 2
+        z = depth[int(y1 + my):int(np.ceil(y2 - my)) + 1, int(x1 + mx):int(np.ceil(x2 - mx)) + 1] * depth_scale
+        z = z[(z > stream.DEPTH_MIN_M) & (z < stream.DEPTH_MAX_M)]
+        out.append(float(np.median(z)) if z.size else 0.0)
+    return out
+
+
+def pct(values, p):
+    return float(np.percentile(values, p)) if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="rs.align vs ROI-only depth benchmark")
+    parser.add_argument("bag", nargs="?", help="recorded color/depth .bag to replay")
+    parser.add_argument("--record", help="record a new bag to this path instead")
+    parser.add_argument("--seconds", type=float, default=15.0, help="recording length")
+    parser.add_argument("--model", help="YOLO weights/engine for real boxes (default: fixed grid)")
+    parser.add_argument("--boxes", type=int, default=3, help="grid boxes per frame without --model")
+    parser.add_argument("--filters", default="decimation,spatial,hole_filling", help="chain to time ('' for none)")
+    parser.add_argument("--filter-hz", type=float, default=stream.DEPTH_FILTER_HZ)
+    parser.add_argument("--frames", type=int, default=0, help="stop after this many frames")
+    args = parser.parse_args()
+
+    if args.record:
+        record(args.record, args.seconds)
+        return
+    if not args.bag:
+        parser.error("give a .bag to replay, or --record")
+
+    pipeline = rs.pipeline()
+    config = rs.config()
+    rs.config.enable_device_from_file(config, args.bag, repeat_playback=False)
+    profile = pipeline.start(config)
+    profile.get_device().as_playback().set_real_time(False)
+    depth_profile = profile.get_stream(rs.stream.depth)
+    color_profile = profile.get_stream(rs.stream.color)
+    depth_scale = profile.get_device().first_depth_sensor().get_depth_scale()
+    d_intr = stream.intrinsics_of(depth_profile)
+    c_intr = stream.intrinsics_of(color_profile)
+    d2c = stream.extrinsics_of(depth_profile, color_profile)
+    align = rs.align(rs.stream.color)
+    apply_filters = stream.depth_filter_chain([f for f in args.filters.split(",") if f])
+    model = None
+    if args.model:
+        from ultralytics import YOLO
+        model = YOLO(args.model)
+
+    times = {"yolo": [], "align": [], "roi": [], "filters": []}
+    diffs = []
+    frames_seen = 0
+    try:
+        while not args.frames or frames_seen < args.frames:
+            ok, frames = pipeline.try_wait_for_frames(2000)
+            if not ok:
+                break
+            color_frame, depth_frame = frames.get_color_frame(), frames.get_depth_frame()
+            if not color_frame or not depth_frame:
+                continue
+            frames_seen += 1
+
+            if model:
+                t0 = time.perf_counter()
+                results = model(np.asanyarray(color_frame.get_data()), verbose=False)
+                times["yolo"].append((time.perf_counter() - t0) * 1000)
+                boxes = [list(map(int, b.xyxy[0])) for b in results[0].boxes]
+            else:
+                boxes = grid_boxes(args.boxes)
+
+            t0 = time.perf_counter()
+            aligned = align.process(frames).get_depth_frame()
+            ref = aligned_depths(np.asanyarray(aligned.get_data()), depth_scale, boxes)
+            times["align"].append((time.perf_counter() - t0) * 1000)
+
+            t0 = time.perf_counter()
+            got = stream.box_depths(np.asanyarray(depth_frame.get_data()), depth_scale, d_intr, c_intr, d2c, boxes)
+            times["roi"].append((time.perf_counter() - t0) * 1000)
+
+            if apply_filters:
+                t0 = time.perf_counter()
+                apply_filters(depth_frame)
+                times["filters"].append((time.perf_counter() - t0) * 1000)
+
+            diffs += [abs(a - b) for a, b in zip(ref, got) if a and b]
+    finally:
+        pipeline.stop()
+
+    if not frames_seen:
+        print("No frames in the bag")
+        return
+    filter_share = min(1.0, args.filter_hz / 30.0)  # the camera runs at 30 fps
+    print(f"{args.bag}: {frames_seen} frames, "
+          f"{'YOLO boxes' if model else f'{args.boxes} grid boxes'} per frame")
+    for name in ("yolo", "align", "roi", "filters"):
+        if times[name]:
+            print(f"  {name:8} p50 {pct(times[name], 50):6.2f} ms  p95 {pct(times[name], 95):6.2f} ms")
+    if times["filters"]:
+        print(f"  filters at {args.filter_hz:g} Hz on their own thread: "
+              f"{np.mean(times['filters']) * filter_share:.2f} ms per 30 fps frame amortized")
+    if diffs:
+        print(f"  agreement: median |align - roi| {np.median(diffs) * 100:.1f} cm over {len(diffs)} boxes")
+    if model:
+        yolo_ms = np.mean(times["yolo"])
+        for name in ("align", "roi"):
+            print(f"  sustained FPS with {name}: {1000 / (yolo_ms + np.mean(times[name])):.1f}")
+
+
+if __name__ == "__main__":
+    main()
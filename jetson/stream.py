@@ -2,13 +2,20 @@ import pyrealsense2 as rs
 import numpy as np
 import cv2
 import os
+import re
+import shutil
+import platform
+import importlib.util
 import base64
 import uuid
 import json
+import queue
+import sqlite3
 import urllib.request
 from collections import deque
+from fractions import Fraction
 from ultralytics import YOLO
-from flask import Flask, Response, jsonify
+from flask import Flask, Response, jsonify, request, send_file
 from flask_cors import CORS
 import threading
 import time
@@ -16,11 +23,19 @@ import time
 app = Flask(__name__)
 CORS(app)
 
-latest_frame = None
+latest_frame = None          # clean color frame; overlays are drawn per variant on request
 latest_detections = []
 lock = threading.Lock()
 fps_val = 0
 latest_detection_ts = 0.0
+# Each publish gets a sequence number and a body serialized once in yolo_loop;
+# /detections serves the bytes as-is and long-pollers wait on detections_cond.
+detections_seq = 0
+detections_body = json.dumps({"seq": 0, "fps": 0, "timestamp": None, "source": "jetson", "counts": {},
+                              "person_count": 0, "nearest_person_m": None, "detections": []}).encode()
+detections_cond = threading.Condition(lock)
+ETAG_EPOCH = uuid.uuid4().hex[:8]  # keeps ETags unique across restarts
+DETECTIONS_MAX_WAIT_MS = 10000
 
 # VLM (Moondream via Ollama) config
 OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434")
@@ -31,6 +46,52 @@ VLM_INTERVAL = float(os.getenv("VLM_INTERVAL", "5.0"))
 vlm_results = deque(maxlen=3)
 vlm_lock = threading.Lock()
 
+H264_FPS = float(os.getenv("H264_FPS", "15"))
+H264_GOP = int(os.getenv("H264_GOP", "15"))           # frames per keyframe; bounds join latency
+H264_BITRATE_KBPS = int(os.getenv("H264_BITRATE_KBPS", "800"))
+H264_PRESET = os.getenv("H264_PRESET", "veryfast")
+H264_OVERLAY = os.getenv("H264_OVERLAY", "1") != "0"
+H264_IDLE_S = 10.0       # encoder stops this long after the last client leaves
+H264_CLIENT_QUEUE = 120  # fragments buffered per client before it is dropped
+H264_AVAILABLE = importlib.util.find_spec("av") is not None  # checked before a client subscribes
+
+HISTORY_DB = os.getenv("HISTORY_DB", os.path.expanduser("~/yolo/history.db"))
+HISTORY_RETENTION_H = float(os.getenv("HISTORY_RETENTION_H", "72"))
+HISTORY_FLUSH_S = 1.0        # writer batches everything queued in this window
+HISTORY_FRAME_EVERY_S = 0.2  # frame summaries kept at most 5/s unless counts change
+HISTORY_EVENT_HOLD_S = 0.5   # a count change must hold this long to become an event
+HISTORY_MAX_POINTS = 500     # /history downsamples to about this many buckets
+
+CLIP_RECORD = os.getenv("CLIP_RECORD", "1") != "0"
+CLIP_DIR = os.getenv("CLIP_DIR", os.path.expanduser("~/yolo/clips"))
+CLIP_PRE_S = float(os.getenv("CLIP_PRE_S", "5"))    # pre-roll before the event
+CLIP_POST_S = float(os.getenv("CLIP_POST_S", "5"))  # kept after the last trigger
+CLIP_MAX_S = 60.0            # repeated triggers extend a clip up to this length
+CLIP_FPS = float(os.getenv("CLIP_FPS", "10"))       # ring sampling rate
+CLIP_FORMAT = os.getenv("CLIP_FORMAT", "avi")       # avi (MJPG) or mp4 (mp4v)
+CLIP_OVERLAY = os.getenv("CLIP_OVERLAY", "1") != "0"  # 0 records clean frames (eval / benchmark input)
+CLIP_RING_MAX_MB = 64        # pre-roll memory cap
+CLIP_MAX_DISK_MB = float(os.getenv("CLIP_MAX_DISK_MB", "4096"))
+CLIP_TRIGGER_LABELS = {
+    l.strip() for l in os.getenv(
+        "CLIP_TRIGGER_LABELS", "person,knife,scissors,baseball bat,gun,pistol,rifle").split(",")
+    if l.strip()
+}
+
+YOLO_MODEL = os.getenv("YOLO_MODEL", "yolo11s.engine")  # a .pt is exported per DETECTOR_BACKEND and cached
+YOLO_DEVICE = os.getenv("YOLO_DEVICE", "0")
+DETECTOR_BACKEND = os.getenv("DETECTOR_BACKEND", "auto")  # auto, tensorrt, openvino, onnx, torch
+DETECTOR_IMGSZ = int(os.getenv("DETECTOR_IMGSZ", "640"))
+DETECTOR_CACHE = os.getenv("DETECTOR_CACHE", os.path.expanduser("~/yolo/engines"))
+DETECTOR_WARMUP = 3  # inferences run before the loop publishes
+
+DEPTH_ROI_FRAC = 0.4         # central share of each box (per side) whose depth is sampled
+DEPTH_MIN_M = 0.2
+DEPTH_MAX_M = 10.0
+DEPTH_FILTERS = [f.strip() for f in os.getenv("DEPTH_FILTERS", "").lower().split(",") if f.strip()]  # decimation,spatial,hole_filling
+DEPTH_FILTER_HZ = float(os.getenv("DEPTH_FILTER_HZ", "5"))
+DEPTH_FILTER_MAX_AGE_S = 0.5  # older filtered depth falls back to the current raw frame
+
 FILTER_RAW = os.getenv("YOLO_LABEL_FILTER", "person").strip().lower()
 try:
     MIN_CONFIDENCE = float(os.getenv("YOLO_MIN_CONF", "0.25"))
@@ -41,39 +102,505 @@ if FILTER_RAW in ("", "all", "*"):
 else:
     ACTIVE_LABEL_FILTER = {label.strip() for label in FILTER_RAW.split(",") if label.strip()}
 
+# Event history: the YOLO and VLM threads only enqueue; one writer thread
+# owns the SQLite (WAL) connection, batches rows per flush and applies retention.
+
+history_queue = queue.Queue(maxsize=5000)
+history_stats = {"frames": 0, "events": 0, "vlm": 0, "dropped": 0, "flushes": 0, "last_flush_ms": 0.0}
+
+HISTORY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS frames (ts REAL NOT NULL, person_count INTEGER, nearest_m REAL, fps REAL, counts TEXT);
+CREATE INDEX IF NOT EXISTS frames_ts ON frames (ts);
+CREATE TABLE IF NOT EXISTS events (ts REAL NOT NULL, kind TEXT, label TEXT, count INTEGER);
+CREATE INDEX IF NOT EXISTS events_ts ON events (ts);
+CREATE TABLE IF NOT EXISTS vlm (ts REAL NOT NULL, model TEXT, status TEXT, elapsed REAL, output TEXT);
+CREATE INDEX IF NOT EXISTS vlm_ts ON vlm (ts);
+CREATE TABLE IF NOT EXISTS clips (id TEXT PRIMARY KEY, ts REAL NOT NULL, labels TEXT, start REAL, end REAL,
+                                  frames INTEGER, bytes INTEGER, path TEXT);
+CREATE INDEX IF NOT EXISTS clips_ts ON clips (ts);
+"""
+
+
+def history_put(kind, row):
+    """Queue a row for the writer without blocking; drops when the queue is full."""
+    try:
+        history_queue.put_nowait((kind, row))
+    except queue.Full:
+        history_stats["dropped"] += 1
+
+
+class HistoryTracker:
+    """Turns per-frame label counts into debounced appeared/left/count events."""
+
+    def __init__(self):
+        self.stable = {}
+        self.pending = {}  # label -> (count, first seen)
+        self.last_frame_ts = 0.0
+        self.last_counts = {}  # counts of the last kept frame summary
+
+    def update(self, ts, counts):
+        events = []
+        for label in set(counts) | set(self.stable) | set(self.pending):
+            value = counts.get(label, 0)
+            before = self.stable.get(label, 0)
+            if value == before:
+                self.pending.pop(label, None)
+                continue
+            if self.pending.get(label, (None,))[0] != value:
+                self.pending[label] = (value, ts)
+            elif ts - self.pending[label][1] >= HISTORY_EVENT_HOLD_S:
+                kind = "appeared" if before == 0 else "left" if value == 0 else "count"
+                events.append((self.pending[label][1], kind, label, value))  # onset time
+                del self.pending[label]
+                if value:
+                    self.stable[label] = value
+                else:
+                    self.stable.pop(label, None)
+        keep = bool(events) or counts != self.last_counts or ts - self.last_frame_ts >= HISTORY_FRAME_EVERY_S
+        if keep:
+            self.last_frame_ts = ts
+            self.last_counts = dict(counts)
+        return keep, events
+
+
+def history_writer_loop():
+    """Background thread: batch queued rows into SQLite and prune old ones."""
+    os.makedirs(os.path.dirname(HISTORY_DB) or ".", exist_ok=True)
+    db = sqlite3.connect(HISTORY_DB)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    db.executescript(HISTORY_SCHEMA)
+    tracker = HistoryTracker()
+    last_prune = 0.0
+    print(f"History writer started ({HISTORY_DB}, retention {HISTORY_RETENTION_H:g}h)")
+
+    while True:
+        time.sleep(HISTORY_FLUSH_S)
+        frames, events, vlm = [], [], []
+        while True:
+            try:
+                kind, row = history_queue.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "frame":
+                ts, counts, nearest, fps = row
+                keep, new_events = tracker.update(ts, counts)
+                events.extend(new_events)
+                for event_ts, event_kind, label, _ in new_events:
+                    if CLIP_RECORD and event_kind == "appeared" and label in CLIP_TRIGGER_LABELS:
+                        clip_trigger(event_ts, label)
+                if keep:
+                    frames.append((ts, counts.get("person", 0), nearest, fps, json.dumps(counts)))
+            elif kind == "vlm":
+                vlm.append(row)
+
+        try:
+            if frames or events or vlm:
+                t0 = time.time()
+                with db:
+                    db.executemany("INSERT INTO frames VALUES (?, ?, ?, ?, ?)", frames)
+                    db.executemany("INSERT INTO events VALUES (?, ?, ?, ?)", events)
+                    db.executemany("INSERT INTO vlm VALUES (?, ?, ?, ?, ?)", vlm)
+                history_stats["frames"] += len(frames)
+                history_stats["events"] += len(events)
+                history_stats["vlm"] += len(vlm)
+                history_stats["flushes"] += 1
+                history_stats["last_flush_ms"] = round((time.time() - t0) * 1000, 1)
+            if time.time() - last_prune > 60:
+                cutoff = time.time() - HISTORY_RETENTION_H * 3600
+                with db:
+                    for table in ("frames", "events", "vlm"):
+                        db.execute(f"DELETE FROM {table} WHERE ts < ?", (cutoff,))
+                last_prune = time.time()
+        except sqlite3.Error as e:
+            print(f"History write error: {e}")
+
+
+def query_history(since, until, step, label):
+    """Downsampled count series plus the events and VLM outputs in [since, until)."""
+    db = sqlite3.connect(f"file:{HISTORY_DB}?mode=ro", uri=True, timeout=2)
+    try:
+        if label:
+            value, value_args = "COALESCE(json_extract(counts, ?), 0)", [f'$."{label}"'] * 2
+        else:
+            value, value_args = "person_count", []
+        series = [
+            {"t": round(bucket * step, 3), "max": peak, "avg": round(avg, 2),
+             "nearest_m": nearest, "samples": n}
+            for bucket, peak, avg, nearest, n in db.execute(
+                f"SELECT CAST(ts / ? AS INTEGER) AS b, MAX({value}), AVG({value}), MIN(nearest_m), COUNT(*) "
+                "FROM frames WHERE ts >= ? AND ts < ? GROUP BY b ORDER BY b",
+                [step, *value_args, since, until],
+            )
+        ]
+        event_sql = (
+            "SELECT ts, kind, label, count, "
+            "(SELECT id FROM clips WHERE events.ts BETWEEN clips.start AND clips.end LIMIT 1) "
+            "FROM events WHERE ts >= ? AND ts < ?"
+        )
+        event_args = [since, until]
+        if label:
+            event_sql += " AND label = ?"
+            event_args.append(label)
+        events = [
+            {"timestamp": ts, "kind": kind, "label": lbl, "count": count, "clip": clip}
+            for ts, kind, lbl, count, clip in db.execute(event_sql + " ORDER BY ts DESC LIMIT 500", event_args)
+        ]
+        vlm = [
+            {"timestamp": ts, "model": model, "status": status, "elapsed": elapsed, "output": output}
+            for ts, model, status, elapsed, output in db.execute(
+                "SELECT ts, model, status, elapsed, output FROM vlm WHERE ts >= ? AND ts < ? "
+                "ORDER BY ts DESC LIMIT 100", (since, until))
+        ]
+    finally:
+        db.close()
+    return series, events, vlm
+
+
+# Clip recording: a recorder thread takes the annotated frame variant at
+# CLIP_FPS into a bounded pre-roll ring, off the YOLO thread. Triggers seed a
+# recording from the ring; the writer thread muxes finished ones to disk.
+
+clip_lock = threading.Lock()
+clip_ring = deque()   # (ts, jpeg bytes), oldest first
+clip_ring_bytes = 0
+clip_active = []      # recordings still collecting frames
+clip_jobs = queue.Queue(maxsize=4)
+clip_stats = {"triggers": 0, "extended": 0, "written": 0, "dropped": 0, "errors": 0,
+              "ring_frames": 0, "ring_mb": 0.0, "last_write_s": 0.0}
+
+
+def clip_trigger(event_ts, label):
+    """Start a recording around an event, or extend the one covering it."""
+    with clip_lock:
+        clip_stats["triggers"] += 1
+        for rec in clip_active:
+            if event_ts <= rec["end"] < rec["start"] + CLIP_MAX_S:
+                rec["end"] = min(max(rec["end"], event_ts + CLIP_POST_S), rec["start"] + CLIP_MAX_S)
+                rec["labels"].add(label)
+                clip_stats["extended"] += 1
+                return rec["id"]
+        start = event_ts - CLIP_PRE_S
+        rec = {
+            "id": uuid.uuid4().hex[:12],
+            "ts": event_ts,
+            "labels": {label},
+            "start": start,
+            "end": event_ts + CLIP_POST_S,
+            "frames": [f for f in clip_ring if f[0] >= start],
+        }
+        clip_active.append(rec)
+        return rec["id"]
+
+
+def recorder_loop():
+    """Background thread: keep the pre-roll ring and feed active recordings."""
+    global clip_ring_bytes
+    # Triggers come from the history writer, up to a flush + debounce late
+    ring_s = CLIP_PRE_S + HISTORY_FLUSH_S + HISTORY_EVENT_HOLD_S + 1.0
+    last = None
+    print(f"Clip recorder started ({CLIP_FPS:g} fps, {CLIP_PRE_S:g}s pre / {CLIP_POST_S:g}s post, {CLIP_DIR})")
+
+    while True:
+        time.sleep(1.0 / CLIP_FPS)
+        entry = frame_variant(CLIP_OVERLAY)
+        if entry is None or entry[0] == last:
+            continue
+        last, _, jpeg = entry
+        now = time.time()
+
+        with clip_lock:
+            clip_ring.append((now, jpeg))
+            clip_ring_bytes += len(jpeg)
+            while clip_ring and (clip_ring[0][0] < now - ring_s or clip_ring_bytes > CLIP_RING_MAX_MB * 1e6):
+                clip_ring_bytes -= len(clip_ring.popleft()[1])
+            finished = []
+            for rec in clip_active:
+                rec["frames"].append((now, jpeg))
+                if now >= rec["end"]:
+                    finished.append(rec)
+            for rec in finished:
+                clip_active.remove(rec)
+            clip_stats["ring_frames"] = len(clip_ring)
+            clip_stats["ring_mb"] = round(clip_ring_bytes / 1e6, 1)
+
+        for rec in finished:
+            try:
+                clip_jobs.put_nowait(rec)
+            except queue.Full:
+                clip_stats["dropped"] += 1
+
+
+def write_clip(rec):
+    """Decode the JPEGs and mux them into CLIP_DIR; returns (file name, bytes)."""
+    fourcc, ext = ("mp4v", "mp4") if CLIP_FORMAT == "mp4" else ("MJPG", "avi")
+    frames = rec["frames"]
+    span = frames[-1][0] - frames[0][0]
+    fps = (len(frames) - 1) / span if len(frames) > 1 and span > 0 else CLIP_FPS
+    name = f"{rec['id']}.{ext}"
+    tmp = os.path.join(CLIP_DIR, f"{rec['id']}.tmp.{ext}")
+    writer = None
+    try:
+        for _, jpeg in frames:
+            img = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if img is None:
+                continue
+            if writer is None:
+                h, w = img.shape[:2]
+                writer = cv2.VideoWriter(tmp, cv2.VideoWriter_fourcc(*fourcc), fps, (w, h))
+            writer.write(img)
+    finally:
+        if writer is not None:
+            writer.release()
+    path = os.path.join(CLIP_DIR, name)
+    os.replace(tmp, path)
+    return name, os.path.getsize(path)
+
+
+def prune_clips(db):
+    """Drop clips past HISTORY_RETENTION_H or beyond CLIP_MAX_DISK_MB, oldest first."""
+    cutoff = time.time() - HISTORY_RETENTION_H * 3600
+    total = 0
+    doomed = []
+    for clip_id, ts, size, name in db.execute("SELECT id, ts, bytes, path FROM clips ORDER BY ts DESC"):
+        total += size or 0
+        if ts < cutoff or total > CLIP_MAX_DISK_MB * 1e6:
+            doomed.append((clip_id, name))
+    for _, name in doomed:
+        try:
+            os.remove(os.path.join(CLIP_DIR, name))
+        except FileNotFoundError:
+            pass
+    if doomed:
+        with db:
+            db.executemany("DELETE FROM clips WHERE id = ?", [(clip_id,) for clip_id, _ in doomed])
+
+
+def clip_writer_loop():
+    """Background thread: write finished recordings and index them by event id."""
+    os.makedirs(CLIP_DIR, exist_ok=True)
+    db = sqlite3.connect(HISTORY_DB, timeout=5)
+    db.executescript(HISTORY_SCHEMA)
+
+    while True:
+        rec = clip_jobs.get()
+        if not rec["frames"]:
+            continue
+        t0 = time.time()
+        try:
+            name, size = write_clip(rec)
+            with db:
+                db.execute(
+                    "INSERT OR REPLACE INTO clips VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (rec["id"], rec["ts"], ",".join(sorted(rec["labels"])), rec["frames"][0][0],
+                     rec["frames"][-1][0], len(rec["frames"]), size, name),
+                )
+            prune_clips(db)
+            clip_stats["written"] += 1
+            clip_stats["last_write_s"] = round(time.time() - t0, 2)
+            print(f"[{time.strftime('%H:%M:%S')}] Clip {name} ({len(rec['frames'])} frames, "
+                  f"{','.join(sorted(rec['labels']))}) written in {time.time() - t0:.1f}s")
+        except Exception as e:
+            clip_stats["errors"] += 1
+            print(f"Clip write error: {e}")
+
+
+# Depth: nothing aligns the full depth image to color. Only depth pixels that can land inside a detection box are
+# deprojected, moved into the color camera frame and projected, so the cost scales with box area, not 640x480.
+# Optional RealSense filters run on their own thread at DEPTH_FILTER_HZ on a frame handed over by yolo_loop.
+
+depth_filter_wanted = threading.Event()
+depth_filter_in = queue.Queue(maxsize=1)
+depth_filtered = None  # (ts, z16 array, intrinsics) from the filter thread
+
+def intrinsics_of(profile):
+    i = profile.as_video_stream_profile().get_intrinsics()
+    return i.fx, i.fy, i.ppx, i.ppy, i.width, i.height
+
+def extrinsics_of(src, dst):
+    e = src.get_extrinsics_to(dst)
+    # librealsense stores the rotation column-major
+    return np.array(e.rotation, dtype=np.float32).reshape(3, 3).T, np.array(e.translation, dtype=np.float32)
+
+def box_depths(depth, depth_scale, d_intr, c_intr, d2c, boxes):
+    """Median depth (m, along the color axis) under the central DEPTH_ROI_FRAC of each color-pixel box, 0.0 if none.
+
+    Matches reading an rs.align(color) image under the box. Lens distortion is ignored (D435 streams are near pinhole).
+    """
+    dfx, dfy, dppx, dppy, dw, dh = d_intr
+    cfx, cfy, cppx, cppy, _, _ = c_intr
+    rot, trans = d2c
+    rot_inv, trans_inv = rot.T, -rot.T @ trans
+    out = []
+    for x1, y1, x2, y2 in boxes:
+        mx, my = (x2 - x1) * (1 - DEPTH_ROI_FRAC) / 2, (y2 - y1) * (1 - DEPTH_ROI_FRAC) / 2
+        rx1, ry1, rx2, ry2 = x1 + mx, y1 + my, x2 - mx, y2 - my
+        # Depth window that can map into the ROI: the ROI corners cast out to the near and far limits
+        cx = np.array([rx1, rx2, rx1, rx2] * 2, dtype=np.float32)
+        cy = np.array([ry1, ry1, ry2, ry2] * 2, dtype=np.float32)
+        cz = np.repeat(np.array([DEPTH_MIN_M, DEPTH_MAX_M], dtype=np.float32), 4)
+        corners = np.stack([(cx - cppx) / cfx * cz, (cy - cppy) / cfy * cz, cz], axis=1) @ rot_inv.T + trans_inv
+        u = corners[:, 0] / corners[:, 2] * dfx + dppx
+        v = corners[:, 1] / corners[:, 2] * dfy + dppy
+        u0, u1 = max(int(u.min()), 0), min(int(np.ceil(u.max())) + 1, dw)
+        v0, v1 = max(int(v.min()), 0), min(int(np.ceil(v.max())) + 1, dh)
+        if u0 >= u1 or v0 >= v1:
+            out.append(0.0)
+            continue
+        z = depth[v0:v1, u0:u1].astype(np.float32) * depth_scale
+        vv, uu = np.mgrid[v0:v1, u0:u1]
+        valid = (z > DEPTH_MIN_M) & (z < DEPTH_MAX_M)
+        z, uu, vv = z[valid], uu[valid], vv[valid]
+        pts = np.stack([(uu - dppx) / dfx * z, (vv - dppy) / dfy * z, z], axis=1) @ rot.T + trans
+        pu = pts[:, 0] / pts[:, 2] * cfx + cppx
+        pv = pts[:, 1] / pts[:, 2] * cfy + cppy
+        inside = (pu >= rx1) & (pu <= rx2) & (pv >= ry1) & (pv <= ry2)
+        out.append(float(np.median(pts[inside, 2])) if inside.any() else 0.0)
+    return out
+
+def depth_filter_chain(names):
+    """Returns a function applying the named RealSense filters in the recommended order, or None."""
+    known = ("decimation", "spatial", "hole_filling")
+    unknown = [n for n in names if n not in known]
+    if unknown:
+        print(f"Ignoring unknown DEPTH_FILTERS: {','.join(unknown)} (have {','.join(known)})")
+    names = [n for n in known if n in names]
+    if not names:
+        return None
+    chain = []
+    if "decimation" in names:
+        chain.append(rs.decimation_filter())
+    if "spatial" in names:
+        # Spatial smoothing is done in disparity space, as librealsense recommends
+        chain += [rs.disparity_transform(True), rs.spatial_filter(), rs.disparity_transform(False)]
+    if "hole_filling" in names:
+        chain.append(rs.hole_filling_filter())
+
+    def apply(frame):
+        for f in chain:
+            frame = f.process(frame)
+        return frame
+    return apply
+
+def depth_filter_loop(apply):
+    global depth_filtered
+    print(f"Depth filter thread started ({','.join(DEPTH_FILTERS)} at {DEPTH_FILTER_HZ:g} Hz)")
+    while True:
+        t0 = time.time()
+        depth_filter_wanted.set()
+        ts, frame = depth_filter_in.get()
+        try:
+            out = apply(frame).as_depth_frame()
+            filtered = (ts, np.asanyarray(out.get_data()).copy(), intrinsics_of(out.get_profile()))
+            with lock:
+                depth_filtered = filtered
+        except Exception as e:
+            print(f"Depth filter error: {e}")
+        time.sleep(max(0.0, 1.0 / DEPTH_FILTER_HZ - (time.time() - t0)))
+
+# Detector backends: YOLO_MODEL (.pt) is exported once per (model, input size, device, backend) into DETECTOR_CACHE;
+# a prebuilt .engine/.onnx/_openvino_model is used as-is. Either way it is warmed up before the first publish.
+
+BACKEND_SUFFIX = {"tensorrt": ".engine", "onnx": ".onnx", "openvino": "_openvino_model", "torch": ".pt"}
+BACKEND_FORMAT = {"tensorrt": "engine", "onnx": "onnx", "openvino": "openvino"}
+
+def available_backends(device):
+    """Backends usable on this host, fastest first."""
+    if device != "cpu":
+        return (["tensorrt"] if importlib.util.find_spec("tensorrt") else []) + ["torch"]
+    return [name for name, module in (("openvino", "openvino"), ("onnx", "onnxruntime"))
+            if importlib.util.find_spec(module)] + ["torch"]
+
+def export_model(weights, backend, imgsz, device):
+    """Path of the cached export for this model/size/device/backend, exporting it first if missing."""
+    if backend == "tensorrt":
+        import torch
+        import tensorrt
+        tag = f"{torch.cuda.get_device_name(int(device))}-trt{tensorrt.__version__}-fp16"
+    else:
+        tag = platform.machine()
+    stem = os.path.splitext(os.path.basename(weights))[0]
+    path = os.path.join(DETECTOR_CACHE, re.sub(r"[^A-Za-z0-9._-]+", "_", f"{stem}-{imgsz}-{tag}") + BACKEND_SUFFIX[backend])
+    if not os.path.exists(path):
+        print(f"Exporting {weights} for {backend} at {imgsz} (one-off, cached as {path})")
+        out = YOLO(weights).export(format=BACKEND_FORMAT[backend], imgsz=imgsz, device=device,
+                                   half=backend == "tensorrt", verbose=False)
+        os.makedirs(DETECTOR_CACHE, exist_ok=True)
+        shutil.move(str(out), path)
+    return path
+
+def load_detector(weights=YOLO_MODEL, backend=DETECTOR_BACKEND, imgsz=DETECTOR_IMGSZ, device=YOLO_DEVICE):
+    """Load the fastest usable backend for weights and warm it up. Returns (model, device)."""
+    suffix = next((b for b, suf in BACKEND_SUFFIX.items() if weights.rstrip("/").endswith(suf)), "torch")
+    if suffix != "torch":
+        candidates = [suffix]
+    elif backend == "auto":
+        candidates = available_backends(device)
+    else:
+        candidates = [backend] + (["torch"] if backend != "torch" else [])
+    for name in candidates:
+        t0 = time.time()
+        try:
+            path = weights if name == "torch" or suffix != "torch" else export_model(weights, name, imgsz, device)
+            run_device = device if name in ("tensorrt", "torch") else "cpu"
+            model = YOLO(path, task="detect")
+            blank = np.zeros((480, 640, 3), dtype=np.uint8)
+            warmup_ms = []
+            for _ in range(DETECTOR_WARMUP + 1):  # the first call also builds the predictor
+                t1 = time.perf_counter()
+                model(blank, imgsz=imgsz, device=run_device, verbose=False)
+                warmup_ms.append(round((time.perf_counter() - t1) * 1000, 1))
+        except Exception as e:
+            print(f"Detector backend {name} unavailable: {e}")
+            continue
+        print(f"Detector ready: {name} on {run_device} ({path}, {imgsz}px), "
+              f"loaded in {time.time() - t0:.1f}s, warm-up {warmup_ms} ms")
+        return model, run_device
+    raise RuntimeError(f"no detector backend could load {weights}")
+
 def yolo_loop():
     global latest_frame, latest_detections, fps_val, latest_detection_ts
-    model = YOLO("yolo11s.engine")
+    global detections_seq, detections_body
+    model, device = load_detector()
 
     pipeline = rs.pipeline()
     config = rs.config()
     config.enable_stream(rs.stream.color, 640, 480, rs.format.bgr8, 30)
     config.enable_stream(rs.stream.depth, 640, 480, rs.format.z16, 30)
-    pipeline.start(config)
-    align = rs.align(rs.stream.color)
+    profile = pipeline.start(config)
+    depth_profile = profile.get_stream(rs.stream.depth)
+    color_profile = profile.get_stream(rs.stream.color)
+    depth_scale = profile.get_device().first_depth_sensor().get_depth_scale()
+    raw_intr = intrinsics_of(depth_profile)
+    c_intr = intrinsics_of(color_profile)
+    d2c = extrinsics_of(depth_profile, color_profile)
+    apply_filters = depth_filter_chain(DEPTH_FILTERS)
+    if apply_filters:
+        threading.Thread(target=depth_filter_loop, args=(apply_filters,), daemon=True).start()
 
     print("YOLO inference loop started.")
     count = 0
     t0 = time.time()
+    seq = 0
 
     try:
         while True:
             frames = pipeline.wait_for_frames()
-            aligned = align.process(frames)
-            color_frame = aligned.get_color_frame()
-            depth_frame = aligned.get_depth_frame()
+            color_frame = frames.get_color_frame()
+            depth_frame = frames.get_depth_frame()
             if not color_frame or not depth_frame:
                 continue
+            if apply_filters and depth_filter_wanted.is_set():
+                depth_filter_wanted.clear()
+                depth_frame.keep()  # the filter thread holds it past this iteration
+                depth_filter_in.put((time.time(), depth_frame))
 
-            frame = np.asanyarray(color_frame.get_data())
-            results = model(frame, verbose=False)
-            annotated = frame.copy()
+            # Own the pixels: the published frame outlives the librealsense buffer this would view
+            frame = np.asanyarray(color_frame.get_data()).copy()
+            results = model(frame, imgsz=DETECTOR_IMGSZ, device=device, verbose=False)
 
-            detections = []
+            kept = []
             for box in results[0].boxes:
-                x1, y1, x2, y2 = map(int, box.xyxy[0])
-                cx, cy = (x1 + x2) // 2, (y1 + y2) // 2
-                dist = depth_frame.get_distance(cx, cy)
                 cls_id = int(box.cls[0])
                 conf = float(box.conf[0])
                 label = model.names[cls_id]
@@ -85,26 +612,33 @@ def yolo_loop():
                 if ACTIVE_LABEL_FILTER is not None and normalized_label not in ACTIVE_LABEL_FILTER:
                     continue
 
-                cv2.rectangle(annotated, (x1, y1), (x2, y2), (0, 220, 0), 2)
-                cv2.putText(
-                    annotated,
-                    f"{label} {(conf * 100):.0f}%",
-                    (x1, max(y1 - 28, 20)),
-                    cv2.FONT_HERSHEY_SIMPLEX,
-                    0.55,
-                    (0, 220, 0),
-                    2,
-                )
-                cv2.putText(annotated, f"{dist:.2f}m", (x1, y1 - 10),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+                kept.append((label, conf, list(map(int, box.xyxy[0]))))
 
+            with lock:
+                filtered = depth_filtered
+            if filtered and time.time() - filtered[0] < DEPTH_FILTER_MAX_AGE_S:
+                _, depth, d_intr = filtered
+            else:
+                depth, d_intr = np.asanyarray(depth_frame.get_data()), raw_intr
+            dists = box_depths(depth, depth_scale, d_intr, c_intr, d2c, [bbox for _, _, bbox in kept])
+
+            detections = []
+            for (label, conf, bbox), dist in zip(kept, dists):
                 detections.append({
                     "label": label,
                     "confidence": round(conf, 3),
-                    "bbox": [x1, y1, x2, y2],
+                    "bbox": bbox,
                     "depth_m": round(dist, 3),
                 })
 
+            counts = {}
+            nearest_person = None
+            for det in detections:
+                counts[det["label"]] = counts.get(det["label"], 0) + 1
+                if det["label"] == "person" and (nearest_person is None or det["depth_m"] < nearest_person):
+                    nearest_person = det["depth_m"]
+            history_put("frame", (time.time(), counts, nearest_person, round(fps_val, 1)))
+
             count += 1
             elapsed = time.time() - t0
             if elapsed >= 1.0:
@@ -112,36 +646,349 @@ def yolo_loop():
                 count = 0
                 t0 = time.time()
 
-            cv2.putText(annotated, f"{fps_val:.1f} FPS", (10, 30),
-                        cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-            filter_text = "all" if ACTIVE_LABEL_FILTER is None else ",".join(sorted(ACTIVE_LABEL_FILTER))
-            cv2.putText(
-                annotated,
-                f"Filter: {filter_text}",
-                (10, 58),
-                cv2.FONT_HERSHEY_SIMPLEX,
-                0.5,
-                (140, 200, 255),
-                1,
-            )
+            now = time.time()
+            seq += 1
+            body = json.dumps({
+                "seq": seq,
+                "fps": round(fps_val, 1),
+                "timestamp": round(now, 3),
+                "source": "jetson",
+                "counts": counts,
+                "person_count": counts.get("person", 0),
+                "nearest_person_m": round(nearest_person, 3) if nearest_person is not None else None,
+                "detections": detections,
+            }).encode()
 
             with lock:
-                latest_frame = annotated
+                latest_frame = frame
                 latest_detections = detections
-                latest_detection_ts = time.time()
+                latest_detection_ts = now
+                detections_seq = seq
+                detections_body = body
+                detections_cond.notify_all()
     finally:
         pipeline.stop()
 
-def generate():
+# /stream and /snapshot.jpg clients ask for (overlay, size, quality) variants of the latest frame. Each variant is
+# encoded at most once per frame, on the first request after it is published, so unwatched variants cost nothing.
+# Overlays are drawn the same way: once per frame, into a reused buffer, only if an annotated variant is requested.
+JPEG_QUALITY = 80
+VARIANT_MIN_WIDTH = 64
+STREAM_MAX_FPS = 30.0
+variant_lock = threading.Lock()
+variant_cache = {}   # (overlay, width, quality) -> (seq, ts, jpeg bytes) of the newest frame served
+variant_locks = {}   # (overlay, width, quality) -> lock held while that variant encodes
+overlay_lock = threading.Lock()
+overlay_buf = None   # annotated copy of the frame with seq overlay_seq
+overlay_seq = -1
+
+def parse_variant_args(args):
+    """(width, quality) from ?w=&q=, snapped so nearby requests share a variant."""
+    width = int(args.get("w", 0))
+    quality = int(args.get("q", JPEG_QUALITY))
+    width = max(VARIANT_MIN_WIDTH, width - width % 16) if width > 0 else 0
+    quality = min(95, max(20, quality - quality % 5))
+    return width, quality
+
+def wants_overlay(args):
+    """?overlay=0 (or the older ?raw=1) asks for the clean frame."""
+    return args.get("overlay", "1") != "0" and args.get("raw") != "1"
+
+def draw_overlays(buf, detections, fps):
+    for det in detections:
+        x1, y1, x2, y2 = det["bbox"]
+        cv2.rectangle(buf, (x1, y1), (x2, y2), (0, 220, 0), 2)
+        cv2.putText(buf, f"{det['label']} {(det['confidence'] * 100):.0f}%", (x1, max(y1 - 28, 20)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.55, (0, 220, 0), 2)
+        cv2.putText(buf, f"{det['depth_m']:.2f}m", (x1, y1 - 10),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+    cv2.putText(buf, f"{fps:.1f} FPS", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+    filter_text = "all" if ACTIVE_LABEL_FILTER is None else ",".join(sorted(ACTIVE_LABEL_FILTER))
+    cv2.putText(buf, f"Filter: {filter_text}", (10, 58), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (140, 200, 255), 1)
+
+def overlay_image(seq, frame, detections, fps):
+    """Annotated copy of frame in the shared buffer; call with overlay_lock held."""
+    global overlay_buf, overlay_seq
+    if overlay_seq != seq:
+        if overlay_buf is None or overlay_buf.shape != frame.shape:
+            overlay_buf = np.empty_like(frame)
+        np.copyto(overlay_buf, frame)
+        draw_overlays(overlay_buf, detections, fps)
+        overlay_seq = seq
+    return overlay_buf
+
+def encode_variant(frame, width, quality):
+    h, w = frame.shape[:2]
+    if width and width < w:
+        frame = cv2.resize(frame, (width, max(1, round(h * width / w))), interpolation=cv2.INTER_AREA)
+    _, buf = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return buf.tobytes()
+
+def frame_variant(overlay, width=0, quality=JPEG_QUALITY):
+    """Latest frame as (seq, ts, jpeg), annotated or clean, downscaled to width if set."""
+    with lock:
+        seq, ts, frame = detections_seq, latest_detection_ts, latest_frame
+        dets, fps = latest_detections, fps_val
+    if frame is None:
+        return None
+    if width >= frame.shape[1]:
+        width = 0  # no upscaling: every width at or above the frame's is the full-size variant
+    key = (overlay, width, quality)
+    with variant_lock:
+        cached = variant_cache.get(key)
+        if cached and cached[0] == seq:
+            return cached
+        key_lock = variant_locks.setdefault(key, threading.Lock())
+    with key_lock:
+        cached = variant_cache.get(key)
+        if cached and cached[0] == seq:
+            return cached  # another client encoded it while we waited
+        if overlay:
+            with overlay_lock:
+                jpeg = encode_variant(overlay_image(seq, frame, dets, fps), width, quality)
+        else:
+            jpeg = encode_variant(frame, width, quality)
+        entry = (seq, ts, jpeg)
+        with variant_lock:
+            if len(variant_cache) >= 32:
+                variant_cache.clear()
+                for k in [k for k, l in variant_locks.items() if not l.locked()]:
+                    del variant_locks[k]
+            variant_cache[key] = entry
+        return entry
+
+def generate(overlay=True, width=0, quality=JPEG_QUALITY, fps=STREAM_MAX_FPS):
+    interval = 1.0 / fps
+    last_seq = -1
+    next_due = 0.0
     while True:
-        with lock:
-            frame = latest_frame
-        if frame is None:
-            time.sleep(0.01)
+        delay = next_due - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        with detections_cond:
+            detections_cond.wait_for(lambda: detections_seq != last_seq, timeout=1.0)
+        entry = frame_variant(overlay, width, quality)
+        if entry is None or entry[0] == last_seq:
             continue
-        _, jpeg = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 80])
+        last_seq, _, jpeg = entry
+        # Pace from the previous slot, but never bank time while the camera is slower
+        next_due = max(next_due + interval, time.time())
+        # X-Seq pairs the frame with the /detections result of the same seq
         yield (b"--frame\r\n"
-               b"Content-Type: image/jpeg\r\n\r\n" + jpeg.tobytes() + b"\r\n")
+               b"Content-Type: image/jpeg\r\nX-Seq: %d\r\n\r\n" % last_seq + jpeg + b"\r\n")
+
+# Optional low-bandwidth mode: one libx264 encoder for the camera, started by the first /stream.mp4 client and
+# stopped H264_IDLE_S after the last one leaves. The muxer writes fragmented MP4 with one moof+mdat per frame;
+# fragments fan out to per-client queues, and a client joining mid-GOP starts at the next keyframe fragment.
+
+def mp4_boxes(buf):
+    """Split complete top-level MP4 boxes off buf; returns ([(type, box)], rest)."""
+    boxes = []
+    pos = 0
+    while len(buf) - pos >= 8:
+        size = int.from_bytes(buf[pos:pos + 4], "big")
+        if size == 1:
+            if len(buf) - pos < 16:
+                break
+            size = int.from_bytes(buf[pos + 8:pos + 16], "big")
+        if size < 8 or len(buf) - pos < size:
+            break
+        boxes.append((buf[pos + 4:pos + 8], buf[pos:pos + size]))
+        pos += size
+    return boxes, buf[pos:]
+
+class H264Stream:
+    """Shared H.264 encoder feeding every /stream.mp4 client."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clients = []            # one queue of (keyframe, fragment) per client
+        self.init_segment = None
+        self.thread = None
+        self.last_client = 0.0
+        self.pending = b""
+        self.header = b""
+        self.moof = b""
+        self.packet_keys = deque()   # keyframe flag of each muxed packet, in fragment order
+        self.sent = deque()          # (ts, bytes) of recent fragments, for bitrate
+        self.av = None               # PyAV module, imported by the encoder thread
+        self.stats = {"running": False, "clients": 0, "frames": 0, "fragments": 0, "bytes": 0,
+                      "bitrate_kbps": 0.0, "encode_ms": 0.0, "dropped_clients": 0, "error": None}
+
+    def subscribe(self):
+        q = queue.Queue(maxsize=H264_CLIENT_QUEUE)
+        with self.lock:
+            self.clients.append(q)
+            self.stats["clients"] = len(self.clients)
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, daemon=True)
+                self.thread.start()
+        return q
+
+    def unsubscribe(self, q):
+        with self.lock:
+            if q in self.clients:
+                self.clients.remove(q)
+            self.stats["clients"] = len(self.clients)
+            self.last_client = time.time()
+
+    def write(self, data):
+        """File-like sink for the muxer: regroup its output into fragments."""
+        boxes, self.pending = mp4_boxes(self.pending + bytes(data))
+        for kind, box in boxes:
+            if kind == b"moof":
+                self.moof = box
+            elif kind == b"mdat" and self.moof:
+                keyframe = self.packet_keys.popleft() if self.packet_keys else False
+                self.publish(keyframe, self.moof + box)
+                self.moof = b""
+            else:
+                self.header += box
+                if kind == b"moov":
+                    self.init_segment = self.header
+        return len(data)
+
+    def publish(self, keyframe, fragment):
+        now = time.time()
+        self.sent.append((now, len(fragment)))
+        while self.sent and self.sent[0][0] < now - 5.0:
+            self.sent.popleft()
+        span = max(1.0, now - self.sent[0][0])
+        self.stats["fragments"] += 1
+        self.stats["bytes"] += len(fragment)
+        self.stats["bitrate_kbps"] = round(sum(n for _, n in self.sent) * 8 / 1000 / span, 1)
+        with self.lock:
+            clients = list(self.clients)
+        for q in clients:
+            try:
+                q.put_nowait((keyframe, fragment))
+            except queue.Full:
+                # Too far behind to catch up live; end it so the player reconnects
+                self.unsubscribe(q)
+                self.stats["dropped_clients"] += 1
+                self.close_client(q)
+
+    @staticmethod
+    def close_client(q):
+        while True:
+            try:
+                q.get_nowait()
+            except queue.Empty:
+                break
+        q.put_nowait(None)
+
+    def next_image(self, last_seq):
+        """(seq, VideoFrame) for the newest frame, or (seq, None) if nothing new."""
+        with detections_cond:
+            detections_cond.wait_for(lambda: detections_seq != last_seq, timeout=1.0)
+            seq, frame, dets, fps = detections_seq, latest_frame, latest_detections, fps_val
+        if frame is None or seq == last_seq:
+            return last_seq, None
+        with overlay_lock:
+            img = overlay_image(seq, frame, dets, fps) if H264_OVERLAY else frame
+            h, w = img.shape[:2]
+            if h % 2 or w % 2:  # yuv420p needs even dimensions
+                img = np.ascontiguousarray(img[:h - h % 2, :w - w % 2])
+            # from_ndarray copies, so the shared overlay buffer is free once this returns
+            return seq, self.av.VideoFrame.from_ndarray(img, format="bgr24")
+
+    def run(self):
+        try:
+            import av
+        except ImportError:
+            self.stats["error"] = "PyAV not installed (pip install av)"
+            print(f"H.264 stream unavailable: {self.stats['error']}")
+            with self.lock:
+                clients, self.clients = self.clients, []
+            for q in clients:
+                self.close_client(q)
+            return
+
+        self.av = av
+        self.pending, self.header, self.moof, self.init_segment = b"", b"", b"", None
+        self.packet_keys.clear()
+        self.stats.update(running=True, error=None)
+        container = av.open(self, mode="w", format="mp4", options={
+            "movflags": "frag_every_frame+empty_moov+default_base_moof",
+            "flush_packets": "1",
+        })
+        stream = None
+        interval = 1.0 / H264_FPS
+        last_seq, next_due, pts = -1, 0.0, -1
+        t_start = time.time()
+        print(f"H.264 encoder started ({H264_FPS:g} fps, GOP {H264_GOP}, {H264_BITRATE_KBPS} kbps, {H264_PRESET})")
+
+        try:
+            while True:
+                with self.lock:
+                    if not self.clients and time.time() - self.last_client > H264_IDLE_S:
+                        break
+                delay = next_due - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+                last_seq, image = self.next_image(last_seq)
+                if image is None:
+                    continue
+                next_due = max(next_due + interval, time.time())
+
+                if stream is None:
+                    stream = container.add_stream("libx264", rate=Fraction(H264_FPS).limit_denominator(1000))
+                    stream.width, stream.height = image.width, image.height
+                    stream.pix_fmt = "yuv420p"
+                    stream.bit_rate = H264_BITRATE_KBPS * 1000
+                    stream.options = {"preset": H264_PRESET, "tune": "zerolatency",
+                                      "g": str(H264_GOP), "bf": "0"}
+                # Wall-clock timestamps keep playback speed right when the source is slower than H264_FPS
+                pts = max(pts + 1, round((time.time() - t_start) * H264_FPS))
+                image.pts = pts
+
+                t0 = time.time()
+                for packet in stream.encode(image):
+                    self.packet_keys.append(packet.is_keyframe)
+                    container.mux(packet)
+                elapsed_ms = (time.time() - t0) * 1000
+                self.stats["frames"] += 1
+                self.stats["encode_ms"] = round(0.9 * self.stats["encode_ms"] + 0.1 * elapsed_ms, 2)
+        except Exception as e:
+            self.stats["error"] = str(e)
+            print(f"H.264 encoder error: {e}")
+        finally:
+            try:
+                container.close()
+            except Exception:
+                pass
+            self.stats["running"] = False
+            with self.lock:
+                clients, self.clients = self.clients, []
+                self.stats["clients"] = 0
+            for q in clients:
+                self.close_client(q)
+            print("H.264 encoder stopped")
+
+h264_stream = H264Stream()
+
+def generate_h264():
+    """Yield the init segment, then fragments from the first keyframe on."""
+    q = h264_stream.subscribe()
+    started = False
+    try:
+        while True:
+            try:
+                item = q.get(timeout=5.0)
+            except queue.Empty:
+                continue
+            if item is None:
+                return
+            keyframe, fragment = item
+            if not started:
+                if not keyframe or h264_stream.init_segment is None:
+                    continue
+                yield h264_stream.init_segment
+                started = True
+            yield fragment
+    finally:
+        h264_stream.unsubscribe(q)
+
 
 HTML = """<html><body style="margin:0;background:#000;display:flex;
 justify-content:center;align-items:center;height:100vh">
@@ -154,7 +1001,41 @@ def index():
 
 @app.route("/stream")
 def stream():
-    return Response(generate(), mimetype="multipart/x-mixed-replace; boundary=frame")
+    try:
+        width, quality = parse_variant_args(request.args)
+        fps = min(STREAM_MAX_FPS, max(0.2, float(request.args.get("fps", STREAM_MAX_FPS))))
+    except ValueError:
+        return jsonify({"error": "w, q and fps must be numbers"}), 400
+    return Response(generate(wants_overlay(request.args), width, quality, fps),
+                    mimetype="multipart/x-mixed-replace; boundary=frame")
+
+@app.route("/stream.mp4")
+def stream_h264():
+    if not H264_AVAILABLE:
+        return jsonify({"error": "PyAV not installed (pip install av)"}), 503
+    return Response(generate_h264(), mimetype="video/mp4", headers={"Cache-Control": "no-cache"})
+
+@app.route("/stream/stats")
+def stream_stats():
+    return jsonify({"h264": dict(h264_stream.stats, fps=H264_FPS, gop=H264_GOP, target_kbps=H264_BITRATE_KBPS)})
+
+@app.route("/snapshot.jpg")
+def snapshot():
+    try:
+        width, quality = parse_variant_args(request.args)
+    except ValueError:
+        return jsonify({"error": "w and q must be integers"}), 400
+    overlay = wants_overlay(request.args)
+    entry = frame_variant(overlay, width, quality)
+    if entry is None:
+        return jsonify({"error": "no frame yet"}), 503
+    seq, ts, jpeg = entry
+    response = Response(jpeg, mimetype="image/jpeg")
+    response.set_etag(f"{ETAG_EPOCH}-{'ann' if overlay else 'raw'}-{width}-{quality}-{seq}")
+    response.headers["X-Seq"] = str(seq)
+    response.last_modified = ts
+    response.headers["Cache-Control"] = "no-cache"
+    return response.make_conditional(request)
 
 def vlm_loop():
     """Background thread: grab latest frame, send to Ollama for VLM inference."""
@@ -208,6 +1089,7 @@ def vlm_loop():
 
         with vlm_lock:
             vlm_results.appendleft(entry)
+        history_put("vlm", (entry["timestamp"], OLLAMA_MODEL, entry["status"], entry["elapsed"], entry["output"]))
         print(f"VLM [{entry['status']}] {elapsed}s: {(entry['output'] or '')[:80]}")
 
 
@@ -220,32 +1102,111 @@ def vlm_results_endpoint():
 
 @app.route("/detections")
 def detections():
-    with lock:
-        dets = list(latest_detections)
-        ts = latest_detection_ts
-
-    counts = {}
-    nearest_person = None
-    for det in dets:
-        label = det["label"]
-        counts[label] = counts.get(label, 0) + 1
-        if label == "person":
-            depth = det.get("depth_m")
-            if isinstance(depth, (int, float)):
-                if nearest_person is None or depth < nearest_person:
-                    nearest_person = depth
+    """Latest detections; ?after_seq=N&wait=ms blocks until a newer publish."""
+    try:
+        after_seq = int(request.args.get("after_seq", -1))
+        wait_s = min(float(request.args.get("wait", 0)), DETECTIONS_MAX_WAIT_MS) / 1000
+    except ValueError:
+        return jsonify({"error": "after_seq and wait must be numbers"}), 400
+    with detections_cond:
+        if after_seq >= 0 and wait_s > 0:
+            # != rather than > so a client holding a seq from before a restart returns at once
+            detections_cond.wait_for(lambda: detections_seq != after_seq, timeout=wait_s)
+        seq, body = detections_seq, detections_body
+    response = Response(body, mimetype="application/json")
+    response.set_etag(f"{ETAG_EPOCH}-{seq}")
+    response.headers["Cache-Control"] = "no-cache"
+    return response.make_conditional(request)
+
+
+@app.route("/history")
+def get_history():
+    now = time.time()
+    try:
+        until = float(request.args.get("until", now))
+        since = float(request.args.get("since", until - 3600))
+        step = float(request.args.get("step", 0)) or max(1.0, (until - since) / HISTORY_MAX_POINTS)
+    except ValueError:
+        return jsonify({"error": "since, until and step are unix seconds"}), 400
+    label = request.args.get("label", "").strip().lower() or None
+    if label and not re.fullmatch(r"[a-z0-9 _-]+", label):
+        return jsonify({"error": "invalid label"}), 400
+    try:
+        series, events, vlm = query_history(since, until, step, label)
+    except sqlite3.Error as e:
+        return jsonify({"error": f"history unavailable: {e}"}), 503
+    return jsonify({
+        "source": "jetson",
+        "since": since,
+        "until": until,
+        "step": step,
+        "label": label,
+        "series": series,
+        "events": events,
+        "vlm": vlm,
+        "writer": dict(history_stats, queued=history_queue.qsize()),
+    })
 
+
+@app.route("/clips")
+def list_clips():
+    now = time.time()
+    try:
+        until = float(request.args.get("until", now))
+        since = float(request.args.get("since", until - 24 * 3600))
+    except ValueError:
+        return jsonify({"error": "since and until are unix seconds"}), 400
+    label = request.args.get("label", "").strip().lower()
+    sql = "SELECT id, ts, labels, start, end, frames, bytes FROM clips WHERE ts >= ? AND ts < ?"
+    args = [since, until]
+    if label:
+        sql += " AND instr(',' || labels || ',', ?) > 0"
+        args.append(f",{label},")
+    try:
+        db = sqlite3.connect(f"file:{HISTORY_DB}?mode=ro", uri=True, timeout=2)
+        try:
+            rows = db.execute(sql + " ORDER BY ts DESC LIMIT 200", args).fetchall()
+        finally:
+            db.close()
+    except sqlite3.Error as e:
+        return jsonify({"error": f"clips unavailable: {e}"}), 503
+    with clip_lock:
+        stats = dict(clip_stats, recording=len(clip_active), queued=clip_jobs.qsize())
     return jsonify({
-        "fps": round(fps_val, 1),
-        "timestamp": round(ts, 3) if ts else None,
         "source": "jetson",
-        "counts": counts,
-        "person_count": counts.get("person", 0),
-        "nearest_person_m": round(nearest_person, 3) if nearest_person is not None else None,
-        "detections": dets,
+        "clips": [
+            {"id": clip_id, "timestamp": ts, "labels": labels.split(","), "start": start, "end": end,
+             "duration_s": round(end - start, 1), "frames": frames, "bytes": size, "url": f"/clips/{clip_id}"}
+            for clip_id, ts, labels, start, end, frames, size in rows
+        ],
+        "recorder": stats,
     })
 
+
+@app.route("/clips/<clip_id>")
+def get_clip(clip_id):
+    if not re.fullmatch(r"[0-9a-f]{12}", clip_id):
+        return jsonify({"error": "not found"}), 404
+    try:
+        db = sqlite3.connect(f"file:{HISTORY_DB}?mode=ro", uri=True, timeout=2)
+        try:
+            row = db.execute("SELECT path FROM clips WHERE id = ?", (clip_id,)).fetchone()
+        finally:
+            db.close()
+    except sqlite3.Error:
+        row = None
+    path = os.path.join(CLIP_DIR, row[0]) if row else None
+    if path is None or not os.path.exists(path):
+        return jsonify({"error": "not found"}), 404
+    # conditional=True answers Range requests with 206 partial content
+    return send_file(path, conditional=True)
+
+
 if __name__ == "__main__":
+    threading.Thread(target=history_writer_loop, daemon=True).start()
+    if CLIP_RECORD:
+        threading.Thread(target=recorder_loop, daemon=True).start()
+        threading.Thread(target=clip_writer_loop, daemon=True).start()
     t = threading.Thread(target=yolo_loop, daemon=True)
     t.start()
     t_vlm = threading.Thread(target=vlm_loop, daemon=True)
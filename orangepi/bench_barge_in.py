@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Offline barge-in check for the voice pipeline.
+
+Drives the real assistant loop through voice_server.FileAudioIO with the
+mock LLM and dashboard from bench_voice.py, and interrupts two commands by
+saying the wake word again:
+  abort     the first question is held by the mock LLM until its client
+            goes away; a second wake word must abort the request (the mock
+            sees its connection closed) and the second command must run
+  playback  the first question gets a long answer; a wake word said while
+            it plays must stop playback within --budget-ms of the cancel
+            and the second command must run
+
+Each check prints PASS/FAIL with its timings; the exit status is non-zero
+when any check fails. Questions are spoken as "Security, <question>." by
+the node's own Piper voice and go to the LLM (no intent matches them).
+
+Run on the Orange Pi (same venv as voice_server.py):
+  python3 bench_barge_in.py [--budget-ms 100] [--hold 20] [--timeout 60]
+"""
+
+import argparse
+import json
+import os
+import select
+import socket
+import sys
+import threading
+import time
+
+from bench_voice import mock_dashboard_handler, mock_llm_handler, serve
+
+LONG_ANSWER = ("Two people are standing near the entrance and one of them has been there for a few minutes. "
+               "Nothing looks unusual, the doors are closed and no vehicles are in the driveway. "
+               "I will keep watching the entrance and tell you if anything changes.")
+
+ABORT_FIRST, ABORT_SECOND = "describe what the camera sees", "what is the weather like outside"
+PLAY_FIRST, PLAY_SECOND = "should I be worried about anything", "is the front door open"
+HOLD_MARKER = "camera"  # questions the mock LLM holds until the client disconnects
+
+
+# ---------------------------------------------------------------------------
+# Mock LLM that notices disconnects
+# ---------------------------------------------------------------------------
+
+def holding_llm_handler(answer, hold_s, held, closed):
+    """Mock LLM that holds questions containing HOLD_MARKER for up to hold_s,
+    setting held when one arrives and appending to closed when the client
+    drops the connection. Everything else is answered at once."""
+    base = mock_llm_handler(0.0, answer)
+
+    class Handler(base):
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            request = json.loads(self.rfile.read(length) or b"{}")
+            messages = request.get("messages") or [{}]
+            question = (messages[-1].get("content") or "").split("\nContext:")[0].lower()
+            if (request.get("max_tokens") or 150) > 1 and HOLD_MARKER in question:
+                held.set()
+                if self._client_closed(hold_s):
+                    closed.append(time.time())
+                    self.close_connection = True
+                    return
+            self._send({
+                "object": "chat.completion",
+                "model": request.get("model", "mock"),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": answer}}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": len(answer.split())},
+            })
+
+        def _client_closed(self, timeout_s):
+            deadline = time.time() + timeout_s
+            while time.time() < deadline:
+                readable, _, _ = select.select([self.connection], [], [], 0.05)
+                if readable:
+                    try:
+                        return not self.connection.recv(1, socket.MSG_PEEK)
+                    except OSError:
+                        return True
+            return False
+    return Handler
+
+
+# ---------------------------------------------------------------------------
+# Checks
+# ---------------------------------------------------------------------------
+
+def spoken(vs, text, lead_s=0.4):
+    speech = vs.load_wav_samples(vs.synthesize(f"{vs.WAKE_WORD.capitalize()}, {text}."))
+    return vs.np.concatenate([vs.np.zeros(int(vs.SAMPLE_RATE * lead_s), dtype=vs.np.float32), speech])
+
+
+def wait_for(predicate, timeout_s, poll_s=0.02):
+    deadline = time.time() + timeout_s
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(poll_s)
+    return predicate()
+
+
+def check(results, name, ok, detail):
+    results.append(ok)
+    print(f"  {'PASS' if ok else 'FAIL'}  {name}: {detail}")
+
+
+def answered(interactions, text, since):
+    key = text.split()[-1].lower()  # last word survives STT best
+    return next((e for e in list(interactions) if e["timestamp"] >= since and key in e["command"].lower()), None)
+
+
+def run_abort(audio, room, clips, held, closed, cancels, interactions, args, results):
+    print("abort: barge-in while the LLM request is in flight")
+    held.clear()
+    closed.clear()
+    barge_ins = room["barge_ins"]
+    t0 = time.time()
+    audio.feed(clips[ABORT_FIRST])
+    if not held.wait(args.timeout):
+        check(results, "first question reached the LLM", False, f"not within {args.timeout:g}s")
+        return
+    audio.feed(clips[ABORT_SECOND])
+    wait_for(lambda: closed, args.timeout)
+    cancel_t = next((t for t in cancels if t >= t0), None)
+    if closed and cancel_t:
+        detail = f"closed {(closed[0] - cancel_t) * 1000:.0f} ms after the cancel"
+    else:
+        detail = "connection still open" if not closed else "closed without a barge-in"
+    check(results, "mock LLM saw its connection closed", bool(closed and cancel_t), detail)
+    check(results, "barge-in counted", room["barge_ins"] > barge_ins,
+          f"barge_ins {barge_ins} -> {room['barge_ins']}")
+    wait_for(lambda: answered(interactions, ABORT_SECOND, t0), args.timeout)
+    entry = answered(interactions, ABORT_SECOND, t0)
+    check(results, "second command ran", bool(entry),
+          f"heard {entry['command']!r}, source {entry['source']}" if entry else "no interaction recorded")
+
+
+def run_playback(audio, clips, cancels, interactions, args, results):
+    print("playback: barge-in while the answer is playing")
+    t0 = time.time()
+    audio.feed(clips[PLAY_FIRST])
+    if not wait_for(lambda: audio.playing.is_set(), args.timeout):
+        check(results, "first answer started playing", False, f"not within {args.timeout:g}s")
+        return
+    time.sleep(0.5)  # well into the answer
+    audio.feed(clips[PLAY_SECOND])
+    stopped = wait_for(lambda: any(p["cancelled"] and p["start"] >= t0 for p in audio.played), args.timeout)
+    cancel_t = next((t for t in cancels if t >= t0), None)
+    entry = next((p for p in audio.played if p["cancelled"] and p["start"] >= t0), None)
+    if stopped and cancel_t:
+        stop_ms = (entry["end"] - cancel_t) * 1000
+        check(results, "playback stopped within budget", stop_ms <= args.budget_ms,
+              f"{stop_ms:.0f} ms after the cancel (budget {args.budget_ms:g} ms), "
+              f"{entry['end'] - entry['start']:.1f}s of {entry['duration_s']:.1f}s played")
+    else:
+        check(results, "playback stopped within budget", False,
+              "played to the end" if not stopped else "stopped without a barge-in")
+    wait_for(lambda: answered(interactions, PLAY_SECOND, t0), args.timeout)
+    entry = answered(interactions, PLAY_SECOND, t0)
+    check(results, "second command ran", bool(entry),
+          f"heard {entry['command']!r}, source {entry['source']}" if entry else "no interaction recorded")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline voice barge-in check")
+    parser.add_argument("--budget-ms", type=float, default=100.0, help="max cancel -> playback stop (ms)")
+    parser.add_argument("--hold", type=float, default=20.0, help="how long the mock LLM holds a request (s)")
+    parser.add_argument("--timeout", type=float, default=60.0, help="per-step timeout (s)")
+    args = parser.parse_args()
+
+    held, closed = threading.Event(), []
+    _, base = serve(holding_llm_handler(LONG_ANSWER, args.hold, held, closed))
+    llm_url = f"{base}/v1/chat/completions"
+    _, dashboard = serve(mock_dashboard_handler())
+
+    # voice_server reads its config at import time
+    os.environ.update({
+        "LLM_URL": llm_url,
+        "LLM_LOCAL_URL": llm_url,
+        "INSIGHTS_BRIEF_URL": f"{dashboard}/api/insights/brief",
+        "EVENTS_URL": f"{dashboard}/api/events?limit=1",
+        "SENSOR_SUBSCRIBE": "0",
+        "AUDIO_ROOMS": "room1=replay",
+        "LLM_CACHE": "0",
+    })
+    import voice_server as vs
+
+    class TracedAudio(vs.FileAudioIO):
+        def __init__(self):
+            super().__init__(speed=1.0)
+            self.playing = threading.Event()
+
+        def play(self, wav_bytes, cancel=None):
+            self.playing.set()
+            try:
+                super().play(wav_bytes, cancel)
+            finally:
+                self.playing.clear()
+
+    cancels = []
+    cancel_command = vs.cancel_command
+
+    def traced_cancel(room=None):
+        t = time.time()
+        if cancel_command(room):
+            cancels.append(t)
+            return True
+        return False
+
+    vs.cancel_command = traced_cancel
+    interactions = []
+    vs.interaction_listeners.append(interactions.append)
+
+    audio = TracedAudio()
+    room = vs.rooms["room1"]
+    vs.audio_io_factory = lambda r: audio
+    vs.assistant_running = True
+    assistant = threading.Thread(target=vs.assistant_loop, daemon=True)
+    assistant.start()
+    for name in ("vad", "stt", "tts"):
+        if not vs.wait_model(name, timeout=300):
+            raise SystemExit(f"model {name} failed to load")
+
+    clips = {text: spoken(vs, text) for text in (ABORT_FIRST, ABORT_SECOND, PLAY_FIRST, PLAY_SECOND)}
+    while vs.startup_stats["listening_s"] is None:
+        time.sleep(0.1)
+    time.sleep(1.0)  # let the greeting finish
+    audio.played.clear()
+
+    results = []
+    run_abort(audio, room, clips, held, closed, cancels, interactions, args, results)
+    time.sleep(0.5)
+    run_playback(audio, clips, cancels, interactions, args, results)
+    vs.assistant_running = False
+    assistant.join(timeout=5)
+
+    print(f"{sum(results)}/{len(results)} checks passed")
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark for the voice server model warm-up.
+
+Each round runs in a fresh process so nothing is cached in memory. Two modes
+are measured:
+  serial   — every STARTUP_MODELS entry loaded one after another (the old
+             behaviour: nothing listens until everything is loaded)
+  parallel — start_model_warmup(); "listening" as soon as VAD is ready
+
+Audio devices are not opened; "listening" is the point where the assistant
+loop would start reading from the microphone.
+
+Run on the Orange Pi (same venv as voice_server.py):
+  python3 bench_startup.py [--rounds 3] [--skip-llm]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+
+def child(mode, skip_llm):
+    t_import = time.time()
+    import voice_server as vs
+    import_s = time.time() - t_import
+
+    if skip_llm:
+        vs.STARTUP_MODELS = [(n, fn) for n, fn in vs.STARTUP_MODELS if n != "llm"]
+
+    t0 = time.time()
+    if mode == "serial":
+        timings = {}
+        for name, fn in vs.STARTUP_MODELS:
+            t = time.time()
+            fn()
+            timings[name] = round(time.time() - t, 2)
+        listening_s = all_ready_s = time.time() - t0
+    else:
+        vs.start_model_warmup()
+        vs.wait_model("vad")
+        listening_s = time.time() - t0
+        for name, _ in vs.STARTUP_MODELS:
+            vs.wait_model(name)
+        all_ready_s = time.time() - t0
+        timings = {name: st["load_s"] for name, st in vs.model_status.items()}
+
+    print(json.dumps({
+        "import_s": round(import_s, 2),
+        "listening_s": round(listening_s, 2),
+        "all_ready_s": round(all_ready_s, 2),
+        "models": timings,
+    }))
+
+
+def run_round(mode, skip_llm):
+    cmd = [sys.executable, os.path.abspath(__file__), "--child", mode]
+    if skip_llm:
+        cmd.append("--skip-llm")
+    out = subprocess.run(cmd, capture_output=True, text=True, check=True,
+                         cwd=os.path.dirname(os.path.abspath(__file__)))
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Voice server cold-start benchmark")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--skip-llm", action="store_true", help="don't start llama-server")
+    parser.add_argument("--child", choices=["serial", "parallel"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.skip_llm)
+        return
+
+    for mode in ("serial", "parallel"):
+        rounds = [run_round(mode, args.skip_llm) for _ in range(args.rounds)]
+        listening = statistics.median(r["listening_s"] for r in rounds)
+        ready = statistics.median(r["all_ready_s"] for r in rounds)
+        print(f"{mode:9} cold start → listening {listening:5.2f}s   all models ready {ready:5.2f}s")
+        for name in rounds[-1]["models"]:
+            loads = [r["models"].get(name) for r in rounds if r["models"].get(name) is not None]
+            if loads:
+                print(f"            {name:4} load {statistics.median(loads):5.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+STT throughput benchmark for the recognizer pool.
+
+Each pool configuration (recognizers x ONNX threads) runs in a fresh process
+with STT_POOL_SIZE / STT_THREADS set, and is driven at several concurrency
+levels: N callers transcribe corpus clips back to back for --seconds. For
+every level it reports utterances/s, audio seconds decoded per second,
+per-utterance latency p50/p95 and real-time factor from stt_snapshot().
+
+Clips are the voice_corpus.tsv questions spoken by the node's Piper voice
+(or any WAVs passed with --wav).
+
+Run on the Orange Pi (same venv as voice_server.py):
+  python3 bench_stt.py [--configs 1x4,2x2,4x1] [--concurrency 1,2,4,8]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def load_clips(vs, wavs):
+    if wavs:
+        return [vs.load_wav_samples(path) for path in wavs]
+    from bench_voice import load_corpus
+    rows = load_corpus(os.path.join(HERE, "voice_corpus.tsv"))
+    return [vs.load_wav_samples(vs.synthesize(f"Security, {row['text']}.")) for row in rows]
+
+
+def drive(vs, clips, callers, seconds):
+    latencies = []
+    audio_s = [0.0]
+    count_lock = threading.Lock()
+    stop_at = time.time() + seconds
+
+    def caller(offset):
+        i = offset
+        while time.time() < stop_at:
+            clip = clips[i % len(clips)]
+            t0 = time.time()
+            vs.transcribe(clip)
+            with count_lock:
+                latencies.append(time.time() - t0)
+                audio_s[0] += len(clip) / vs.SAMPLE_RATE
+            i += callers
+
+    t0 = time.time()
+    threads = [threading.Thread(target=caller, args=(n,)) for n in range(callers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.time() - t0
+    return {
+        "callers": callers,
+        "utt_per_s": round(len(latencies) / wall, 2),
+        "audio_s_per_s": round(audio_s[0] / wall, 2),
+        "latency_p50_ms": round(percentile(latencies, 50) * 1000),
+        "latency_p95_ms": round(percentile(latencies, 95) * 1000),
+    }
+
+
+def child(args):
+    import voice_server as vs
+    vs.start_stt_service()
+    clips = load_clips(vs, args.wav)
+    vs.transcribe(clips[0])  # first decode allocates arenas
+    levels = []
+    for callers in [int(c) for c in args.concurrency.split(",")]:
+        before = vs.stt_snapshot()
+        result = drive(vs, clips, callers, args.seconds)
+        after = vs.stt_snapshot()
+        batches = after["batches"] - before["batches"]
+        result["avg_batch"] = round((after["utterances"] - before["utterances"]) / batches, 2) if batches else None
+        result["rtf_p50"] = after["rtf_p50"]
+        result["rtf_p95"] = after["rtf_p95"]
+        levels.append(result)
+    print(json.dumps(levels))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="STT recognizer pool benchmark")
+    parser.add_argument("--configs", default="1x4,2x2,4x1", help="pool x threads, comma separated")
+    parser.add_argument("--concurrency", default="1,2,4,8")
+    parser.add_argument("--seconds", type=float, default=20.0, help="per concurrency level")
+    parser.add_argument("--batch-max", type=int, help="override STT_BATCH_MAX")
+    parser.add_argument("--wav", action="append", help="clip to transcribe (repeatable)")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args)
+        return
+
+    for config in args.configs.split(","):
+        pool, _, threads = config.partition("x")
+        env = dict(os.environ, STT_POOL_SIZE=pool, STT_THREADS=threads or "1")
+        if args.batch_max:
+            env["STT_BATCH_MAX"] = str(args.batch_max)
+        cmd = [sys.executable, os.path.abspath(__file__), "--child",
+               "--concurrency", args.concurrency, "--seconds", str(args.seconds)]
+        for wav in args.wav or []:
+            cmd += ["--wav", os.path.abspath(wav)]
+        out = subprocess.run(cmd, capture_output=True, text=True, check=True, env=env, cwd=HERE)
+        levels = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f"pool {pool} x {threads or 1} threads (cpus {env.get('STT_CPUS', '0-3')})")
+        for r in levels:
+            print(f"  {r['callers']:2} callers: {r['utt_per_s']:5.2f} utt/s  {r['audio_s_per_s']:5.2f} audio s/s  "
+                  f"latency p50 {r['latency_p50_ms']:5} ms p95 {r['latency_p95_ms']:5} ms  "
+                  f"batch {r['avg_batch']}  RTF p50 {r['rtf_p50']} p95 {r['rtf_p95']}")
+        steady = [r["audio_s_per_s"] for r in levels if r["callers"] >= int(pool)]
+        if len(steady) > 1:
+            print(f"  throughput spread at >= {pool} callers: {min(steady):.2f}–{max(steady):.2f} audio s/s "
+                  f"(stdev {statistics.pstdev(steady):.2f})")
+
+
+if __name__ == "__main__":
+    main()
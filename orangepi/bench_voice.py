@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Offline replay benchmark for the full voice pipeline.
+
+Replays a labelled corpus through the real assistant loop (VAD, Parakeet
+STT, intent router, context fetch, LLM, Piper TTS) without a headset, a
+dashboard or the Spark:
+  - audio in/out goes through voice_server.FileAudioIO (clips are streamed
+    at --speed x real time, answers land in a capture sink)
+  - the LLM is a mock OpenAI-compatible server with a fixed --llm-delay
+  - the dashboard is a mock serving a canned brief and event
+
+Per-stage latency (VAD endpointing and compute, STT, intent, context fetch,
+LLM, TTS, playback) and end-to-end p50/p95 are reported, where end-to-end is
+the end of the spoken clip to the first answer audio. With --rooms N every
+clip is spoken into N simulated rooms at once, which exercises the shared
+STT/TTS/LLM queues and reports concurrent wake events handled per second.
+
+Corpus format (TSV, '#' comments): expected_intent<TAB>transcript[<TAB>wav]
+where expected_intent "none" means the command should reach the LLM. Rows
+without a WAV are spoken as "Security, <transcript>." by the node's own
+Piper voice.
+
+Run on the Orange Pi (same venv as voice_server.py):
+  python3 bench_voice.py [voice_corpus.tsv] [--speed 1] [--llm-delay 1.0] [--rooms 1]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+MOCK_BRIEF = {
+    "alert_level": "guarded",
+    "risk_score": 27,
+    "person_count": 2,
+    "nearest_person_m": 1.84,
+    "objects_of_interest": [],
+    "scene_summary": "Two people are standing near the entrance.",
+    "last_event": "Person count changed to 2",
+}
+MOCK_EVENTS = {"events": [{"message": "Person count changed to 2", "timestamp": 0}]}
+MOCK_ANSWER = "Two people are near the entrance and nothing looks unusual."
+
+STAGES = ["vad", "vad_cpu", "stt", "intent", "context", "llm", "tts", "playback"]
+
+
+# ---------------------------------------------------------------------------
+# Mock services
+# ---------------------------------------------------------------------------
+
+class _JsonHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real servers
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _send(self, obj, status=200):
+        body = json.dumps(obj).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def mock_llm_handler(delay_s, answer):
+    class Handler(_JsonHandler):
+        def do_GET(self):
+            if self.path.endswith("/models"):
+                self._send({"object": "list", "data": [{"id": "mock"}]})
+            elif self.path == "/health":
+                self._send({"status": "ok"})
+            else:
+                self._send({"error": "not found"}, 404)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            request = json.loads(self.rfile.read(length) or b"{}")
+            max_tokens = request.get("max_tokens") or 150
+            time.sleep(delay_s if max_tokens > 1 else 0.0)  # keep-alive probes are instant
+            self._send({
+                "object": "chat.completion",
+                "model": request.get("model", "mock"),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": answer}}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": len(answer.split())},
+            })
+    return Handler
+
+
+def mock_dashboard_handler():
+    class Handler(_JsonHandler):
+        def do_GET(self):
+            if self.path.startswith("/api/insights/brief"):
+                self._send(MOCK_BRIEF)
+            elif self.path.startswith("/api/events"):
+                self._send(MOCK_EVENTS)
+            else:
+                self._send({"error": "not found"}, 404)
+    return Handler
+
+
+def serve(handler):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+# ---------------------------------------------------------------------------
+# Corpus
+# ---------------------------------------------------------------------------
+
+def load_corpus(path):
+    rows = []
+    base = os.path.dirname(os.path.abspath(path))
+    with open(path) as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if not line.strip() or line.lstrip().startswith("#"):
+                continue
+            cols = [c.strip() for c in line.split("\t")]
+            expected, text = cols[0], cols[1]
+            wav = os.path.join(base, cols[2]) if len(cols) > 2 and cols[2] else None
+            rows.append({"expected": None if expected == "none" else expected, "text": text, "wav": wav})
+    return rows
+
+
+def clip_for(vs, row, lead_s=0.4):
+    """Clip samples with a little leading silence, as a mic would hear it."""
+    if row["wav"]:
+        speech = vs.load_wav_samples(row["wav"])
+    else:
+        speech = vs.load_wav_samples(vs.synthesize(f"{vs.WAKE_WORD.capitalize()}, {row['text']}."))
+    lead = vs.np.zeros(int(vs.SAMPLE_RATE * lead_s), dtype=vs.np.float32)
+    return vs.np.concatenate([lead, speech])
+
+
+# ---------------------------------------------------------------------------
+# Replay
+# ---------------------------------------------------------------------------
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def replay(vs, audios, rows, clips, timeout_s):
+    """Speak each clip into every room at once; wait for every room's answer."""
+    done = threading.Event()
+    latest = {}
+    latest_lock = threading.Lock()
+
+    def on_interaction(entry):
+        with latest_lock:
+            latest[entry["room"]] = entry
+            if len(latest) == len(audios):
+                done.set()
+
+    vs.interaction_listeners.append(on_interaction)
+    results = []
+    busy_s = 0.0
+    for i, (row, clip) in enumerate(zip(rows, clips)):
+        done.clear()
+        with latest_lock:
+            latest.clear()
+        t0 = time.time()
+        for audio in audios.values():
+            audio.feed(clip, clip_id=i)
+        done.wait(timeout_s)
+        busy_s += time.time() - t0
+        with latest_lock:
+            entries = dict(latest)
+        for room, audio in audios.items():
+            results.append(_result(row, room, entries.get(room), audio.clip_ends.get(i)))
+        answered = [r for r in results[-len(audios):] if not r["timed_out"]]
+        e2e = max((r.get("e2e_s", 0) for r in answered), default=0)
+        status = f"{len(answered)}/{len(audios)} rooms, worst {e2e * 1000:6.0f} ms"
+        print(f"  [{i + 1:3}/{len(rows)}] {status:32} {row['text']}")
+        time.sleep(0.3)  # idle mic between questions
+    vs.interaction_listeners.remove(on_interaction)
+    return results, busy_s
+
+
+def _result(row, room, entry, clip_end):
+    result = {"expected": row["expected"], "text": row["text"], "room": room, "timed_out": entry is None}
+    if entry is None:
+        return result
+    stages = dict(entry.get("stages") or {})
+    stages["vad_cpu"] = stages.pop("vad", 0.0)
+    heard_at = entry.get("heard_at")
+    if clip_end is not None and heard_at and entry.get("latency_s") is not None:
+        # Endpointing: clip end → utterance cut (trailing-silence window)
+        stages["vad"] = max(0.0, heard_at - clip_end)
+        result["e2e_s"] = heard_at + entry["latency_s"] - clip_end
+        result["total_s"] = entry["timestamp"] - clip_end
+    result.update({
+        "heard": entry["command"],
+        "source": entry["source"],
+        "intent": entry.get("intent"),
+        "stages": stages,
+        "response": entry["response"],
+    })
+    return result
+
+
+def report(results, busy_s, rooms):
+    answered = [r for r in results if not r["timed_out"]]
+    print()
+    print(f"{'stage':10} {'n':>4} {'mean ms':>9} {'p50 ms':>8} {'p95 ms':>8}")
+    for stage in STAGES:
+        values = [r["stages"][stage] * 1000 for r in answered if stage in r["stages"]]
+        if values:
+            print(f"{stage:10} {len(values):4} {statistics.mean(values):9.1f} "
+                  f"{percentile(values, 50):8.1f} {percentile(values, 95):8.1f}")
+    for key, label in (("e2e_s", "end-to-end (speech end → answer audio)"),
+                       ("total_s", "total (speech end → answer finished)")):
+        values = [r[key] * 1000 for r in answered if key in r]
+        if values:
+            print(f"{label}: p50 {percentile(values, 50):.0f} ms  p95 {percentile(values, 95):.0f} ms")
+
+    routed = sum(1 for r in answered if (r["intent"] if r["source"] == "intent" else None) == r["expected"])
+    print(f"answered {len(answered)}/{len(results)}   correct route {routed}/{len(answered)}")
+    if busy_s:
+        print(f"{rooms} room(s): {len(answered) / busy_s:.2f} wake events handled/s while busy")
+    for r in answered:
+        got = r["intent"] if r["source"] == "intent" else None
+        if got != r["expected"]:
+            print(f"  route miss: expected {r['expected'] or 'none'}, got {got or r['source']}: heard {r['heard']!r}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline voice pipeline replay benchmark")
+    parser.add_argument("corpus", nargs="?", default=os.path.join(HERE, "voice_corpus.tsv"))
+    parser.add_argument("--speed", type=float, default=1.0, help="input/playback speed vs real time")
+    parser.add_argument("--llm-delay", type=float, default=1.0, help="mock LLM response time (s)")
+    parser.add_argument("--llm-url", help="use a real chat completions URL instead of the mock")
+    parser.add_argument("--dashboard-url", help="use a real dashboard instead of the mock")
+    parser.add_argument("--llm-cache", action="store_true", help="leave the LLM response cache on")
+    parser.add_argument("--rooms", type=int, default=1, help="simulated rooms speaking each clip at once")
+    parser.add_argument("--limit", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=60.0, help="per-question timeout (s)")
+    parser.add_argument("--out-dir", help="write each captured answer WAV here")
+    parser.add_argument("--json", help="write per-question results to this file")
+    args = parser.parse_args()
+
+    llm_url = args.llm_url
+    if not llm_url:
+        _, base = serve(mock_llm_handler(args.llm_delay, MOCK_ANSWER))
+        llm_url = f"{base}/v1/chat/completions"
+    dashboard = args.dashboard_url
+    if not dashboard:
+        _, dashboard = serve(mock_dashboard_handler())
+
+    # voice_server reads its config at import time
+    os.environ.update({
+        "LLM_URL": llm_url,
+        "LLM_LOCAL_URL": llm_url,
+        "INSIGHTS_BRIEF_URL": f"{dashboard}/api/insights/brief",
+        "EVENTS_URL": f"{dashboard}/api/events?limit=1",
+        "SENSOR_SUBSCRIBE": "0",
+        "AUDIO_ROOMS": ",".join(f"room{n + 1}=replay" for n in range(args.rooms)),
+    })
+    if not args.llm_cache:
+        os.environ["LLM_CACHE"] = "0"
+    import voice_server as vs
+
+    rows = load_corpus(args.corpus)
+    if args.limit:
+        rows = rows[:args.limit]
+
+    audios = {name: vs.FileAudioIO(speed=args.speed) for name in vs.rooms}
+    vs.audio_io_factory = lambda room: audios[room["name"]]
+    vs.assistant_running = True
+    assistant = threading.Thread(target=vs.assistant_loop, daemon=True)
+    assistant.start()
+    for name in ("vad", "stt", "tts"):
+        if not vs.wait_model(name, timeout=300):
+            raise SystemExit(f"model {name} failed to load")
+
+    print(f"Preparing {len(rows)} clips...")
+    clips = [clip_for(vs, row) for row in rows]
+    while vs.startup_stats["listening_s"] is None:
+        time.sleep(0.1)
+    time.sleep(1.0)  # let the greeting finish
+    for audio in audios.values():
+        audio.played.clear()
+
+    print(f"Replaying at {args.speed:g}x into {len(audios)} room(s), "
+          f"LLM {'mock ' + str(args.llm_delay) + 's' if not args.llm_url else llm_url}")
+    results, busy_s = replay(vs, audios, rows, clips, args.timeout)
+    vs.assistant_running = False
+    assistant.join(timeout=5)
+
+    report(results, busy_s, len(audios))
+
+    if args.out_dir:
+        os.makedirs(args.out_dir, exist_ok=True)
+        for name, audio in audios.items():
+            for i, played in enumerate(audio.played):
+                with open(os.path.join(args.out_dir, f"{name}_answer_{i:03}.wav"), "wb") as f:
+                    f.write(played["wav"])
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
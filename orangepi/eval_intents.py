@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Offline evaluation of the voice intent router.
+
+Replays a transcript corpus through match_intent() and reports match rate,
+false positives and per-call matcher latency, next to the original
+first-substring-hit matcher for comparison.
+
+Corpus format (TSV, '#' comments): expected_intent<TAB>transcript, where
+expected_intent "none" means the command should fall through to the LLM.
+
+Run on the Orange Pi (same venv as voice_server.py):
+  python3 eval_intents.py [intent_corpus.tsv] [--intents intents.json]
+"""
+
+import argparse
+import os
+import time
+
+import voice_server as vs
+
+
+def load_corpus(path):
+    rows = []
+    with open(path) as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if not line.strip() or line.lstrip().startswith("#"):
+                continue
+            expected, _, text = line.partition("\t")
+            expected = expected.strip()
+            rows.append((None if expected == "none" else expected, text.strip()))
+    return rows
+
+
+def legacy_match_intent(command, patterns):
+    """The pre-compiled matcher: first substring hit in list order."""
+    lower = command.lower().strip()
+    for intent_key, phrases in patterns:
+        for phrase in phrases:
+            if phrase in lower:
+                return intent_key
+    return None
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def evaluate(rows, matcher, repeats):
+    correct = 0
+    hits = 0
+    false_pos = 0
+    missed = 0
+    latencies_us = []
+    failures = []
+    for expected, text in rows:
+        got = None
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            got = matcher(text)
+            latencies_us.append((time.perf_counter() - t0) * 1e6)
+        if got == expected:
+            correct += 1
+            hits += expected is not None
+            continue
+        if expected is None:
+            false_pos += 1
+        elif got is None:
+            missed += 1
+        failures.append((expected, got, text))
+    positives = sum(1 for expected, _ in rows if expected is not None)
+    return {
+        "accuracy": correct / max(len(rows), 1),
+        "match_rate": hits / max(positives, 1),
+        "false_positives": false_pos,
+        "missed": missed,
+        "p50_us": percentile(latencies_us, 50),
+        "p95_us": percentile(latencies_us, 95),
+        "max_us": max(latencies_us) if latencies_us else 0.0,
+        "failures": failures,
+    }
+
+
+def report(name, res):
+    print(f"{name}")
+    print(f"  accuracy        {res['accuracy'] * 100:5.1f}%")
+    print(f"  match rate      {res['match_rate'] * 100:5.1f}%  (intent queries answered by the right intent)")
+    print(f"  missed → LLM    {res['missed']}")
+    print(f"  false positives {res['false_positives']}")
+    print(f"  latency         p50 {res['p50_us']:.1f}us  p95 {res['p95_us']:.1f}us  max {res['max_us']:.1f}us")
+    for expected, got, text in res["failures"]:
+        print(f"    ✗ {text!r}: expected {expected or 'none'}, got {got or 'none'}")
+    print()
+
+
+def main():
+    here = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Evaluate the voice intent router")
+    parser.add_argument("corpus", nargs="?", default=os.path.join(here, "intent_corpus.tsv"))
+    parser.add_argument("--intents", help="intents JSON file (default: the server's patterns)")
+    parser.add_argument("--repeats", type=int, default=20, help="timing repeats per transcript")
+    args = parser.parse_args()
+
+    if args.intents:
+        vs.compile_intents(vs.load_intent_patterns(args.intents))
+    patterns = list(vs.INTENT_PATTERNS)
+    rows = load_corpus(args.corpus)
+    print(f"{len(rows)} transcripts from {args.corpus}, {len(patterns)} intents\n")
+
+    report("legacy substring matcher", evaluate(rows, lambda t: legacy_match_intent(t, patterns), args.repeats))
+    report("compiled + fuzzy matcher", evaluate(rows, vs.match_intent, args.repeats))
+
+
+if __name__ == "__main__":
+    main()
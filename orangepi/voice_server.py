@@ -5,29 +5,49 @@ Orange Pi voice assistant node for LocalGuard.
 Listens for wake word "Security" via continuous STT, then records a command,
 sends it to the local LLM, and speaks the response.
 
+Several microphones can run at once (AUDIO_ROOMS); each room has its own
+wake-word listener and VAD, and all rooms share the STT pool, Piper and the
+LLM through priority queues.
+
 Serves:
   GET /health   — health check
-  GET /status   — current assistant state + recent interactions
+  GET /status   — current assistant state + recent interactions, per room
   POST /start   — start the wake word listener
   POST /stop    — stop the wake word listener
 
 Run on the Orange Pi:
   cd ~/voice-assistant && source ~/voice-assistant-venv/bin/activate
   python3 voice_server.py
+
+Audio goes through audio_io_factory (PyAudioIO on the headset by default);
+bench_voice.py swaps in FileAudioIO to replay WAVs without hardware.
 """
 
 import io
 import os
+import re
 import time
 import wave
 import json
+import difflib
+import functools
+import hashlib
+import heapq
+import http.client
+import itertools
+import urllib.parse
 import urllib.request
+import queue
+import socket
 import threading
 import subprocess
+import contextlib
 import numpy as np
 import pyaudio
 import sherpa_onnx
-from collections import deque
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor
+from concurrent.futures import wait as futures_wait
 from flask import Flask, jsonify, request
 
 app = Flask(__name__)
@@ -39,9 +59,14 @@ WAKE_WORD = "security"
 
 # Audio
 AUDIO_DEVICE_NAME = "Blackwire"  # partial match for USB headset
+# One listener per room: "name=device[@n],..." where device is a partial name
+# match and @n picks the nth match (0-based) among identical headsets
+AUDIO_ROOMS = os.getenv("AUDIO_ROOMS", f"main={AUDIO_DEVICE_NAME}")
 SAMPLE_RATE = 16000
 CHANNELS = 1
 CHUNK = 512  # samples per read (~32ms at 16kHz)
+PLAYBACK_CHUNK = 512  # frames per output write; bounds barge-in stop latency
+CAPTURE_QUEUE_S = 5.0  # mic audio buffered between capture and listener
 
 # Models
 MODEL_DIR = os.path.expanduser("~/voice-assistant/models")
@@ -49,13 +74,53 @@ PARAKEET_DIR = os.path.join(MODEL_DIR, "sherpa-onnx-nemo-parakeet-tdt-0.6b-v2-in
 VAD_MODEL = os.path.join(MODEL_DIR, "silero_vad.onnx")
 PIPER_VOICE = os.path.join(MODEL_DIR, "piper-voices", "en_US-amy-low.onnx")
 
+# STT service — recognizer pool kept off the llama-server cores
+STT_POOL_SIZE = int(os.getenv("STT_POOL_SIZE", "2"))   # recognizers, one worker thread each
+STT_THREADS = int(os.getenv("STT_THREADS", "2"))       # ONNX threads per recognizer
+STT_CPUS = os.getenv("STT_CPUS", "0-3")                # affinity for STT workers ("" = any)
+STT_PRECISION = os.getenv("STT_PRECISION", "int8")     # int8 or fp32 Parakeet weights
+STT_BATCH_MAX = int(os.getenv("STT_BATCH_MAX", "4"))   # queued utterances per decode_streams
+LLM_CPUS = os.getenv("LLM_CPUS", "4-7")                # taskset for the local llama-server
+
+# Shared-backend priorities, lower runs first (STT queue, Piper and LLM gates)
+PRIORITY_COMMAND = 0     # work for a command someone is waiting on
+PRIORITY_LISTEN = 1      # STT of utterances scanned for the wake word
+PRIORITY_BACKGROUND = 2  # cache warm-up
+LLM_MAX_INFLIGHT = int(os.getenv("LLM_MAX_INFLIGHT", "2"))  # concurrent LLM queries across rooms
+
+# TTS cache (set TTS_CACHE_DIR="" to keep the cache in memory only)
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", os.path.join(MODEL_DIR, "tts-cache"))
+TTS_CACHE_MAX_ENTRIES = int(os.getenv("TTS_CACHE_MAX_ENTRIES", "256"))
+TTS_FRAGMENT_GAP_S = 0.06  # pause inserted between joined fragments
+TTS_WARM_NUMBERS = 101     # pre-synthesize "0".."100" for counts and risk scores
+TTS_WARM_METERS = 5.0      # and "0.0".."5.0" for distances (see spoken_meters)
+GREETING_PHRASE = "Local Guard voice assistant online."
+ACK_PHRASE = "Yes?"
+
 # LLM (OpenAI-compatible API — defaults to remote Nemotron on Spark)
 LLM_URL = os.getenv("LLM_URL", "http://192.168.50.2:8003/v1/chat/completions")
 LLM_MODEL = os.getenv("LLM_MODEL", "nemotron")
+# On-device llama-server used as failover/hedge target (set LLM_LOCAL_URL="" to disable)
+LLM_LOCAL_URL = os.getenv("LLM_LOCAL_URL", "http://127.0.0.1:8081/v1/chat/completions")
+LLM_LOCAL_MODEL = os.getenv("LLM_LOCAL_MODEL", "qwen3-1.7b")
+LLM_HEDGE_AFTER_S = float(os.getenv("LLM_HEDGE_AFTER_S", "6.0"))  # then also ask the next backend
+LLM_KEEPALIVE_S = 30.0     # health probe / local keep-alive prompt cadence
+LLM_DOWN_BACKOFF_S = 5.0   # first back-off after repeated failures, doubles up to 60s
 SYSTEM_PROMPT = (
     "You are a security assistant for LocalGuard, a distributed edge AI monitoring "
     "system. Answer concisely in 1-3 sentences. Be direct and helpful."
 )
+# Static instructions appended to the system prompt. Everything before the
+# user turn is byte-identical across queries so the server can reuse its KV
+# cache; the volatile sensor readings go in a suffix after the question.
+CONTEXT_INSTRUCTIONS = (
+    "Requests may end with a line 'Context: ...' holding live sensor readings "
+    "(level = alert level, risk = 0-100 score, people = person count, nearest = "
+    "closest person distance, objects = restricted objects, scene, event). "
+    "Ground your answer in it when relevant."
+)
+LLM_PROMPT_CACHE = os.getenv("LLM_PROMPT_CACHE", "1") != "0"  # cache_prompt/id_slot on llama-server
+LLM_SLOT_ID = int(os.getenv("LLM_SLOT_ID", "0"))               # slot pinned for voice queries
 INSIGHTS_BRIEF_URL = os.getenv(
     "INSIGHTS_BRIEF_URL",
     "http://192.168.50.1:3000/api/insights/brief",
@@ -64,8 +129,36 @@ EVENTS_URL = os.getenv(
     "EVENTS_URL",
     "http://192.168.50.1:3000/api/events?limit=1",
 )
-INSIGHTS_TIMEOUT_S = 1.2
-INSIGHTS_CACHE_TTL_S = 2.0
+SENSOR_STREAM_URL = os.getenv(
+    "SENSOR_STREAM_URL",
+    "http://192.168.50.1:3000/api/insights/stream",
+)
+JETSON_DETECTIONS_URL = os.getenv("JETSON_DETECTIONS_URL", "http://192.168.50.4:8080/detections")
+SPARK_DETECTIONS_URL = os.getenv("SPARK_DETECTIONS_URL", "http://192.168.50.2:8090/detections")
+SENSOR_SUBSCRIBE = os.getenv("SENSOR_SUBSCRIBE", "1") != "0"
+SENSOR_STALE_S = 3.0             # pushed snapshot older than this is not trusted
+SENSOR_READ_TIMEOUT_S = 10.0     # dashboard sends a heartbeat every ~2s
+SENSOR_LOCAL_POLL_S = 1.0        # fallback fusion cadence while the stream is down
+SENSOR_BACKOFF_MAX_S = 8.0
+INSIGHTS_TIMEOUT_S = 1.2   # overall deadline for one round of dashboard fetches
+INSIGHTS_CACHE_TTL_S = 2.0  # freshness window for cached brief/events
+LLM_TIMEOUT_S = 45
+LLM_ERROR_PREFIX = "Sorry, I couldn't process that."
+
+# LLM response cache (near-duplicate questions under the same bucketed context)
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE", "1") != "0"
+LLM_CACHE_TTL_S = float(os.getenv("LLM_CACHE_TTL_S", "60"))
+LLM_CACHE_MAX_ENTRIES = 64
+LLM_CACHE_TOKEN_MIN_SIM = 0.75   # content-word Jaccard for a near-duplicate
+LLM_CACHE_EMBED_MIN_SIM = 0.9    # cosine, when an embedding model is configured
+LLM_CACHE_EMBED_DIR = os.getenv("LLM_CACHE_EMBED_DIR", "")  # e.g. all-MiniLM-L6-v2 ONNX export
+LLM_WARM_TTL_S = 30.0      # re-warm the LLM connection at most this often
+HTTP_POOL_MAX_IDLE = 4     # idle keep-alive connections kept per host
+
+# Intent router (INTENTS_FILE overrides the built-in INTENT_PATTERNS)
+INTENTS_FILE = os.getenv("INTENTS_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "intents.json"))
+INTENT_FUZZY_TOKEN_MIN = 0.8  # per-token similarity needed for a fuzzy phrase hit
+INTENT_MIN_SCORE = 0.9        # a single near-exact token is enough
 
 # Timing
 SILENCE_AFTER_WAKE = 0.8   # seconds of silence before stopping command recording
@@ -77,28 +170,41 @@ MAX_COMMAND_DURATION = 10.0  # max seconds to record a command
 lock = threading.Lock()
 assistant_running = False
 assistant_thread = None
-current_state = "idle"  # idle, listening, recording, thinking, speaking
-interactions = deque(maxlen=10)
+current_state = "idle"  # busiest room: idle, listening, recording, thinking, speaking
+interactions = deque(maxlen=10)  # all rooms, newest last
+interaction_listeners = []  # callables(entry), e.g. the offline replay bench
 llm_server_proc = None
-cached_context = ""
-cached_context_ts = 0.0
+
+
+class CommandCancelled(Exception):
+    """Raised inside a command worker once its cancellation token is set."""
+
+# Model singletons are loaded by startup warm-up threads and lazily on first
+# use; one lock per model keeps a concurrent caller from loading it twice.
+_model_locks = {"stt": threading.Lock(), "vad": threading.Lock(), "tts": threading.Lock()}
 
 # ---------------------------------------------------------------------------
 # Audio helpers
 # ---------------------------------------------------------------------------
 
-def find_audio_device(pa):
-    """Find the USB headset device index."""
+def find_audio_device(pa, name=AUDIO_DEVICE_NAME, occurrence=0):
+    """Find the USB headset device index (the occurrence-th input match)."""
     for i in range(pa.get_device_count()):
         info = pa.get_device_info_by_index(i)
-        if AUDIO_DEVICE_NAME.lower() in info["name"].lower():
+        if name.lower() in info["name"].lower():
             if info["maxInputChannels"] > 0:
-                return i
+                if occurrence == 0:
+                    return i
+                occurrence -= 1
     return None
 
 
-def play_wav(pa, wav_bytes, device_index):
-    """Play WAV audio bytes through the headset."""
+def play_wav(pa, wav_bytes, device_index, cancel=None):
+    """Play WAV audio bytes through the headset.
+
+    Writes small chunks and stops early once cancel (threading.Event) is set,
+    so playback ends within a couple of buffers of a barge-in.
+    """
     buf = io.BytesIO(wav_bytes)
     with wave.open(buf, "rb") as wf:
         stream = pa.open(
@@ -107,77 +213,448 @@ def play_wav(pa, wav_bytes, device_index):
             rate=wf.getframerate(),
             output=True,
             output_device_index=device_index,
+            frames_per_buffer=PLAYBACK_CHUNK,
         )
-        data = wf.readframes(1024)
-        while data:
-            stream.write(data)
-            data = wf.readframes(1024)
-        stream.stop_stream()
-        stream.close()
+        try:
+            data = wf.readframes(PLAYBACK_CHUNK)
+            while data:
+                if cancel is not None and cancel.is_set():
+                    break
+                stream.write(data)
+                data = wf.readframes(PLAYBACK_CHUNK)
+        finally:
+            stream.stop_stream()
+            stream.close()
 
 
-def find_output_device(pa):
-    """Find the USB headset output device index."""
+def find_output_device(pa, name=AUDIO_DEVICE_NAME, occurrence=0):
+    """Find the USB headset output device index (the occurrence-th output match)."""
     for i in range(pa.get_device_count()):
         info = pa.get_device_info_by_index(i)
-        if AUDIO_DEVICE_NAME.lower() in info["name"].lower():
+        if name.lower() in info["name"].lower():
             if info["maxOutputChannels"] > 0:
-                return i
+                if occurrence == 0:
+                    return i
+                occurrence -= 1
     return None
 
 
+def parse_rooms(spec):
+    """'lobby=Blackwire,desk=Blackwire@1' -> [(name, device, occurrence)]."""
+    rooms = []
+    for part in spec.split(","):
+        name, _, device = part.partition("=")
+        name, device = name.strip(), device.strip() or AUDIO_DEVICE_NAME
+        if not name:
+            continue
+        device, _, nth = device.partition("@")
+        rooms.append((name, device.strip(), int(nth) if nth.strip() else 0))
+    return rooms or [("main", AUDIO_DEVICE_NAME, 0)]
+
+
+def load_wav_samples(source):
+    """Read a WAV (path or bytes) as mono float32 samples at SAMPLE_RATE."""
+    with wave.open(io.BytesIO(source) if isinstance(source, bytes) else source, "rb") as wf:
+        rate, channels, width = wf.getframerate(), wf.getnchannels(), wf.getsampwidth()
+        raw = wf.readframes(wf.getnframes())
+    if width != 2:
+        raise ValueError(f"expected 16-bit PCM, got {8 * width}-bit")
+    samples = np.frombuffer(raw, dtype=np.int16).astype(np.float32) / 32768.0
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    if rate != SAMPLE_RATE and len(samples):
+        n_out = int(len(samples) * SAMPLE_RATE / rate)
+        samples = np.interp(np.linspace(0, len(samples) - 1, n_out),
+                            np.arange(len(samples)), samples).astype(np.float32)
+    return samples
+
+
 # ---------------------------------------------------------------------------
-# STT
+# Audio I/O backends — the assistant only needs open_input().read(),
+# play(wav_bytes, cancel), describe() and close()
 # ---------------------------------------------------------------------------
 
-_recognizer = None
+class _PyAudioInput:
+    def __init__(self, stream):
+        self.stream = stream
+
+    def read(self):
+        raw = self.stream.read(CHUNK, exception_on_overflow=False)
+        return np.frombuffer(raw, dtype=np.int16).astype(np.float32) / 32768.0
+
+    def close(self):
+        if self.stream.is_active():
+            self.stream.stop_stream()
+        self.stream.close()
+
+
+class PyAudioIO:
+    """A USB headset through PyAudio."""
+
+    def __init__(self, name=AUDIO_DEVICE_NAME, occurrence=0):
+        self.pa = pyaudio.PyAudio()
+        self.input_device = find_audio_device(self.pa, name, occurrence)
+        self.output_device = find_output_device(self.pa, name, occurrence)
+
+    def describe(self):
+        """(input name, output name), or None when there is no input device."""
+        if self.input_device is None:
+            return None
+        name = lambda idx: self.pa.get_device_info_by_index(idx)["name"]
+        return name(self.input_device), name(self.output_device) if self.output_device is not None else "default"
+
+    def open_input(self):
+        return _PyAudioInput(self.pa.open(
+            format=pyaudio.paInt16,
+            channels=CHANNELS,
+            rate=SAMPLE_RATE,
+            input=True,
+            input_device_index=self.input_device,
+            frames_per_buffer=CHUNK,
+        ))
+
+    def play(self, wav_bytes, cancel=None):
+        play_wav(self.pa, wav_bytes, self.output_device, cancel=cancel)
+
+    def close(self):
+        self.pa.terminate()
+
+
+class FileAudioIO:
+    """Offline replay: queued clips in, captured WAVs out.
+
+    The input streams fed clips at `speed` x real time and silence in
+    between, like an idle microphone. play() records each WAV in `played`
+    and takes its duration / speed, stopping early on cancel.
+    """
+
+    def __init__(self, speed=1.0):
+        if speed <= 0:
+            raise ValueError("speed must be > 0")
+        self.speed = speed
+        self.played = []     # {"start", "end", "duration_s", "cancelled", "wav"}
+        self.clip_ends = {}  # clip id -> wall time its last sample was read
+        self._clips = deque()
+        self._current = None
+        self._pos = 0
+        self._next_read = None
+        self._lock = threading.Lock()
+
+    def describe(self):
+        return "file replay", "capture sink"
+
+    def feed(self, samples, clip_id=None):
+        """Queue float32 samples (SAMPLE_RATE, mono); see load_wav_samples."""
+        with self._lock:
+            self._clips.append((clip_id, np.asarray(samples, dtype=np.float32)))
+
+    def open_input(self):
+        self._next_read = time.time()
+        return self
+
+    def read(self):
+        # Pace reads like a capture device; don't try to catch up after a stall
+        now = time.time()
+        if self._next_read > now:
+            time.sleep(self._next_read - now)
+        self._next_read = max(self._next_read, now - 0.5) + CHUNK / SAMPLE_RATE / self.speed
+
+        out = np.zeros(CHUNK, dtype=np.float32)
+        filled = 0
+        with self._lock:
+            while filled < CHUNK:
+                if self._current is None:
+                    if not self._clips:
+                        break
+                    self._current, self._pos = self._clips.popleft(), 0
+                clip_id, samples = self._current
+                take = min(CHUNK - filled, len(samples) - self._pos)
+                out[filled:filled + take] = samples[self._pos:self._pos + take]
+                filled += take
+                self._pos += take
+                if self._pos >= len(samples):
+                    self.clip_ends[clip_id] = time.time()
+                    self._current = None
+        return out
+
+    def play(self, wav_bytes, cancel=None):
+        with wave.open(io.BytesIO(wav_bytes), "rb") as wf:
+            duration = wf.getnframes() / wf.getframerate()
+        entry = {"start": time.time(), "duration_s": round(duration, 3), "cancelled": False, "wav": wav_bytes}
+        step = PLAYBACK_CHUNK / SAMPLE_RATE / self.speed
+        remaining = duration / self.speed
+        while remaining > 0:
+            if cancel is not None and cancel.is_set():
+                entry["cancelled"] = True
+                break
+            time.sleep(min(step, remaining))
+            remaining -= step
+        entry["end"] = time.time()
+        self.played.append(entry)
+
+    def close(self):
+        pass
+
+
+def open_room_audio(room):
+    return PyAudioIO(room["device"], room["occurrence"])
 
 
-def get_recognizer():
-    global _recognizer
-    if _recognizer is None:
-        log("Loading Parakeet TDT model...")
+audio_io_factory = open_room_audio  # called with each room once per assistant_loop run
+
+
+# ---------------------------------------------------------------------------
+# Shared backends — every room's STT, Piper and LLM work is admitted by
+# priority (PRIORITY_*), then first come first served
+# ---------------------------------------------------------------------------
+
+class PriorityGate:
+    """At most `slots` concurrent holders; waiters are admitted lowest priority first."""
+
+    def __init__(self, name, slots):
+        self.name = name
+        self.slots = slots
+        self._busy = 0
+        self._waiting = []  # heap of (priority, seq)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self.waits = deque(maxlen=200)  # seconds spent queued
+        self.admitted = 0
+
+    @contextlib.contextmanager
+    def slot(self, priority=PRIORITY_COMMAND):
         t0 = time.time()
-        _recognizer = sherpa_onnx.OfflineRecognizer.from_transducer(
-            encoder=os.path.join(PARAKEET_DIR, "encoder.int8.onnx"),
-            decoder=os.path.join(PARAKEET_DIR, "decoder.int8.onnx"),
-            joiner=os.path.join(PARAKEET_DIR, "joiner.int8.onnx"),
-            tokens=os.path.join(PARAKEET_DIR, "tokens.txt"),
-            num_threads=4,
-            model_type="nemo_transducer",
-        )
-        log(f"Parakeet loaded in {time.time()-t0:.1f}s")
-    return _recognizer
+        with self._cond:
+            ticket = (priority, next(self._seq))
+            heapq.heappush(self._waiting, ticket)
+            while self._busy >= self.slots or self._waiting[0] != ticket:
+                self._cond.wait()
+            heapq.heappop(self._waiting)
+            self._busy += 1
+            self.admitted += 1
+            self.waits.append(time.time() - t0)
+            self._cond.notify_all()  # the next waiter may fit in a free slot
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._busy -= 1
+                self._cond.notify_all()
+
+    def snapshot(self):
+        with self._cond:
+            waits = [w * 1000 for w in self.waits]
+            return {"slots": self.slots, "busy": self._busy, "queued": len(self._waiting),
+                    "admitted": self.admitted, "wait_ms_p50": _percentile(waits, 50),
+                    "wait_ms_p95": _percentile(waits, 95)}
 
 
-def transcribe(audio_samples):
-    """Transcribe float32 audio samples at 16kHz."""
-    rec = get_recognizer()
-    stream = rec.create_stream()
-    stream.accept_waveform(SAMPLE_RATE, audio_samples)
-    rec.decode_stream(stream)
-    return stream.result.text.strip()
+_tts_gate = PriorityGate("tts", 1)  # one Piper voice, not safe to share concurrently
+_llm_gate = PriorityGate("llm", LLM_MAX_INFLIGHT)
+
+
+# ---------------------------------------------------------------------------
+# STT — a small pool of recognizers, one worker thread each. A worker pins
+# itself to STT_CPUS before loading so ONNX Runtime's threads inherit the
+# affinity, then decodes whatever is queued in one decode_streams batch.
+# ---------------------------------------------------------------------------
+
+_stt_jobs = queue.PriorityQueue()  # (priority, seq, job)
+_stt_seq = itertools.count()
+_stt_workers = []
+_stt_loaded = []        # one Event per worker, set when its load finishes
+_stt_lock = threading.Lock()
+stt_stats = {"workers": 0, "load_errors": 0, "utterances": 0, "batches": 0,
+             "audio_s": 0.0, "decode_s": 0.0}
+_stt_rtf = deque(maxlen=200)         # real-time factor per batch
+_stt_queue_wait = deque(maxlen=200)  # seconds from submit to decode start
+
+
+def parse_cpus(spec):
+    """'0-3' or '0,2,4-5' -> {0, 1, 2, 3}; empty -> None (no pinning)."""
+    cpus = set()
+    for part in (spec or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        lo, _, hi = part.partition("-")
+        cpus.update(range(int(lo), int(hi or lo) + 1))
+    return cpus or None
+
+
+def pin_current_thread(spec):
+    cpus = parse_cpus(spec)
+    if cpus is None:
+        return
+    try:
+        os.sched_setaffinity(0, cpus)  # pid 0 = the calling thread on Linux
+    except (AttributeError, OSError) as e:
+        log(f"CPU affinity {spec} not applied: {e}")
+
+
+def _stt_model_file(stem):
+    """Prefer the requested precision, fall back to whatever is on disk."""
+    names = [f"{stem}.int8.onnx", f"{stem}.onnx"]
+    if STT_PRECISION == "fp32":
+        names.reverse()
+    for name in names:
+        path = os.path.join(PARAKEET_DIR, name)
+        if os.path.exists(path):
+            return path
+    return os.path.join(PARAKEET_DIR, names[0])
+
+
+def _load_recognizer():
+    return sherpa_onnx.OfflineRecognizer.from_transducer(
+        encoder=_stt_model_file("encoder"),
+        decoder=_stt_model_file("decoder"),
+        joiner=_stt_model_file("joiner"),
+        tokens=os.path.join(PARAKEET_DIR, "tokens.txt"),
+        num_threads=STT_THREADS,
+        model_type="nemo_transducer",
+    )
+
+
+def _stt_worker(index, loaded):
+    pin_current_thread(STT_CPUS)
+    t0 = time.time()
+    try:
+        rec = _load_recognizer()
+    except Exception as e:
+        log(f"STT worker {index} failed to load: {e}")
+        with _stt_lock:
+            stt_stats["load_errors"] += 1
+        loaded.set()
+        return
+    with _stt_lock:
+        stt_stats["workers"] += 1
+    log(f"Parakeet worker {index} loaded in {time.time()-t0:.1f}s")
+    loaded.set()
+
+    while True:
+        batch = [_stt_jobs.get()[2]]
+        while len(batch) < STT_BATCH_MAX:
+            try:
+                batch.append(_stt_jobs.get_nowait()[2])
+            except queue.Empty:
+                break
+        _stt_decode(rec, batch)
+
+
+def _stt_decode(rec, batch):
+    t0 = time.time()
+    try:
+        streams = []
+        for job in batch:
+            stream = rec.create_stream()
+            stream.accept_waveform(SAMPLE_RATE, job["samples"])
+            streams.append(stream)
+        if len(streams) == 1:
+            rec.decode_stream(streams[0])
+        else:
+            rec.decode_streams(streams)
+        for job, stream in zip(batch, streams):
+            job["text"] = stream.result.text.strip()
+    except Exception as e:
+        for job in batch:
+            job["error"] = e
+    elapsed = time.time() - t0
+    audio_s = sum(len(job["samples"]) for job in batch) / SAMPLE_RATE
+    rtf = elapsed / audio_s if audio_s else 0.0
+    with _stt_lock:
+        stt_stats["utterances"] += len(batch)
+        stt_stats["batches"] += 1
+        stt_stats["audio_s"] += audio_s
+        stt_stats["decode_s"] += elapsed
+        _stt_rtf.append(rtf)
+        for job in batch:
+            _stt_queue_wait.append(t0 - job["submitted"])
+    if len(batch) > 1:
+        log(f"STT batch of {len(batch)}: {audio_s:.1f}s audio in {elapsed:.2f}s (RTF {rtf:.2f})")
+    for job in batch:
+        job["rtf"] = rtf
+        job["done"].set()
+
+
+def start_stt_service(wait=True):
+    """Start the recognizer pool (idempotent); optionally wait for every load."""
+    with _model_locks["stt"]:
+        if not _stt_workers:
+            overlap = (parse_cpus(STT_CPUS) or set()) & (parse_cpus(LLM_CPUS) or set())
+            if overlap:
+                log(f"WARNING: STT_CPUS and LLM_CPUS share cores {sorted(overlap)}")
+            log(f"Loading {STT_POOL_SIZE} Parakeet TDT recognizer(s) "
+                f"({STT_PRECISION}, {STT_THREADS} threads, cpus {STT_CPUS or 'any'})...")
+            for i in range(STT_POOL_SIZE):
+                loaded = threading.Event()
+                worker = threading.Thread(target=_stt_worker, args=(i, loaded), daemon=True, name=f"stt-{i}")
+                _stt_loaded.append(loaded)
+                _stt_workers.append(worker)
+                worker.start()
+    if wait:
+        for loaded in _stt_loaded:
+            loaded.wait()
+        with _stt_lock:
+            if stt_stats["workers"] == 0:
+                raise RuntimeError("no STT recognizer could be loaded")
+
+
+def transcribe(audio_samples, priority=PRIORITY_LISTEN):
+    """Transcribe float32 audio samples at 16kHz on the recognizer pool."""
+    start_stt_service(wait=False)
+    job = {"samples": np.asarray(audio_samples, dtype=np.float32),
+           "submitted": time.time(), "done": threading.Event()}
+    _stt_jobs.put((priority, next(_stt_seq), job))
+    while not job["done"].wait(1.0):
+        with _stt_lock:
+            dead = stt_stats["load_errors"] >= STT_POOL_SIZE
+        if dead:
+            raise RuntimeError("no STT recognizer could be loaded")
+    if "error" in job:
+        raise job["error"]
+    return job["text"]
+
+
+def stt_snapshot():
+    with _stt_lock:
+        stats = dict(stt_stats)
+        rtf_milli = [r * 1000 for r in _stt_rtf]
+        waits = [w * 1000 for w in _stt_queue_wait]
+    stats["audio_s"] = round(stats["audio_s"], 1)
+    stats["decode_s"] = round(stats["decode_s"], 1)
+    stats["rtf_overall"] = round(stats["decode_s"] / stats["audio_s"], 3) if stats["audio_s"] else None
+    stats["avg_batch"] = round(stats["utterances"] / stats["batches"], 2) if stats["batches"] else None
+    milli = lambda pct: _percentile(rtf_milli, pct) / 1000 if rtf_milli else None
+    stats.update({
+        "rtf_p50": milli(50), "rtf_p95": milli(95),
+        "queue_wait_ms_p95": _percentile(waits, 95),
+        "queued": _stt_jobs.qsize(),
+        "config": {"pool": STT_POOL_SIZE, "threads": STT_THREADS, "cpus": STT_CPUS,
+                   "precision": STT_PRECISION, "batch_max": STT_BATCH_MAX},
+    })
+    return stats
 
 
 # ---------------------------------------------------------------------------
 # VAD
 # ---------------------------------------------------------------------------
 
-_vad = None
+_vads = {}  # room name -> VadModel; Silero keeps stream state, so one per room
 
 
-def get_vad():
-    global _vad
-    if _vad is None:
-        log("Loading Silero VAD...")
-        config = sherpa_onnx.VadModelConfig()
-        config.silero_vad.model = VAD_MODEL
-        config.silero_vad.min_silence_duration = SILENCE_AFTER_WAKE
-        config.silero_vad.min_speech_duration = 0.1
-        config.sample_rate = SAMPLE_RATE
-        _vad = sherpa_onnx.VadModel.create(config)
-        log("VAD loaded")
-    return _vad
+def get_vad(room_name):
+    with _model_locks["vad"]:
+        vad = _vads.get(room_name)
+        if vad is None:
+            log(f"Loading Silero VAD ({room_name})...")
+            config = sherpa_onnx.VadModelConfig()
+            config.silero_vad.model = VAD_MODEL
+            config.silero_vad.min_silence_duration = SILENCE_AFTER_WAKE
+            config.silero_vad.min_speech_duration = 0.1
+            config.sample_rate = SAMPLE_RATE
+            vad = _vads[room_name] = sherpa_onnx.VadModel.create(config)
+            log("VAD loaded")
+    return vad
 
 
 # ---------------------------------------------------------------------------
@@ -189,103 +666,1176 @@ _voice = None
 
 def get_voice():
     global _voice
-    if _voice is None:
-        log("Loading Piper TTS voice...")
-        t0 = time.time()
-        from piper import PiperVoice
-        _voice = PiperVoice.load(PIPER_VOICE)
-        log(f"Piper loaded in {time.time()-t0:.1f}s")
+    with _model_locks["tts"]:
+        if _voice is None:
+            log("Loading Piper TTS voice...")
+            t0 = time.time()
+            from piper import PiperVoice
+            _voice = PiperVoice.load(PIPER_VOICE)
+            log(f"Piper loaded in {time.time()-t0:.1f}s")
     return _voice
 
 
-def synthesize(text):
-    """Synthesize text to WAV bytes."""
+def synthesize(text, priority=PRIORITY_COMMAND):
+    """Synthesize text to WAV bytes (rooms take turns on the one voice)."""
     voice = get_voice()
     buf = io.BytesIO()
+    with _tts_gate.slot(priority):
+        with wave.open(buf, "wb") as wf:
+            voice.synthesize_wav(text, wf)
+    return buf.getvalue()
+
+
+# ---------------------------------------------------------------------------
+# TTS cache — pre-synthesized PCM for fixed phrases and template fragments
+# ---------------------------------------------------------------------------
+
+_tts_cache = OrderedDict()  # (voice, text) -> (params, pcm bytes)
+_tts_cache_lock = threading.Lock()
+tts_cache_stats = {"hits": 0, "disk_hits": 0, "misses": 0}
+
+
+def _tts_key(text):
+    return (os.path.basename(PIPER_VOICE), text)
+
+
+def _tts_disk_path(key):
+    digest = hashlib.sha1("\0".join(key).encode("utf-8")).hexdigest()
+    return os.path.join(TTS_CACHE_DIR, f"{digest}.wav")
+
+
+def _wav_to_pcm(wav_bytes):
+    """Split WAV bytes into ((channels, sampwidth, rate), raw PCM frames)."""
+    with wave.open(io.BytesIO(wav_bytes), "rb") as wf:
+        params = (wf.getnchannels(), wf.getsampwidth(), wf.getframerate())
+        return params, wf.readframes(wf.getnframes())
+
+
+def _pcm_to_wav(params, pcm):
+    channels, sampwidth, rate = params
+    buf = io.BytesIO()
     with wave.open(buf, "wb") as wf:
-        voice.synthesize_wav(text, wf)
+        wf.setnchannels(channels)
+        wf.setsampwidth(sampwidth)
+        wf.setframerate(rate)
+        wf.writeframes(pcm)
     return buf.getvalue()
 
 
+def _trim_silence(params, pcm, threshold=300):
+    """Strip leading/trailing near-silence so joined fragments don't drag."""
+    channels, sampwidth, _ = params
+    if sampwidth != 2 or not pcm:
+        return pcm
+    samples = np.frombuffer(pcm, dtype=np.int16)
+    loud = np.flatnonzero(np.abs(samples) > threshold)
+    if loud.size == 0:
+        return pcm
+    start = (loud[0] // channels) * channels
+    end = (loud[-1] // channels + 1) * channels
+    return samples[start:end].tobytes()
+
+
+def tts_pcm(text, persist=False, allow_synth=True, priority=PRIORITY_COMMAND):
+    """Return (params, PCM) for text, via the in-memory LRU and optional disk store.
+
+    With allow_synth=False, returns None instead of running Piper on a miss.
+    """
+    key = _tts_key(text)
+    with _tts_cache_lock:
+        entry = _tts_cache.get(key)
+        if entry is not None:
+            _tts_cache.move_to_end(key)
+            tts_cache_stats["hits"] += 1
+            return entry
+
+    entry = None
+    path = _tts_disk_path(key) if TTS_CACHE_DIR else None
+    if path and os.path.exists(path):
+        try:
+            with open(path, "rb") as f:
+                entry = _wav_to_pcm(f.read())
+            stat = "disk_hits"
+        except Exception:
+            entry = None
+
+    if entry is None:
+        if not allow_synth:
+            return None
+        wav_bytes = synthesize(text, priority)
+        entry = _wav_to_pcm(wav_bytes)
+        stat = "misses"
+        if persist and path:
+            try:
+                os.makedirs(TTS_CACHE_DIR, exist_ok=True)
+                tmp = f"{path}.tmp"
+                with open(tmp, "wb") as f:
+                    f.write(wav_bytes)
+                os.replace(tmp, path)
+            except Exception as e:
+                log(f"TTS cache write failed: {e}")
+
+    with _tts_cache_lock:
+        tts_cache_stats[stat] += 1
+        _tts_cache[key] = entry
+        _tts_cache.move_to_end(key)
+        while len(_tts_cache) > TTS_CACHE_MAX_ENTRIES:
+            _tts_cache.popitem(last=False)
+    return entry
+
+
+def synthesize_cached(text, persist=True, allow_synth=True):
+    """Synthesize a fixed phrase to WAV bytes, served from the TTS cache."""
+    entry = tts_pcm(text, persist=persist, allow_synth=allow_synth)
+    return _pcm_to_wav(*entry) if entry else None
+
+
+def synthesize_fragments(fragments):
+    """Build WAV bytes from (text, kind) fragments.
+
+    "fixed" fragments are cached in memory and on disk, "number" fragments in
+    memory only, and "free" text is always synthesized fresh.
+    """
+    params = None
+    pieces = []
+    for text, kind in fragments:
+        if kind == "free":
+            frag_params, pcm = _wav_to_pcm(synthesize(text))
+        else:
+            frag_params, pcm = tts_pcm(text, persist=(kind == "fixed"))
+        if params is None:
+            params = frag_params
+        elif frag_params != params:
+            # Mismatched audio format should never happen with one voice;
+            # fall back to synthesizing the whole sentence.
+            return synthesize(fragments_text(fragments))
+        pieces.append(_trim_silence(params, pcm))
+
+    if params is None:
+        return b""
+    channels, sampwidth, rate = params
+    gap = b"\x00" * (int(rate * TTS_FRAGMENT_GAP_S) * channels * sampwidth)
+    return _pcm_to_wav(params, gap.join(pieces))
+
+
+def fragments_text(fragments):
+    return " ".join(text for text, _ in fragments)
+
+
+def warm_tts_cache():
+    """Pre-synthesize fixed phrases and template fragments."""
+    t0 = time.time()
+    phrases = [GREETING_PHRASE, ACK_PHRASE]
+    samples = [None]
+    for level in ("low", "guarded", "elevated", "critical"):
+        for people in (0, 1, 2):
+            samples.append({
+                "alert_level": level,
+                "risk_score": 0,
+                "person_count": people,
+                "nearest_person_m": 1.0 if people else None,
+            })
+    for intent_key, _ in INTENT_PATTERNS:
+        for brief in samples:
+            for text, kind in build_intent_fragments(intent_key, brief, None) or []:
+                if kind == "fixed" and text not in phrases:
+                    phrases.append(text)
+
+    for text in phrases:
+        try:
+            tts_pcm(text, persist=True, priority=PRIORITY_BACKGROUND)
+        except Exception as e:
+            log(f"TTS warm-up failed for {text!r}: {e}")
+    numbers = [str(n) for n in range(TTS_WARM_NUMBERS)]
+    numbers += [spoken_meters(d / 10) for d in range(int(TTS_WARM_METERS * 10) + 1)]
+    for text in numbers:
+        try:
+            tts_pcm(text, priority=PRIORITY_BACKGROUND)
+        except Exception:
+            break
+    log(f"TTS cache warmed ({len(phrases)} phrases) in {time.time()-t0:.1f}s")
+
+
 # ---------------------------------------------------------------------------
-# LLM
+# HTTP — keep-alive connection pool for dashboard + LLM calls
 # ---------------------------------------------------------------------------
 
-def get_live_context():
-    """Fetch compact fused sensor context from dashboard with short timeout."""
-    global cached_context, cached_context_ts
+_http_pool = {}  # (scheme, host, port) -> [idle HTTPConnection]
+_http_pool_lock = threading.Lock()
+_http_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="http")
+http_stats = {}  # "host:port" -> request/reuse counters + latency
+
+
+def _http_checkout(scheme, host, port, timeout):
+    """Take an idle pooled connection or open a new one. Returns (conn, reused)."""
+    with _http_pool_lock:
+        idle = _http_pool.get((scheme, host, port))
+        conn = idle.pop() if idle else None
+    if conn is not None:
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+        return conn, True
+    cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+    return cls(host, port, timeout=timeout), False
+
+
+def _http_checkin(scheme, host, port, conn):
+    with _http_pool_lock:
+        idle = _http_pool.setdefault((scheme, host, port), [])
+        if len(idle) < HTTP_POOL_MAX_IDLE:
+            idle.append(conn)
+            return
+    conn.close()
 
-    now = time.time()
-    if now - cached_context_ts < INSIGHTS_CACHE_TTL_S and cached_context:
-        return cached_context
 
+def _http_record(host_key, elapsed, reused, ok):
+    with _http_pool_lock:
+        st = http_stats.setdefault(host_key, {
+            "requests": 0, "reused": 0, "opened": 0, "errors": 0,
+            "last_ms": 0.0, "max_ms": 0.0, "total_ms": 0.0,
+        })
+        ms = elapsed * 1000
+        st["requests"] += 1
+        st["reused" if reused else "opened"] += 1
+        if not ok:
+            st["errors"] += 1
+        st["last_ms"] = round(ms, 1)
+        st["max_ms"] = round(max(st["max_ms"], ms), 1)
+        st["total_ms"] += ms
+
+
+def _abort_on_cancel(conn, cancel, done):
+    """Shut the socket down when cancel is set so a blocked read returns."""
+    while not done.wait(0.05):
+        if cancel.is_set():
+            sock = conn.sock
+            if sock is not None:
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+            return
+
+
+def http_request(url, data=None, headers=None, timeout=INSIGHTS_TIMEOUT_S, cancel=None):
+    """GET (or POST when data is given) over a pooled keep-alive connection.
+
+    Returns the response body; raises on network errors and HTTP >= 400,
+    like urllib.request.urlopen. Setting cancel (threading.Event) aborts
+    the request; the server sees the disconnect and stops generating.
+    """
+    parts = urllib.parse.urlsplit(url)
+    scheme = parts.scheme or "http"
+    host = parts.hostname
+    port = parts.port or (443 if scheme == "https" else 80)
+    path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+    method = "POST" if data is not None else "GET"
+    host_key = f"{host}:{port}"
+
+    conn, reused = _http_checkout(scheme, host, port, timeout)
+    done = None
+    if cancel is not None:
+        done = threading.Event()
+        threading.Thread(target=_abort_on_cancel, args=(conn, cancel, done), daemon=True).start()
+    t0 = time.time()
+    try:
+        try:
+            conn.request(method, path, body=data, headers=headers or {})
+            resp = conn.getresponse()
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+            if not reused or (cancel is not None and cancel.is_set()):
+                raise
+            # Peer closed an idle keep-alive connection; retry once on a fresh one
+            conn.close()
+            conn.request(method, path, body=data, headers=headers or {})
+            resp = conn.getresponse()
+            reused = False
+        body = resp.read()
+    except Exception:
+        conn.close()
+        _http_record(host_key, time.time() - t0, reused, ok=False)
+        raise
+    finally:
+        if done is not None:
+            done.set()
+
+    if resp.will_close or (cancel is not None and cancel.is_set()):
+        conn.close()
+    else:
+        _http_checkin(scheme, host, port, conn)
+    _http_record(host_key, time.time() - t0, reused, ok=resp.status < 400)
+    if resp.status >= 400:
+        raise RuntimeError(f"HTTP {resp.status} from {url}")
+    return body
+
+
+def http_get_json(url, timeout=INSIGHTS_TIMEOUT_S):
+    return json.loads(http_request(url, timeout=timeout))
+
+
+def http_stats_snapshot():
+    with _http_pool_lock:
+        out = {}
+        for host_key, st in http_stats.items():
+            entry = {k: v for k, v in st.items() if k != "total_ms"}
+            entry["avg_ms"] = round(st["total_ms"] / max(st["requests"], 1), 1)
+            out[host_key] = entry
+        return out
+
+
+# ---------------------------------------------------------------------------
+# Context cache — shared TTL cache for dashboard fetches, prefetched on wake
+# ---------------------------------------------------------------------------
+
+_context_cache = {}     # key -> (fetched_at, value)
+_context_inflight = {}  # key -> Future of an in-progress fetch
+_context_lock = threading.Lock()
+context_stats = {"hits": 0, "fetches": 0, "joined": 0, "errors": 0}
+
+
+def _warm_llm_connection():
+    """Open (and keep alive) the pooled connection to the preferred LLM backend."""
+    backend = llm_pick()
+    if backend is not None:
+        http_request(_llm_models_url(backend["url"]), timeout=2.0)
+    return True
+
+
+# key -> (fetch function, TTL seconds)
+CONTEXT_SOURCES = {
+    "brief": (lambda: http_get_json(INSIGHTS_BRIEF_URL), INSIGHTS_CACHE_TTL_S),
+    "events": (lambda: http_get_json(EVENTS_URL), INSIGHTS_CACHE_TTL_S),
+    "llm_warm": (_warm_llm_connection, LLM_WARM_TTL_S),
+}
+
+
+def _context_run(key, fetch_fn):
     try:
-        with urllib.request.urlopen(INSIGHTS_BRIEF_URL, timeout=INSIGHTS_TIMEOUT_S) as resp:
-            data = json.loads(resp.read())
-
-        parts = []
-        level = data.get("alert_level")
-        risk = data.get("risk_score")
-        people = data.get("person_count")
-        nearest = data.get("nearest_person_m")
-        objects = data.get("objects_of_interest") or []
-        scene = (data.get("scene_summary") or "").strip()
-        last_event = (data.get("last_event") or "").strip()
-
-        if level:
-            parts.append(f"level {level}")
-        if isinstance(risk, (int, float)):
-            parts.append(f"risk {int(risk)}")
-        if isinstance(people, (int, float)):
-            parts.append(f"people {int(people)}")
-        if isinstance(nearest, (int, float)):
-            parts.append(f"nearest {nearest:.2f}m")
-        if objects:
-            parts.append(f"objects {','.join(objects[:2])}")
-        if scene:
-            parts.append(f"scene {scene[:90]}")
-        if last_event:
-            parts.append(f"event {last_event[:80]}")
-
-        context = "; ".join(parts)[:260]
-        cached_context = context
-        cached_context_ts = now
-        return context
+        value = fetch_fn()
+        with _context_lock:
+            _context_cache[key] = (time.time(), value)
+        return value
     except Exception:
-        return cached_context
+        with _context_lock:
+            context_stats["errors"] += 1
+        raise
+    finally:
+        with _context_lock:
+            _context_inflight.pop(key, None)
+
+
+def _context_start(key):
+    """Return a Future fetching key, or None when the cached value is fresh.
+
+    Concurrent callers share one in-flight fetch per key.
+    """
+    fetch_fn, ttl = CONTEXT_SOURCES[key]
+    with _context_lock:
+        hit = _context_cache.get(key)
+        if hit and time.time() - hit[0] < ttl:
+            context_stats["hits"] += 1
+            return None
+        fut = _context_inflight.get(key)
+        if fut is not None:
+            context_stats["joined"] += 1
+            return fut
+        context_stats["fetches"] += 1
+        fut = _http_executor.submit(_context_run, key, fetch_fn)
+        _context_inflight[key] = fut
+        return fut
+
+
+def context_get(keys, deadline_s=INSIGHTS_TIMEOUT_S):
+    """Return {key: (fetched_at, value) or None}, refreshing stale keys in parallel.
+
+    All fetches share one overall deadline. A failed or late fetch leaves the
+    previous (stale) entry in place, so callers check fetched_at themselves.
+    """
+    end = time.time() + deadline_s
+    futures = [_context_start(key) for key in keys]
+    for fut in futures:
+        if fut is None:
+            continue
+        try:
+            fut.result(timeout=max(0.0, end - time.time()))
+        except Exception:
+            pass
+    with _context_lock:
+        return {key: _context_cache.get(key) for key in keys}
+
 
+def _fresh_value(entry, max_age=INSIGHTS_CACHE_TTL_S + INSIGHTS_TIMEOUT_S):
+    if entry is None or time.time() - entry[0] > max_age:
+        return None
+    return entry[1]
 
-def llm_query(user_text, live_context=""):
-    """Query the local LLM via llama-server HTTP API."""
-    composed_user_text = user_text
+
+def prefetch_context(warm_llm=False):
+    """Start background refreshes of dashboard context without waiting.
+
+    Called on speech onset and wake word so the brief/events are already
+    cached by the time the command has been transcribed. No-op when fresh.
+    """
+    keys = ["llm_warm"] if warm_llm else []
+    if sensor_snapshot() is None:
+        keys = ["brief", "events"] + keys
+    for key in keys:
+        try:
+            _context_start(key)
+        except Exception:
+            pass
+
+
+def context_cache_snapshot():
+    now = time.time()
+    with _context_lock:
+        ages = {key: round(now - ts, 2) for key, (ts, _) in _context_cache.items()}
+        return dict(context_stats, age_s=ages, inflight=sorted(_context_inflight))
+
+
+def format_live_context(data):
+    """Serialize an insights brief into the compact LLM context string."""
+    if not isinstance(data, dict):
+        return ""
+
+    parts = []
+    level = data.get("alert_level")
+    risk = data.get("risk_score")
+    people = data.get("person_count")
+    nearest = data.get("nearest_person_m")
+    objects = data.get("objects_of_interest") or []
+    scene = (data.get("scene_summary") or "").strip()
+    last_event = (data.get("last_event") or "").strip()
+
+    if level:
+        parts.append(f"level {level}")
+    if isinstance(risk, (int, float)):
+        parts.append(f"risk {int(risk)}")
+    if isinstance(people, (int, float)):
+        parts.append(f"people {int(people)}")
+    if isinstance(nearest, (int, float)):
+        parts.append(f"nearest {nearest:.2f}m")
+    if objects:
+        parts.append(f"objects {','.join(objects[:2])}")
+    if scene:
+        parts.append(f"scene {scene[:90]}")
+    if last_event:
+        parts.append(f"event {last_event[:80]}")
+
+    return "; ".join(parts)[:260]
+
+
+# ---------------------------------------------------------------------------
+# Sensor subscription — pushed snapshot from the dashboard, local fallback
+# ---------------------------------------------------------------------------
+
+RESTRICTED_LABELS = {"knife", "scissors", "baseball bat", "gun", "pistol", "rifle"}
+
+_sensor_lock = threading.Lock()
+sensor_state = {
+    "brief": None,
+    "event": None,
+    "updated_at": 0.0,   # last time we heard anything (data or heartbeat)
+    "source": None,      # "dashboard" or "local"
+    "connected": False,
+    "reconnects": 0,
+    "last_error": None,
+}
+
+
+def _sensor_update(**fields):
+    with _sensor_lock:
+        sensor_state.update(fields)
+
+
+def sensor_snapshot(max_age=SENSOR_STALE_S):
+    """Return (brief, event) from the in-memory snapshot, or None if stale."""
+    with _sensor_lock:
+        if sensor_state["brief"] is None:
+            return None
+        if time.time() - sensor_state["updated_at"] > max_age:
+            return None
+        return sensor_state["brief"], sensor_state["event"]
+
+
+def sensor_status():
+    with _sensor_lock:
+        age = time.time() - sensor_state["updated_at"] if sensor_state["updated_at"] else None
+        return {
+            "source": sensor_state["source"],
+            "connected": sensor_state["connected"],
+            "age_s": round(age, 2) if age is not None else None,
+            "stale": age is None or age > SENSOR_STALE_S,
+            "reconnects": sensor_state["reconnects"],
+            "last_error": sensor_state["last_error"],
+        }
+
+
+def local_fuse_brief(jetson, spark):
+    """Fuse raw camera /detections into a brief, mirroring the dashboard's scoring.
+
+    VLM keyword risk and scene summaries are unavailable on this path.
+    """
+    jetson = jetson if isinstance(jetson, dict) else {}
+    spark = spark if isinstance(spark, dict) else {}
+    if not jetson and not spark:
+        return None
+
+    def person_count(d):
+        if isinstance(d.get("person_count"), (int, float)):
+            return int(d["person_count"])
+        return sum(1 for det in d.get("detections") or [] if det.get("label") == "person")
+
+    people = person_count(jetson) + person_count(spark)
+
+    nearest = jetson.get("nearest_person_m")  # only Jetson has depth
+    if not isinstance(nearest, (int, float)):
+        depths = [
+            det.get("depth_m") for det in jetson.get("detections") or []
+            if det.get("label") == "person" and isinstance(det.get("depth_m"), (int, float))
+        ]
+        nearest = min(depths) if depths else None
+
+    objects = []
+    for d in (jetson, spark):
+        for det in d.get("detections") or []:
+            label = det.get("label")
+            if label in RESTRICTED_LABELS and label not in objects:
+                objects.append(label)
+
+    score = 5 + min(people * 8, 30) + min(len(objects) * 22, 44)
+    if nearest is not None:
+        if nearest < 1.0:
+            score += 35
+        elif nearest < 2.0:
+            score += 22
+        elif nearest < 3.0:
+            score += 10
+    score = min(score, 100)
+    if score >= 75:
+        level = "critical"
+    elif score >= 45:
+        level = "elevated"
+    elif score >= 20:
+        level = "guarded"
+    else:
+        level = "low"
+
+    return {
+        "timestamp": int(time.time()),
+        "alert_level": level,
+        "risk_score": score,
+        "person_count": people,
+        "nearest_person_m": nearest,
+        "objects_of_interest": objects,
+        "scene_summary": "",
+        "last_event": None,
+        "deep_summary": None,
+        "fused_locally": True,
+    }
+
+
+def _sensor_poll_local():
+    """One round of fallback fusion straight from the camera nodes."""
+    futures = [
+        _http_executor.submit(http_get_json, url, INSIGHTS_TIMEOUT_S)
+        for url in (JETSON_DETECTIONS_URL, SPARK_DETECTIONS_URL)
+    ]
+    results = []
+    for fut in futures:
+        try:
+            results.append(fut.result(timeout=INSIGHTS_TIMEOUT_S))
+        except Exception:
+            results.append(None)
+    brief = local_fuse_brief(*results)
+    if brief is not None:
+        # Keep the last dashboard event; local fusion has no timeline
+        _sensor_update(brief=brief, updated_at=time.time(), source="local")
+
+
+def _sensor_stream_once():
+    """Hold one SSE connection to the dashboard until it fails."""
+    parts = urllib.parse.urlsplit(SENSOR_STREAM_URL)
+    path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+    conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=SENSOR_READ_TIMEOUT_S)
+    try:
+        conn.request("GET", path, headers={"Accept": "text/event-stream"})
+        resp = conn.getresponse()
+        if resp.status != 200:
+            raise RuntimeError(f"HTTP {resp.status} from {SENSOR_STREAM_URL}")
+        _sensor_update(connected=True, last_error=None)
+        log("Sensor stream connected")
+
+        data_lines = []
+        while True:
+            line = resp.readline()
+            if not line:
+                raise ConnectionError("sensor stream closed")
+            line = line.decode("utf-8").rstrip("\r\n")
+            if line.startswith(":"):
+                # Heartbeat: dashboard alive, snapshot unchanged
+                _sensor_update(updated_at=time.time())
+            elif line.startswith("data:"):
+                data_lines.append(line[5:].lstrip())
+            elif not line and data_lines:
+                payload = json.loads("\n".join(data_lines))
+                data_lines = []
+                _sensor_update(
+                    brief=payload.get("brief"),
+                    event=payload.get("event"),
+                    updated_at=time.time(),
+                    source="dashboard",
+                )
+    finally:
+        conn.close()
+
+
+def sensor_subscriber_loop():
+    """Keep the pushed snapshot fresh; fuse locally while the dashboard is down."""
+    log(f"Sensor subscriber started ({SENSOR_STREAM_URL})")
+    backoff = 0.5
+    while True:
+        t0 = time.time()
+        try:
+            _sensor_stream_once()
+        except Exception as e:
+            with _sensor_lock:
+                was_connected = sensor_state["connected"]
+                sensor_state["connected"] = False
+                sensor_state["last_error"] = str(e)[:120]
+                sensor_state["reconnects"] += 1
+            if was_connected:
+                log(f"Sensor stream lost: {e}")
+
+        if time.time() - t0 > 30:
+            backoff = 0.5  # stream was healthy for a while
+        retry_at = time.time() + backoff
+        backoff = min(backoff * 2, SENSOR_BACKOFF_MAX_S)
+        while True:
+            try:
+                _sensor_poll_local()
+            except Exception:
+                pass
+            remaining = retry_at - time.time()
+            if remaining <= 0:
+                break
+            time.sleep(min(SENSOR_LOCAL_POLL_S, remaining))
+
+
+# ---------------------------------------------------------------------------
+# LLM
+# ---------------------------------------------------------------------------
+
+def get_live_brief():
+    """Latest insights brief: pushed snapshot, else the shared cache (may be stale)."""
+    pushed = sensor_snapshot()
+    if pushed is not None:
+        return pushed[0]
+    entry = context_get(["brief"])["brief"]
+    return entry[1] if entry is not None else None
+
+
+def get_live_context():
+    """Compact fused sensor context string for the LLM prompt."""
+    return format_live_context(get_live_brief())
+
+
+def llm_messages(user_text, live_context=""):
+    """Fixed system prefix + question, with live context as a compact suffix."""
+    content = user_text
     if live_context:
-        composed_user_text = (
-            f"Live local context: {live_context}\n"
-            f"User request: {user_text}"
+        content = f"{user_text}\nContext: {live_context}"
+    return [
+        {"role": "system", "content": f"{SYSTEM_PROMPT} {CONTEXT_INSTRUCTIONS}"},
+        {"role": "user", "content": content},
+    ]
+
+
+def llm_payload(backend, messages, max_tokens=150, temperature=0.3):
+    """Chat request body; llama-server backends also get prompt-cache slot hints."""
+    body = {
+        "model": backend["model"],
+        "messages": messages,
+        "max_tokens": max_tokens,
+        "temperature": temperature,
+    }
+    if backend["local"] and LLM_PROMPT_CACHE:
+        body["cache_prompt"] = True
+        body["id_slot"] = LLM_SLOT_ID
+    return json.dumps(body).encode()
+
+
+def llm_query(user_text, live_context="", cancel=None):
+    """Query the LLM through the backend router (see llm_route)."""
+    messages = llm_messages(user_text, live_context)
+    try:
+        with _llm_gate.slot(PRIORITY_COMMAND):
+            _check_cancel(cancel)  # may have been interrupted while queued
+            return llm_route(lambda backend: llm_payload(backend, messages), cancel=cancel)
+    except CommandCancelled:
+        raise
+    except Exception as e:
+        log(f"LLM error: {e}")
+        return f"{LLM_ERROR_PREFIX} Error: {e}"
+
+
+# ---------------------------------------------------------------------------
+# LLM router — health/latency-aware backend choice with hedged fallback
+# ---------------------------------------------------------------------------
+
+_llm_lock = threading.Lock()
+_llm_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="llm")
+llm_decisions = deque(maxlen=20)
+
+
+def _is_local_url(url):
+    return (urllib.parse.urlsplit(url).hostname or "") in ("127.0.0.1", "localhost")
+
+
+def _llm_models_url(url):
+    return f"{url.rsplit('/chat/completions', 1)[0]}/models"
+
+
+def _build_llm_backends():
+    specs = [("local" if _is_local_url(LLM_URL) else "spark", LLM_URL, LLM_MODEL)]
+    if LLM_LOCAL_URL and LLM_LOCAL_URL != LLM_URL:
+        specs.append(("local", LLM_LOCAL_URL, LLM_LOCAL_MODEL))
+        if specs[0][0] == "local":
+            # Names key llm_pick(exclude=...) and the /status stats; keep them unique
+            specs[0] = ("primary",) + specs[0][1:]
+    return [
+        {
+            "name": name, "url": url, "model": model, "local": _is_local_url(url),
+            "ewma_ms": None, "latencies": deque(maxlen=200),
+            "fail_streak": 0, "down_until": 0.0,
+            "requests": 0, "errors": 0, "wins": 0, "hedged": 0,
+            "prompt_evals": deque(maxlen=100),  # (prompt_ms or None, evaluated, cached)
+        }
+        for name, url, model in specs
+    ]
+
+
+llm_backends = _build_llm_backends()
+
+
+def _llm_mark(backend, ok, elapsed=None):
+    with _llm_lock:
+        if ok:
+            backend["fail_streak"] = 0
+            backend["down_until"] = 0.0
+            if elapsed is not None:
+                ms = elapsed * 1000
+                backend["latencies"].append(ms)
+                prev = backend["ewma_ms"]
+                backend["ewma_ms"] = ms if prev is None else 0.7 * prev + 0.3 * ms
+        else:
+            backend["fail_streak"] += 1
+            if backend["fail_streak"] >= 2:
+                backoff = min(60.0, LLM_DOWN_BACKOFF_S * 2 ** (backend["fail_streak"] - 2))
+                backend["down_until"] = time.time() + backoff
+
+
+def llm_pick(exclude=()):
+    """Fastest healthy backend; untried backends rank first, in config order."""
+    now = time.time()
+    with _llm_lock:
+        candidates = [b for b in llm_backends if b["name"] not in exclude]
+        healthy = [b for b in candidates if b["down_until"] <= now]
+        pool = healthy or candidates  # everything down: still try something
+        if not pool:
+            return None
+        return min(pool, key=lambda b: (b["ewma_ms"] or 0.0, llm_backends.index(b)))
+
+
+def _llm_call(backend, payload, cancel=None):
+    with _llm_lock:
+        backend["requests"] += 1
+    t0 = time.time()
+    try:
+        body = http_request(
+            backend["url"],
+            data=payload,
+            headers={"Content-Type": "application/json"},
+            timeout=LLM_TIMEOUT_S,
+            cancel=cancel,
         )
+        data = json.loads(body)
+        content = data["choices"][0]["message"]["content"].strip()
+        _llm_record_prompt_eval(backend, data)
+    except Exception:
+        if cancel is not None and cancel.is_set():
+            raise CommandCancelled()  # aborted by us; not the backend's fault
+        with _llm_lock:
+            backend["errors"] += 1
+        _llm_mark(backend, ok=False)
+        raise
+    _llm_mark(backend, ok=True, elapsed=time.time() - t0)
+    return content
+
+
+def _llm_record_prompt_eval(backend, data):
+    """Record prompt processing cost from llama-server timings or vLLM usage."""
+    timings = data.get("timings") or {}
+    usage = data.get("usage") or {}
+    prompt_tokens = usage.get("prompt_tokens")
+    if "prompt_n" in timings:
+        evaluated = timings.get("prompt_n") or 0
+        cached = timings.get("cache_n")
+        if cached is None and isinstance(prompt_tokens, int):
+            cached = max(prompt_tokens - evaluated, 0)
+        prompt_ms = timings.get("prompt_ms")
+    else:
+        cached = (usage.get("prompt_tokens_details") or {}).get("cached_tokens")
+        if not isinstance(prompt_tokens, int) or cached is None:
+            return
+        evaluated = prompt_tokens - cached
+        prompt_ms = None
+    with _llm_lock:
+        backend["prompt_evals"].append((prompt_ms, evaluated, cached or 0))
+
+
+def _prompt_eval_summary(evals):
+    reused = [e for e in evals if e[2] > 0]
+    cold = [e for e in evals if e[2] == 0]
+
+    def avg_ms(rows):
+        ms = [r[0] for r in rows if r[0] is not None]
+        return round(sum(ms) / len(ms), 1) if ms else None
+
+    return {
+        "queries": len(evals),
+        "reused": len(reused),
+        "prompt_ms_reused": avg_ms(reused),
+        "prompt_ms_cold": avg_ms(cold),
+        "evaluated_tokens_avg": round(sum(e[1] for e in evals) / len(evals), 1) if evals else None,
+        "cached_tokens_avg": round(sum(e[2] for e in evals) / len(evals), 1) if evals else None,
+    }
+
+
+def llm_route(payload_for, cancel=None):
+    """Send a chat request to the best backend, hedging to the next one.
+
+    The next backend is also asked when the first one fails or has not
+    answered after LLM_HEDGE_AFTER_S; the first successful answer wins.
+    Setting cancel aborts every in-flight request and raises CommandCancelled.
+    Requests still running when the route returns or raises are aborted too,
+    so a losing backend stops generating instead of finishing unheard.
+    """
+    t0 = time.time()
+    deadline = t0 + LLM_TIMEOUT_S
+    hedge_at = t0 + LLM_HEDGE_AFTER_S
+    tried = []
+    pending = {}
+    errors = []
+    route_cancel = threading.Event()  # set on return/raise, or within 50 ms of cancel
+
+    def launch():
+        backend = llm_pick(exclude={b["name"] for b in tried})
+        if backend is None:
+            return False
+        tried.append(backend)
+        pending[_llm_executor.submit(_llm_call, backend, payload_for(backend), route_cancel)] = backend
+        return True
 
-    payload = json.dumps({
-        "model": LLM_MODEL,
-        "messages": [
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": composed_user_text},
-        ],
-        "max_tokens": 150,
-        "temperature": 0.3,
-    }).encode()
-
-    req = urllib.request.Request(
-        LLM_URL,
-        data=payload,
-        headers={"Content-Type": "application/json"},
+    try:
+        launch()
+        while pending and time.time() < deadline:
+            _check_cancel(cancel)
+            can_hedge = len(tried) < len(llm_backends)
+            wait_until = min(deadline, hedge_at) if can_hedge else deadline
+            # Short slices so a barge-in is noticed quickly
+            done, _ = futures_wait(list(pending), timeout=min(0.05, max(0.0, wait_until - time.time())),
+                                   return_when=FIRST_COMPLETED)
+            for fut in done:
+                backend = pending.pop(fut)
+                try:
+                    content = fut.result()
+                except CommandCancelled:
+                    continue
+                except Exception as e:
+                    errors.append(f"{backend['name']}: {e}")
+                    continue
+                with _llm_lock:
+                    backend["wins"] += 1
+                    if len(tried) > 1:
+                        for b in tried:
+                            b["hedged"] += 1
+                    llm_decisions.appendleft({
+                        "timestamp": round(time.time(), 2),
+                        "tried": [b["name"] for b in tried],
+                        "winner": backend["name"],
+                        "latency_ms": round((time.time() - t0) * 1000),
+                        "errors": errors[:],
+                    })
+                return content
+
+            # Fail over immediately on errors, or hedge once the deadline passes
+            _check_cancel(cancel)
+            if can_hedge and (not pending or time.time() >= hedge_at):
+                reason = "failover" if not pending else "hedge"
+                if launch():
+                    log(f"LLM {reason} → {tried[-1]['name']} after {time.time() - t0:.1f}s")
+
+        with _llm_lock:
+            llm_decisions.appendleft({
+                "timestamp": round(time.time(), 2),
+                "tried": [b["name"] for b in tried],
+                "winner": None,
+                "latency_ms": round((time.time() - t0) * 1000),
+                "errors": errors[:],
+            })
+        raise RuntimeError("; ".join(errors) or f"no LLM answer within {LLM_TIMEOUT_S}s")
+    finally:
+        route_cancel.set()
+
+
+def _llm_probe(backend):
+    """Health probe; on the local server, a 1-token prompt keeps the model hot."""
+    if backend["local"]:
+        # Same system prefix and slot as real queries, so the probe refreshes
+        # the cached prefix instead of evicting it
+        payload = llm_payload(backend, llm_messages("ok"), max_tokens=1, temperature=0.0)
+        http_request(backend["url"], data=payload,
+                     headers={"Content-Type": "application/json"}, timeout=10.0)
+    else:
+        http_request(_llm_models_url(backend["url"]), timeout=3.0)
+
+
+def llm_keepalive_loop():
+    """Periodically probe every backend so routing knows who is healthy."""
+    while True:
+        for backend in llm_backends:
+            try:
+                _llm_probe(backend)
+                _llm_mark(backend, ok=True)
+            except Exception:
+                _llm_mark(backend, ok=False)
+        time.sleep(LLM_KEEPALIVE_S)
+
+
+def _percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))])
+
+
+def llm_router_snapshot():
+    now = time.time()
+    with _llm_lock:
+        backends = {}
+        for b in llm_backends:
+            lat = list(b["latencies"])
+            backends[b["name"]] = {
+                "url": b["url"],
+                "healthy": b["down_until"] <= now,
+                "ewma_ms": round(b["ewma_ms"]) if b["ewma_ms"] is not None else None,
+                "p50_ms": _percentile(lat, 50),
+                "p95_ms": _percentile(lat, 95),
+                "p99_ms": _percentile(lat, 99),
+                "requests": b["requests"],
+                "errors": b["errors"],
+                "wins": b["wins"],
+                "hedged": b["hedged"],
+                "prompt_eval": _prompt_eval_summary(list(b["prompt_evals"])),
+            }
+        return {"backends": backends, "decisions": list(llm_decisions)}
+
+
+def clean_llm_response(response):
+    """Remove <think>...</think> tags from Qwen3 reasoning output."""
+    cleaned = re.sub(r"<think>.*?</think>", "", response, flags=re.DOTALL).strip()
+    # If stripping removed everything, extract text from inside think tags
+    if not cleaned:
+        match = re.search(r"<think>(.*?)</think>", response, flags=re.DOTALL)
+        if match:
+            cleaned = match.group(1).strip()
+    return cleaned or "I'm not sure how to respond to that."
+
+
+# ---------------------------------------------------------------------------
+# LLM response cache — repeated questions under an unchanged context
+# ---------------------------------------------------------------------------
+
+_CACHE_STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "there", "any", "right", "now",
+    "currently", "at", "this", "moment", "please", "can", "you", "tell", "me",
+    "do", "does", "see", "to", "of", "in", "on", "it", "security", "hey",
+}
+
+_llm_cache = OrderedDict()  # normalized command -> entry dict
+_llm_cache_lock = threading.Lock()
+_llm_cache_fingerprint = None
+_embedder = None
+_embedder_failed = False
+llm_cache_stats = {
+    "hits": 0, "near_hits": 0, "misses": 0,
+    "invalidations": 0, "saved_s": 0.0,
+}
+
+
+def context_fingerprint(brief):
+    """Bucket the live context so small jitter doesn't defeat the cache.
+
+    Any change in alert level, person count, nearest-distance band or
+    restricted objects produces a new fingerprint.
+    """
+    if not isinstance(brief, dict):
+        return None
+    nearest = brief.get("nearest_person_m")
+    if not isinstance(nearest, (int, float)):
+        band = "none"
+    elif nearest < 1.0:
+        band = "<1m"
+    elif nearest < 2.0:
+        band = "<2m"
+    elif nearest < 3.0:
+        band = "<3m"
+    else:
+        band = "far"
+    people = brief.get("person_count")
+    return (
+        brief.get("alert_level"),
+        int(people) if isinstance(people, (int, float)) else None,
+        band,
+        tuple(sorted(brief.get("objects_of_interest") or [])),
     )
+
+
+def _cache_tokens(norm):
+    return frozenset(t for t in norm.split() if t not in _CACHE_STOPWORDS)
+
+
+def _get_embedder():
+    """Optional sentence embedder (ONNX model + tokenizer.json in LLM_CACHE_EMBED_DIR)."""
+    global _embedder, _embedder_failed
+    if _embedder is not None or _embedder_failed or not LLM_CACHE_EMBED_DIR:
+        return _embedder
     try:
-        with urllib.request.urlopen(req, timeout=45) as resp:
-            data = json.loads(resp.read())
-            return data["choices"][0]["message"]["content"].strip()
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+        t0 = time.time()
+        tokenizer = Tokenizer.from_file(os.path.join(LLM_CACHE_EMBED_DIR, "tokenizer.json"))
+        tokenizer.enable_truncation(max_length=64)
+        opts = ort.SessionOptions()
+        opts.intra_op_num_threads = 1
+        session = ort.InferenceSession(os.path.join(LLM_CACHE_EMBED_DIR, "model.onnx"), opts)
+        _embedder = (tokenizer, session)
+        log(f"Cache embedder loaded in {time.time()-t0:.1f}s")
     except Exception as e:
-        log(f"LLM error: {e}")
-        return f"Sorry, I couldn't process that. Error: {e}"
+        _embedder_failed = True
+        log(f"Cache embedder unavailable ({e}), using token overlap")
+    return _embedder
+
+
+def _embed(text):
+    embedder = _get_embedder()
+    if embedder is None:
+        return None
+    tokenizer, session = embedder
+    enc = tokenizer.encode(text)
+    ids = np.array([enc.ids], dtype=np.int64)
+    mask = np.array([enc.attention_mask], dtype=np.int64)
+    feeds = {"input_ids": ids, "attention_mask": mask}
+    if any(i.name == "token_type_ids" for i in session.get_inputs()):
+        feeds["token_type_ids"] = np.zeros_like(ids)
+    hidden = session.run(None, feeds)[0][0]  # (tokens, dim)
+    vec = (hidden * mask[0][:, None]).sum(axis=0) / max(mask.sum(), 1)
+    return vec / (np.linalg.norm(vec) or 1.0)
+
+
+def _similarity(entry, norm, tokens, vec):
+    if vec is not None and entry.get("vec") is not None:
+        return float(np.dot(vec, entry["vec"]))
+    union = tokens | entry["tokens"]
+    return len(tokens & entry["tokens"]) / len(union) if union else 0.0
+
+
+def _llm_cache_check_context(fingerprint):
+    """Drop every entry when the bucketed context changes. Caller holds the lock."""
+    global _llm_cache_fingerprint
+    if fingerprint != _llm_cache_fingerprint:
+        if _llm_cache:
+            llm_cache_stats["invalidations"] += 1
+        _llm_cache.clear()
+        _llm_cache_fingerprint = fingerprint
+
+
+def llm_cache_lookup(command, brief):
+    """Return a cached response for command under the current context, or None."""
+    if not LLM_CACHE_ENABLED:
+        return None
+    norm = normalize_command(command)
+    tokens = _cache_tokens(norm)
+    fingerprint = context_fingerprint(brief)
+    now = time.time()
+    with _llm_cache_lock:
+        _llm_cache_check_context(fingerprint)
+        for key in [k for k, e in _llm_cache.items() if now - e["ts"] > LLM_CACHE_TTL_S]:
+            del _llm_cache[key]
+        entry = _llm_cache.get(norm)
+        if entry is not None:
+            _llm_cache.move_to_end(norm)
+            llm_cache_stats["hits"] += 1
+            llm_cache_stats["saved_s"] += entry["llm_time"]
+            return entry["response"]
+        candidates = list(_llm_cache.items())
+
+    vec = None
+    if candidates:
+        try:
+            vec = _embed(norm)
+        except Exception:
+            vec = None  # embedder failed: fall back to token similarity
+    best_key, best_sim = None, 0.0
+    for key, entry in candidates:
+        sim = _similarity(entry, norm, tokens, vec)
+        if sim > best_sim:
+            best_key, best_sim = key, sim
+    threshold = LLM_CACHE_EMBED_MIN_SIM if vec is not None else LLM_CACHE_TOKEN_MIN_SIM
+
+    with _llm_cache_lock:
+        entry = _llm_cache.get(best_key) if best_sim >= threshold else None
+        if entry is None or _llm_cache_fingerprint != fingerprint:
+            llm_cache_stats["misses"] += 1
+            return None
+        _llm_cache.move_to_end(best_key)
+        llm_cache_stats["near_hits"] += 1
+        llm_cache_stats["saved_s"] += entry["llm_time"]
+        return entry["response"]
+
+
+def llm_cache_store(command, brief, response, llm_time):
+    if not LLM_CACHE_ENABLED or response.startswith(LLM_ERROR_PREFIX):
+        return
+    norm = normalize_command(command)
+    try:
+        vec = _embed(norm)
+    except Exception:
+        vec = None
+    entry = {
+        "ts": time.time(),
+        "response": response,
+        "llm_time": llm_time,
+        "tokens": _cache_tokens(norm),
+        "vec": vec,
+    }
+    with _llm_cache_lock:
+        _llm_cache_check_context(context_fingerprint(brief))
+        _llm_cache[norm] = entry
+        _llm_cache.move_to_end(norm)
+        while len(_llm_cache) > LLM_CACHE_MAX_ENTRIES:
+            _llm_cache.popitem(last=False)
+
+
+def llm_cache_snapshot():
+    with _llm_cache_lock:
+        lookups = llm_cache_stats["hits"] + llm_cache_stats["near_hits"] + llm_cache_stats["misses"]
+        out = dict(llm_cache_stats, entries=len(_llm_cache))
+    out["saved_s"] = round(out["saved_s"], 1)
+    out["hit_rate"] = round((out["hits"] + out["near_hits"]) / lookups, 3) if lookups else None
+    return out
 
 
 # ---------------------------------------------------------------------------
@@ -296,13 +1846,16 @@ def start_llm_server():
     """Start llama-server in the background (skipped when using remote LLM)."""
     global llm_server_proc
 
-    if "127.0.0.1" not in LLM_URL and "localhost" not in LLM_URL:
+    local = next((b for b in llm_backends if b["local"]), None)
+    if local is None:
         log(f"Using remote LLM at {LLM_URL}, skipping local server start")
         return
+    parts = urllib.parse.urlsplit(local["url"])
+    health_url = f"{parts.scheme}://{parts.netloc}/health"
 
     # Check if already running
     try:
-        urllib.request.urlopen("http://127.0.0.1:8081/health", timeout=2)
+        urllib.request.urlopen(health_url, timeout=2)
         log("LLM server already running")
         return
     except Exception:
@@ -324,7 +1877,7 @@ def start_llm_server():
     log(f"Starting LLM server: {os.path.basename(server_bin)}")
     llm_server_proc = subprocess.Popen(
         [
-            "taskset", "-c", "4-7",
+            "taskset", "-c", LLM_CPUS,
             server_bin,
             "-m", model_path,
             "-t", "4",
@@ -336,21 +1889,23 @@ def start_llm_server():
         stderr=subprocess.DEVNULL,
     )
 
-    # Wait for it to be ready
-    for i in range(60):
-        time.sleep(1)
+    # Wait for it to be ready; raising marks the llm warm-up as an error
+    for i in range(240):
+        time.sleep(0.25)
+        if llm_server_proc.poll() is not None:
+            raise RuntimeError(f"llama-server exited with code {llm_server_proc.returncode}")
         try:
-            urllib.request.urlopen("http://127.0.0.1:8081/health", timeout=2)
+            urllib.request.urlopen(health_url, timeout=2)
             log("LLM server ready")
             return
         except Exception:
             pass
-    log("WARNING: LLM server may not be ready")
+    raise RuntimeError("llama-server did not pass /health within 60s")
 
 
 def stop_llm_server():
     global llm_server_proc
-    if "127.0.0.1" not in LLM_URL and "localhost" not in LLM_URL:
+    if not any(b["local"] for b in llm_backends):
         return
     if llm_server_proc:
         llm_server_proc.terminate()
@@ -359,6 +1914,85 @@ def stop_llm_server():
         log("LLM server stopped")
 
 
+# ---------------------------------------------------------------------------
+# Startup — parallel model warm-up with per-model readiness
+# ---------------------------------------------------------------------------
+
+_startup_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="warmup")
+_startup_futures = {}
+model_status = {}   # name -> {"state": loading|ready|error, "load_s": float}
+startup_stats = {"listening_s": None, "all_ready_s": None}
+_startup_t0 = None
+
+
+def _load_tts():
+    get_voice()
+    warm_tts_cache()
+
+
+def _load_vad():
+    for name in rooms:
+        get_vad(name)
+
+
+# Loaded concurrently; VAD first since wake-word listening needs only VAD
+STARTUP_MODELS = [
+    ("vad", _load_vad),
+    ("stt", start_stt_service),
+    ("tts", _load_tts),
+    ("llm", start_llm_server),
+]
+
+
+def _run_warmup(name, fn):
+    t0 = time.time()
+    try:
+        fn()
+        state = "ready"
+    except Exception as e:
+        log(f"Warm-up of {name} failed: {e}")
+        state = "error"
+    first_done = False
+    with lock:
+        model_status[name] = {"state": state, "load_s": round(time.time() - t0, 2)}
+        done = all(m.get("state") == "ready" for m in model_status.values())
+        if done and startup_stats["all_ready_s"] is None:
+            startup_stats["all_ready_s"] = round(time.time() - _startup_t0, 2)
+            first_done = True
+    if first_done:
+        log(f"All models warmed in {startup_stats['all_ready_s']:.1f}s")
+
+
+def start_model_warmup():
+    """Submit every model load in parallel (idempotent across /stop + /start)."""
+    global _startup_t0
+    with lock:
+        if _startup_t0 is None:
+            _startup_t0 = time.time()
+        for name, fn in STARTUP_MODELS:
+            fut = _startup_futures.get(name)
+            if fut is not None and model_status.get(name, {}).get("state") != "error":
+                continue
+            model_status[name] = {"state": "loading", "load_s": None}
+            _startup_futures[name] = _startup_executor.submit(_run_warmup, name, fn)
+
+
+def wait_model(name, timeout=None):
+    """Block until a model's warm-up finishes; True if it is ready."""
+    fut = _startup_futures.get(name)
+    if fut is not None:
+        try:
+            fut.result(timeout=timeout)
+        except Exception:
+            pass
+    return model_ready(name)
+
+
+def model_ready(name):
+    with lock:
+        return model_status.get(name, {}).get("state") == "ready"
+
+
 # ---------------------------------------------------------------------------
 # Main assistant loop
 # ---------------------------------------------------------------------------
@@ -367,221 +2001,363 @@ def log(msg):
     print(f"[{time.strftime('%H:%M:%S')}] {msg}", flush=True)
 
 
-def set_state(state):
+def room_log(room, msg):
+    log(f"[{room['name']}] {msg}" if len(rooms) > 1 else msg)
+
+
+_STATE_RANK = {"idle": 0, "listening": 1, "recording": 2, "thinking": 3, "speaking": 4}
+
+
+def set_state(state, room=None):
+    """Set one room's state (all rooms when room is None); current_state
+    follows the busiest room."""
     global current_state
     with lock:
-        current_state = state
-    log(f"State: {state}")
+        for r in ([room] if room is not None else rooms.values()):
+            r["state"] = state
+        current_state = max((r["state"] for r in rooms.values()), key=_STATE_RANK.get, default=state)
+    if room is None:
+        log(f"State: {state}")
+    else:
+        room_log(room, f"State: {state}")
 
 
 def assistant_loop():
-    """Main loop: listen for wake word, record command, LLM, speak."""
+    """Main loop: one listener per room; rooms share STT, TTS and the LLM."""
     global assistant_running
 
-    # Load models eagerly
-    get_recognizer()
-    get_vad()
-    get_voice()
-    start_llm_server()
+    # Load models in the background; audio opens while they load
+    t_start = time.time()
+    start_model_warmup()
 
-    pa = pyaudio.PyAudio()
-    input_device = find_audio_device(pa)
-    output_device = find_output_device(pa)
+    threads = [
+        threading.Thread(target=_room_loop, args=(room, t_start), daemon=True, name=f"room-{name}")
+        for name, room in rooms.items()
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
 
-    if input_device is None:
-        log("ERROR: No audio input device found")
-        assistant_running = False
+    with lock:
+        assistant_running = False  # also when every room failed to open
+    set_state("idle")
+    log("Assistant stopped")
+
+
+def _room_loop(room, t_start):
+    """Open a room's audio, then listen for the wake word until stopped."""
+    audio = audio_io_factory(room)
+    devices = audio.describe()
+
+    if devices is None:
+        room_log(room, f"ERROR: No audio input device matching {room['device']!r}")
+        audio.close()
         return
 
-    log(f"Audio input device: {pa.get_device_info_by_index(input_device)['name']}")
-    log(f"Audio output device: {pa.get_device_info_by_index(output_device)['name'] if output_device else 'default'}")
+    room_log(room, f"Audio input device: {devices[0]}")
+    room_log(room, f"Audio output device: {devices[1]}")
+    with lock:
+        room["audio"] = audio
+        room["devices"] = devices
+
+    # Wake-word listening needs VAD; STT is awaited on the first utterance
+    if not wait_model("vad", timeout=60):
+        room_log(room, "ERROR: VAD model failed to load")
+        audio.close()
+        return
 
-    # Play a startup chime (synthesize a short greeting)
+    # Play a startup chime — from the disk TTS cache if Piper is still loading
     try:
-        greeting = synthesize("Local Guard voice assistant online.")
-        play_wav(pa, greeting, output_device)
+        greeting = synthesize_cached(GREETING_PHRASE, allow_synth=model_ready("tts"))
+        if greeting:
+            audio.play(greeting)
     except Exception as e:
-        log(f"Startup greeting failed: {e}")
+        room_log(room, f"Startup greeting failed: {e}")
 
-    log(f'Listening for wake word: "{WAKE_WORD}"')
+    with lock:
+        if startup_stats["listening_s"] is None:
+            startup_stats["listening_s"] = round(time.time() - t_start, 2)
+    room_log(room, f'Listening for wake word: "{WAKE_WORD}" ({time.time() - t_start:.1f}s after start)')
 
     while assistant_running:
         try:
-            _listen_cycle(pa, input_device, output_device)
+            _listen_loop(room)
         except Exception as e:
-            log(f"Error in listen cycle: {e}")
-            time.sleep(1)
+            room_log(room, f"Error in listen loop: {e}")
+        if assistant_running:
+            time.sleep(1)  # back off before reopening the input stream
 
-    set_state("idle")
-    pa.terminate()
-    log("Assistant stopped")
+    cancel_command(room)
+    set_state("idle", room)
+    audio.close()
+    with lock:
+        room["audio"] = None
 
 
-def _listen_cycle(pa, input_device, output_device):
-    """One cycle: accumulate audio, transcribe periodically, check for wake word."""
-    set_state("listening")
+# ---------------------------------------------------------------------------
+# Pipeline stages — per room: capture thread → listener (VAD/STT/wake word)
+# → command worker (context/LLM/TTS/playback). Each command runs with its own
+# cancellation token; a new wake word in the same room cancels the one in
+# flight there (barge-in).
+# ---------------------------------------------------------------------------
 
-    stream = pa.open(
-        format=pyaudio.paInt16,
-        channels=CHANNELS,
-        rate=SAMPLE_RATE,
-        input=True,
-        input_device_index=input_device,
-        frames_per_buffer=CHUNK,
-    )
+def _new_room(name, device, occurrence):
+    return {
+        "name": name, "device": device, "occurrence": occurrence,
+        "state": "idle", "audio": None, "devices": None,
+        "cancel": None,  # threading.Event of the room's running command
+        "wake_events": 0, "commands": 0, "barge_ins": 0,
+        "interactions": deque(maxlen=10),
+    }
 
-    vad = get_vad()
-    audio_buffer = []
-    speech_detected = False
-    silence_start = None
 
-    try:
-        while assistant_running:
-            raw = stream.read(CHUNK, exception_on_overflow=False)
-            samples = np.frombuffer(raw, dtype=np.int16).astype(np.float32) / 32768.0
-            audio_buffer.extend(samples)
+rooms = {name: _new_room(name, device, nth) for name, device, nth in parse_rooms(AUDIO_ROOMS)}
+_command_lock = threading.Lock()
+_wake_times = deque(maxlen=500)  # wake events across rooms, for the handled rate
 
-            # Check VAD
-            is_speech = vad.is_speech(samples)
 
-            if is_speech:
-                speech_detected = True
-                silence_start = None
-            elif speech_detected:
-                if silence_start is None:
-                    silence_start = time.time()
-                elif time.time() - silence_start > 0.6:
-                    # Speech ended — transcribe what we have
-                    audio_arr = np.array(audio_buffer, dtype=np.float32)
-                    audio_buffer.clear()
-                    speech_detected = False
-                    silence_start = None
-
-                    if len(audio_arr) < SAMPLE_RATE * 0.3:
-                        continue  # too short, skip
-
-                    text = transcribe(audio_arr)
-                    if not text:
-                        continue
-
-                    log(f"Heard: {text}")
-
-                    # Check for wake word
-                    lower = text.lower().strip()
-                    if lower.startswith(WAKE_WORD) or WAKE_WORD in lower[:30]:
-                        # Extract command after wake word
-                        idx = lower.find(WAKE_WORD)
-                        command = text[idx + len(WAKE_WORD):].strip(" .,!?")
-
-                        if len(command) < 3:
-                            # Wake word only — record the actual command
-                            stream.stop_stream()
-                            stream.close()
-                            _record_command(pa, input_device)
-                            return
-
-                        # We got wake word + command in one utterance
-                        stream.stop_stream()
-                        stream.close()
-                        _handle_command(pa, command, output_device)
-                        return
+def _put_latest(frames, item):
+    """Queue item, dropping the oldest frame when the queue is full."""
+    try:
+        frames.put_nowait(item)
+    except queue.Full:
+        try:
+            frames.get_nowait()
+        except queue.Empty:
+            pass
+        frames.put_nowait(item)
 
-            # Don't let buffer grow forever
-            max_samples = SAMPLE_RATE * 15
-            if len(audio_buffer) > max_samples:
-                audio_buffer = audio_buffer[-max_samples:]
 
+def _capture_loop(audio, frames, stop):
+    """Read the microphone continuously into a bounded queue (drops oldest)
+    until stop (threading.Event) is set or the assistant stops."""
+    stream = None
+    try:
+        stream = audio.open_input()
+        while assistant_running and not stop.is_set():
+            _put_latest(frames, stream.read())
+    except Exception as e:
+        log(f"Capture error: {e}")
     finally:
-        try:
-            if stream.is_active():
-                stream.stop_stream()
-            stream.close()
-        except Exception:
-            pass
+        if stream is not None:
+            try:
+                stream.close()
+            except Exception:
+                pass
+        _put_latest(frames, None)  # wake the listener
+
+
+def start_task(room, fn, *args, done_state="listening"):
+    """Run fn(room, *args, cancel=token) in a worker, cancelling the room's
+    previous task."""
+    cancel = threading.Event()
+    with _command_lock:
+        if room["cancel"] is not None:
+            room["cancel"].set()
+        room["cancel"] = cancel
+    threading.Thread(target=_run_task, args=(room, fn, args, cancel, done_state), daemon=True).start()
+    return cancel
+
+
+def _run_task(room, fn, args, cancel, done_state):
+    try:
+        fn(room, *args, cancel=cancel)
+    except CommandCancelled:
+        room_log(room, "Command cancelled")
+    except Exception as e:
+        room_log(room, f"Command error: {e}")
+    finally:
+        with _command_lock:
+            finished_last = room["cancel"] is cancel
+            if finished_last:
+                room["cancel"] = None
+        if finished_last and done_state and not cancel.is_set():
+            set_state(done_state, room)
+
+
+def cancel_command(room=None):
+    """Cancel the in-flight command (in every room when room is None):
+    aborts its LLM request and playback."""
+    cancelled = False
+    for r in ([room] if room is not None else list(rooms.values())):
+        with _command_lock:
+            cancel = r["cancel"]
+        if cancel is not None and not cancel.is_set():
+            cancel.set()
+            with lock:
+                r["barge_ins"] += 1
+            cancelled = True
+    return cancelled
 
 
-def _record_command(pa, input_device):
-    """Record a command after wake word was detected."""
-    set_state("recording")
+def _play_ack(room, cancel=None):
+    set_state("recording", room)
+    ack = synthesize_cached(ACK_PHRASE)
+    room["audio"].play(ack, cancel=cancel)
 
-    # Play a short beep-like acknowledgment
-    try:
-        ack = synthesize("Yes?")
-        output_device = find_output_device(pa)
-        play_wav(pa, ack, output_device)
-    except Exception:
-        pass
 
-    stream = pa.open(
-        format=pyaudio.paInt16,
-        channels=CHANNELS,
-        rate=SAMPLE_RATE,
-        input=True,
-        input_device_index=input_device,
-        frames_per_buffer=CHUNK,
-    )
+def _listen_loop(room):
+    """Segment speech with VAD, transcribe each utterance, dispatch commands.
 
-    vad = get_vad()
+    Runs while commands are being answered, so a wake word during "thinking"
+    or "speaking" interrupts the current answer and starts a new command.
+    """
+    set_state("listening", room)
+    frames = queue.Queue(maxsize=int(SAMPLE_RATE * CAPTURE_QUEUE_S / CHUNK))
+    stop = threading.Event()  # this call's capture thread only
+    capture = threading.Thread(target=_capture_loop, args=(room["audio"], frames, stop), daemon=True)
+    capture.start()
+
+    vad = get_vad(room["name"])
     audio_buffer = []
     speech_detected = False
-    silence_start = None
-    start_time = time.time()
+    silence_samples = 0
+    vad_time = 0.0  # VAD compute spent on the current utterance
+    awaiting_samples = None  # samples since a bare wake word, while awaiting the command
+    max_samples = SAMPLE_RATE * 15
 
     try:
-        while time.time() - start_time < MAX_COMMAND_DURATION:
-            raw = stream.read(CHUNK, exception_on_overflow=False)
-            samples = np.frombuffer(raw, dtype=np.int16).astype(np.float32) / 32768.0
+        while assistant_running:
+            try:
+                samples = frames.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if samples is None:
+                break  # capture stopped
             audio_buffer.extend(samples)
 
+            if not speech_detected and awaiting_samples is None:
+                vad_time = 0.0  # count VAD compute from speech onset
+            t0 = time.time()
             is_speech = vad.is_speech(samples)
-
+            vad_time += time.time() - t0
             if is_speech:
+                if not speech_detected:
+                    # Speculative: any utterance may be "Security, <command>"
+                    prefetch_context()
                 speech_detected = True
-                silence_start = None
+                silence_samples = 0
             elif speech_detected:
-                if silence_start is None:
-                    silence_start = time.time()
-                elif time.time() - silence_start > SILENCE_AFTER_WAKE:
-                    break  # Done recording
+                silence_samples += len(samples)
+
+            end_of_speech = False
+            if awaiting_samples is not None:
+                # Keep context fresh while the user is still speaking
+                prefetch_context()
+                awaiting_samples += len(samples)
+                timed_out = awaiting_samples > SAMPLE_RATE * MAX_COMMAND_DURATION
+                if speech_detected and (silence_samples > SAMPLE_RATE * SILENCE_AFTER_WAKE or timed_out):
+                    end_of_speech = True
+                elif timed_out:
+                    awaiting_samples = None
+                    audio_buffer.clear()
+                    set_state("listening", room)
+            elif speech_detected and silence_samples > SAMPLE_RATE * 0.6:
+                end_of_speech = True
+
+            if end_of_speech:
+                audio_arr = np.array(audio_buffer, dtype=np.float32)
+                audio_buffer.clear()
+                speech_detected = False
+                silence_samples = 0
+                was_awaiting = awaiting_samples is not None
+                awaiting_samples = None
+                meta = {"heard_at": time.time(), "vad": vad_time}
+                if _on_utterance(room, audio_arr, was_awaiting, meta):
+                    awaiting_samples = 0
+
+            # Don't let buffer grow forever
+            if len(audio_buffer) > max_samples:
+                audio_buffer = audio_buffer[-max_samples:]
     finally:
-        try:
-            stream.stop_stream()
-            stream.close()
-        except Exception:
-            pass
+        stop.set()
+        capture.join(timeout=1.0)
 
-    if not audio_buffer:
-        return
 
-    audio_arr = np.array(audio_buffer, dtype=np.float32)
-    command = transcribe(audio_arr)
-    log(f"Command: {command}")
+def _on_utterance(room, audio_arr, awaiting_command, meta):
+    """Handle one finished utterance. Returns True when a bare wake word was
+    heard and the next utterance should be taken as the command.
 
-    if command:
-        output_device = find_output_device(pa)
-        _handle_command(pa, command, output_device)
+    meta carries per-stage timings ("heard_at", "vad", "stt") for the command.
+    """
+    if len(audio_arr) < SAMPLE_RATE * 0.3:
+        return awaiting_command  # too short, skip
+
+    t0 = time.time()
+    # An awaited command jumps the STT queue ahead of wake-word scanning
+    text = transcribe(audio_arr, PRIORITY_COMMAND if awaiting_command else PRIORITY_LISTEN)
+    meta["stt"] = time.time() - t0
+    if not text:
+        return awaiting_command
+    room_log(room, f"Heard: {text}")
+
+    # Check for wake word
+    lower = text.lower().strip()
+    if lower.startswith(WAKE_WORD) or WAKE_WORD in lower[:30]:
+        with lock:
+            room["wake_events"] += 1
+            _wake_times.append(time.time())
+        if cancel_command(room):
+            room_log(room, "Barge-in: interrupted previous command")
+        prefetch_context(warm_llm=True)
+
+        # Extract command after wake word
+        idx = lower.find(WAKE_WORD)
+        command = text[idx + len(WAKE_WORD):].strip(" .,!?")
+        if len(command) < 3:
+            # Wake word only — acknowledge, then take the next utterance
+            start_task(room, _play_ack, done_state=None)
+            return True
+        start_task(room, _handle_command, command, meta)
+        return False
+
+    if awaiting_command:
+        start_task(room, _handle_command, text, meta)
+    return False
+
+
+def rooms_snapshot():
+    """Per-room state for /status (call with lock held)."""
+    return {
+        name: {
+            "state": r["state"],
+            "device": r["devices"][0] if r["devices"] else None,
+            "active": r["audio"] is not None,
+            "wake_events": r["wake_events"],
+            "commands": r["commands"],
+            "barge_ins": r["barge_ins"],
+            "interactions": list(r["interactions"]),
+        }
+        for name, r in rooms.items()
+    }
+
+
+def wake_rate(window_s=60.0):
+    """Wake events handled per second over the last window (call with lock held)."""
+    cutoff = time.time() - window_s
+    return round(sum(1 for t in _wake_times if t >= cutoff) / window_s, 3)
 
 
 def fetch_structured_context():
-    """Fetch parsed JSON from /api/insights/brief and latest event."""
-    brief = None
+    """Fetch parsed JSON from /api/insights/brief and latest event.
+
+    Reads the pushed sensor snapshot when fresh (no network I/O); otherwise
+    the shared context cache refreshes stale keys concurrently under a single
+    INSIGHTS_TIMEOUT_S deadline.
+    """
+    pushed = sensor_snapshot()
+    if pushed is not None:
+        return pushed
+
+    entries = context_get(["brief", "events"])
+    brief = _fresh_value(entries["brief"])
+    data = _fresh_value(entries["events"])
     event = None
-
-    try:
-        with urllib.request.urlopen(INSIGHTS_BRIEF_URL, timeout=INSIGHTS_TIMEOUT_S) as resp:
-            brief = json.loads(resp.read())
-    except Exception:
-        pass
-
-    try:
-        with urllib.request.urlopen(EVENTS_URL, timeout=INSIGHTS_TIMEOUT_S) as resp:
-            data = json.loads(resp.read())
-            events = data.get("events") or []
-            if events:
-                event = events[0]
-    except Exception:
-        pass
-
+    if isinstance(data, dict):
+        events = data.get("events") or []
+        if events:
+            event = events[0]
     return brief, event
 
 
@@ -598,143 +2374,309 @@ INTENT_PATTERNS = [
     ("last_event",        ["last event", "latest event", "what happened", "recent event", "most recent"]),
 ]
 
+_NON_WORD_RE = re.compile(r"[^a-z0-9 ]+")
+
+# Compiled matcher state (see compile_intents)
+_intent_regex = None
+_intent_phrases = []  # index -> (intent_key, phrase tokens)
+
+
+def load_intent_patterns(path):
+    """Load intents from JSON: {"intents": [{"key": ..., "phrases": [...]}, ...]}."""
+    with open(path) as f:
+        data = json.load(f)
+    patterns = []
+    for item in data.get("intents") or []:
+        key = item.get("key")
+        phrases = [p for p in item.get("phrases") or [] if isinstance(p, str) and p.strip()]
+        if key and phrases:
+            patterns.append((key, phrases))
+    return patterns
+
+
+def normalize_command(text):
+    """Lowercase, drop apostrophes and punctuation, collapse whitespace."""
+    text = text.lower().replace("'", "").replace("\u2019", "")
+    return " ".join(_NON_WORD_RE.sub(" ", text).split())
+
+
+def compile_intents(patterns):
+    """Compile all phrases into one word-bounded alternation regex."""
+    global INTENT_PATTERNS, _intent_regex, _intent_phrases
+    phrases = []
+    for intent_key, intent_phrases in patterns:
+        for phrase in intent_phrases:
+            norm = normalize_command(phrase)
+            if norm:
+                phrases.append((intent_key, tuple(norm.split())))
+    # One capture group per phrase; longest first so specific phrases win
+    order = sorted(range(len(phrases)), key=lambda i: -len(" ".join(phrases[i][1])))
+    _intent_phrases = [phrases[i] for i in order]
+    alternation = "|".join(f"({re.escape(' '.join(toks))})" for _, toks in _intent_phrases)
+    _intent_regex = re.compile(rf"\b(?:{alternation})\b")
+    INTENT_PATTERNS = list(patterns)
+
+
+@functools.lru_cache(maxsize=4096)
+def _token_similarity(a, b):
+    if a == b:
+        return 1.0
+    # Short tokens ("how", "any") must match exactly to avoid false hits
+    if min(len(a), len(b)) <= 3:
+        return 0.0
+    return difflib.SequenceMatcher(None, a, b).ratio()
+
+
+def score_intents(command):
+    """Score every intent for a command. Returns {intent_key: score}.
+
+    Exact phrase hits come from the compiled regex and score their token
+    count. Only when nothing hits exactly, each phrase is aligned against
+    every token window and scores mean token similarity x token count.
+    """
+    norm = normalize_command(command)
+    scores = {}
+    for m in _intent_regex.finditer(norm):
+        intent_key, toks = _intent_phrases[m.lastindex - 1]
+        scores[intent_key] = max(scores.get(intent_key, 0.0), float(len(toks)))
+    if scores:
+        return scores
+
+    tokens = norm.split()
+    for intent_key, toks in _intent_phrases:
+        n = len(toks)
+        for start in range(len(tokens) - n + 1):
+            sims = [_token_similarity(toks[i], tokens[start + i]) for i in range(n)]
+            if min(sims) < INTENT_FUZZY_TOKEN_MIN:
+                continue
+            score = sum(sims)  # == mean similarity x token count
+            if score > scores.get(intent_key, 0.0):
+                scores[intent_key] = score
+    return scores
+
 
 def match_intent(command):
     """Match command text against known intent patterns. Returns intent key or None."""
-    lower = command.lower().strip()
-    for intent_key, phrases in INTENT_PATTERNS:
-        for phrase in phrases:
-            if phrase in lower:
-                return intent_key
-    return None
+    scores = score_intents(command)
+    if not scores:
+        return None
+    # Highest score wins; ties go to the intent listed first in INTENT_PATTERNS
+    rank = {key: i for i, (key, _) in enumerate(INTENT_PATTERNS)}
+    best = max(scores, key=lambda k: (scores[k], -rank.get(k, len(rank))))
+    return best if scores[best] >= INTENT_MIN_SCORE else None
 
 
-def build_intent_response(intent_key, brief, event):
-    """Build a templated response string for a matched intent."""
+if INTENTS_FILE and os.path.exists(INTENTS_FILE):
+    compile_intents(load_intent_patterns(INTENTS_FILE))
+else:
+    compile_intents(INTENT_PATTERNS)
+
+
+def spoken_meters(value):
+    """Distance as spoken: one decimal, the form warm_tts_cache pre-synthesizes."""
+    return f"{value:.1f}"
+
+
+def build_intent_fragments(intent_key, brief, event):
+    """Build a templated response for a matched intent as (text, kind) fragments.
+
+    kind is "fixed" for template text, "number" for short dynamic values and
+    "free" for arbitrary text (see synthesize_fragments).
+    """
     if intent_key == "status":
         if not brief:
-            return "I can't reach the dashboard right now. System status unknown."
+            return [("I can't reach the dashboard right now. System status unknown.", "fixed")]
         level = brief.get("alert_level", "unknown")
         risk = brief.get("risk_score", "?")
         people = brief.get("person_count", 0)
         nearest = brief.get("nearest_person_m")
-        nearest_str = f"{nearest:.1f} meters" if isinstance(nearest, (int, float)) and nearest is not None else "unknown"
-        return (
-            f"System is at {level} alert, risk score {risk}. "
-            f"{people} {'person' if people == 1 else 'people'} detected, "
-            f"nearest at {nearest_str}."
+        nearest_frags = (
+            [(spoken_meters(nearest), "number"), ("meters.", "fixed")]
+            if isinstance(nearest, (int, float))
+            else [("unknown.", "fixed")]
         )
+        # Numbers stay bare so they hit the warmed cache; punctuation rides on fixed text
+        return [
+            (f"System is at {level} alert, risk score", "fixed"),
+            (f"{risk}", "number"),
+            ("out of 100.", "fixed"),
+            (f"{people}", "number"),
+            (f"{'person' if people == 1 else 'people'} detected, nearest at", "fixed"),
+        ] + nearest_frags
 
     if intent_key == "people_count":
         if not brief:
-            return "I can't reach the sensors right now."
+            return [("I can't reach the sensors right now.", "fixed")]
         people = brief.get("person_count", 0)
-        return f"There {'is' if people == 1 else 'are'} {people} {'person' if people == 1 else 'people'} detected right now."
+        return [
+            (f"There {'is' if people == 1 else 'are'}", "fixed"),
+            (f"{people}", "number"),
+            (f"{'person' if people == 1 else 'people'} detected right now.", "fixed"),
+        ]
 
     if intent_key == "nearest_person":
         if not brief:
-            return "Sensor data is unavailable."
+            return [("Sensor data is unavailable.", "fixed")]
         nearest = brief.get("nearest_person_m")
         if nearest is None or not isinstance(nearest, (int, float)):
-            return "No person currently detected in range."
-        return f"The nearest person is {nearest:.2f} meters away."
+            return [("No person currently detected in range.", "fixed")]
+        return [
+            ("The nearest person is", "fixed"),
+            (spoken_meters(nearest), "number"),
+            ("meters away.", "fixed"),
+        ]
 
     if intent_key == "restricted_objects":
         if not brief:
-            return "I can't check right now. Sensor data unavailable."
+            return [("I can't check right now. Sensor data unavailable.", "fixed")]
         objects = brief.get("objects_of_interest") or []
         if not objects:
-            return "No restricted objects detected at this time."
+            return [("No restricted objects detected at this time.", "fixed")]
         obj_list = ", ".join(objects[:4])
-        return f"Restricted objects detected: {obj_list}."
+        return [("Restricted objects detected:", "fixed"), (f"{obj_list}.", "free")]
 
     if intent_key == "last_event":
         if event:
             msg = event.get("message", "Unknown event")
-            return f"The last event was: {msg}."
+            return [("The last event was:", "fixed"), (f"{msg}.", "free")]
         if brief and brief.get("last_event"):
-            return f"The last event was: {brief['last_event']}."
-        return "No events recorded yet."
+            return [("The last event was:", "fixed"), (f"{brief['last_event']}.", "free")]
+        return [("No events recorded yet.", "fixed")]
 
     return None
 
 
-def _handle_command(pa, command, output_device):
-    """Handle a voice command — try intent match first, fall back to LLM."""
+def build_intent_response(intent_key, brief, event):
+    """Build a templated response string for a matched intent."""
+    fragments = build_intent_fragments(intent_key, brief, event)
+    return fragments_text(fragments) if fragments else None
+
+
+def _check_cancel(cancel):
+    if cancel is not None and cancel.is_set():
+        raise CommandCancelled()
+
+
+def _record_interaction(room, entry):
+    entry["room"] = room["name"]
+    with lock:
+        room["commands"] += 1
+        room["interactions"].append(entry)
+        interactions.append(entry)
+    for listener in list(interaction_listeners):
+        try:
+            listener(entry)
+        except Exception as e:
+            log(f"Interaction listener failed: {e}")
+
+
+def _speak(audio, wav_bytes, stages, meta, cancel):
+    """Play the answer; records playback time and speech-end → audio latency."""
+    _check_cancel(cancel)
+    t0 = time.time()
+    latency = t0 - meta["heard_at"] if meta.get("heard_at") else None
+    audio.play(wav_bytes, cancel=cancel)
+    stages["playback"] = time.time() - t0
+    _check_cancel(cancel)
+    return round(latency, 3) if latency is not None else None
+
+
+def _handle_command(room, command, meta=None, cancel=None):
+    """Handle a voice command — try intent match first, fall back to LLM.
+
+    cancel is the command's threading.Event; once set (barge-in) the next
+    stage boundary raises CommandCancelled and playback stops early. meta
+    holds the listener's timings; every stage is recorded in the interaction.
+    """
     if not command:
         return
+    meta = meta or {}
+    stages = {"vad": meta.get("vad"), "stt": meta.get("stt")}
+    audio = room["audio"]
 
-    set_state("thinking")
-    log(f"Command: {command}")
+    set_state("thinking", room)
+    room_log(room, f"Command: {command}")
 
     # --- Intent router: fast deterministic path ---
+    t0 = time.time()
     intent_key = match_intent(command)
+    stages["intent"] = time.time() - t0
     if intent_key:
-        log(f"Intent matched: {intent_key}")
+        room_log(room, f"Intent matched: {intent_key}")
         t0 = time.time()
         brief, event = fetch_structured_context()
-        response = build_intent_response(intent_key, brief, event)
-        intent_time = time.time() - t0
-        log(f"Intent response ({intent_time:.2f}s): {response}")
+        stages["context"] = time.time() - t0
+        fragments = build_intent_fragments(intent_key, brief, event)
+        response = fragments_text(fragments) if fragments else None
+        intent_time = time.time() - t0 + stages["intent"]
+        room_log(room, f"Intent response ({intent_time:.2f}s): {response}")
 
         if response:
-            set_state("speaking")
+            _check_cancel(cancel)
+            set_state("speaking", room)
             t0 = time.time()
-            wav_bytes = synthesize(response)
-            tts_time = time.time() - t0
-            log(f"TTS ({tts_time:.1f}s)")
-            play_wav(pa, wav_bytes, output_device)
-
-            with lock:
-                interactions.append({
-                    "timestamp": time.time(),
-                    "command": command,
-                    "response": response,
-                    "intent_time": round(intent_time, 2),
-                    "tts_time": round(tts_time, 2),
-                    "source": "intent",
-                })
+            wav_bytes = synthesize_fragments(fragments)
+            tts_time = stages["tts"] = time.time() - t0
+            room_log(room, f"TTS ({tts_time:.1f}s)")
+            latency = _speak(audio, wav_bytes, stages, meta, cancel)
+
+            _record_interaction(room, {
+                "timestamp": time.time(),
+                "command": command,
+                "response": response,
+                "intent": intent_key,
+                "intent_time": round(intent_time, 2),
+                "tts_time": round(tts_time, 2),
+                "source": "intent",
+                "heard_at": meta.get("heard_at"),
+                "latency_s": latency,
+                "stages": {k: round(v, 3) for k, v in stages.items() if v is not None},
+            })
             return
 
     # --- LLM fallback ---
-    log(f"Asking LLM: {command}")
-    live_context = get_live_context()
+    room_log(room, f"Asking LLM: {command}")
+    t0 = time.time()
+    brief = get_live_brief()
+    live_context = format_live_context(brief)
+    context_time = stages["context"] = time.time() - t0
     if live_context:
-        log(f"Context: {live_context}")
+        room_log(room, f"Context ({context_time:.2f}s): {live_context}")
 
     t0 = time.time()
-    response = llm_query(command, live_context)
-    llm_time = time.time() - t0
-    log(f"LLM response ({llm_time:.1f}s): {response}")
-
-    # Remove <think>...</think> tags from Qwen3 reasoning output
-    import re
-    cleaned = re.sub(r"<think>.*?</think>", "", response, flags=re.DOTALL).strip()
-    # If stripping removed everything, extract text from inside think tags
-    if not cleaned:
-        match = re.search(r"<think>(.*?)</think>", response, flags=re.DOTALL)
-        if match:
-            cleaned = match.group(1).strip()
-    response = cleaned or "I'm not sure how to respond to that."
-
-    set_state("speaking")
+    response = llm_cache_lookup(command, brief)
+    source = "llm_cache"
+    if response is None:
+        _check_cancel(cancel)
+        response = clean_llm_response(llm_query(command, live_context, cancel=cancel))
+        source = "llm"
+    llm_time = stages["llm"] = time.time() - t0
+    room_log(room, f"LLM response ({llm_time:.1f}s, {source}): {response}")
+    if source == "llm":
+        llm_cache_store(command, brief, response, llm_time)
+
+    _check_cancel(cancel)
+    set_state("speaking", room)
     t0 = time.time()
     wav_bytes = synthesize(response)
-    tts_time = time.time() - t0
-    log(f"TTS ({tts_time:.1f}s)")
+    tts_time = stages["tts"] = time.time() - t0
+    room_log(room, f"TTS ({tts_time:.1f}s)")
 
-    play_wav(pa, wav_bytes, output_device)
+    latency = _speak(audio, wav_bytes, stages, meta, cancel)
 
     # Record interaction
-    with lock:
-        interactions.append({
-            "timestamp": time.time(),
-            "command": command,
-            "response": response,
-            "llm_time": round(llm_time, 2),
-            "tts_time": round(tts_time, 2),
-            "source": "llm",
-        })
+    _record_interaction(room, {
+        "timestamp": time.time(),
+        "command": command,
+        "response": response,
+        "context_time": round(context_time, 2),
+        "llm_time": round(llm_time, 2),
+        "tts_time": round(tts_time, 2),
+        "source": source,
+        "heard_at": meta.get("heard_at"),
+        "latency_s": latency,
+        "stages": {k: round(v, 3) for k, v in stages.items() if v is not None},
+    })
 
 
 # ---------------------------------------------------------------------------
@@ -756,6 +2698,9 @@ def health():
             "ok": True,
             "state": current_state,
             "running": assistant_running,
+            "rooms": {name: r["state"] for name, r in rooms.items()},
+            "models": {name: dict(st) for name, st in model_status.items()},
+            "startup": dict(startup_stats),
         })
 
 
@@ -766,7 +2711,18 @@ def status():
             "state": current_state,
             "running": assistant_running,
             "wake_word": WAKE_WORD,
+            "barge_ins": sum(r["barge_ins"] for r in rooms.values()),
+            "wake_events_per_s": wake_rate(),
+            "rooms": rooms_snapshot(),
             "interactions": list(interactions),
+            "tts_cache": dict(tts_cache_stats, entries=len(_tts_cache)),
+            "http": http_stats_snapshot(),
+            "context_cache": context_cache_snapshot(),
+            "sensor": sensor_status(),
+            "llm_cache": llm_cache_snapshot(),
+            "llm_router": llm_router_snapshot(),
+            "stt": stt_snapshot(),
+            "gates": {"tts": _tts_gate.snapshot(), "llm": _llm_gate.snapshot()},
         })
 
 
@@ -795,6 +2751,10 @@ def stop():
 # ---------------------------------------------------------------------------
 
 if __name__ == "__main__":
+    if SENSOR_SUBSCRIBE:
+        threading.Thread(target=sensor_subscriber_loop, daemon=True).start()
+    threading.Thread(target=llm_keepalive_loop, daemon=True).start()
+
     # Auto-start the assistant
     assistant_running = True
     assistant_thread = threading.Thread(target=assistant_loop, daemon=True)
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Concurrent-poller benchmark for a camera node's /detections endpoint.
+
+N pollers hit /detections for --seconds in each mode:
+  poll      plain GET every --interval-ms (what the dashboard does today)
+  etag      same, sending If-None-Match so unchanged results come back as 304
+  longpoll  GET ?after_seq=<last>&wait=<ms>, re-issued as soon as it returns
+
+For every mode it reports requests/s, response bytes/s, the share of 304s,
+how many distinct detection frames each poller saw per second, and
+staleness: the time from a frame being published (its "timestamp") to a
+poller first receiving it. Staleness compares clocks, so run this on the
+node itself or keep the hosts NTP-synced.
+
+  python3 scripts/bench_detections.py --url http://192.168.50.4:8080 [--pollers 8]
+"""
+
+import argparse
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def fetch(url, etag=None, timeout=15):
+    """Returns (status, body bytes, etag)."""
+    req = urllib.request.Request(url, headers={"If-None-Match": etag} if etag else {})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            return resp.status, resp.read(), resp.headers.get("ETag")
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            return 304, b"", e.headers.get("ETag") or etag
+        raise
+
+
+def run_mode(base, mode, pollers, seconds, interval_s, wait_ms):
+    stats = {"requests": 0, "not_modified": 0, "bytes": 0, "errors": 0}
+    frames_seen = []
+    staleness = []
+    stats_lock = threading.Lock()
+    stop_at = time.time() + seconds
+
+    def poller():
+        last_seq, etag = -1, None
+        seen = 0
+        while time.time() < stop_at:
+            t_req = time.time()
+            if mode == "longpoll":
+                url = f"{base}/detections?after_seq={last_seq}&wait={wait_ms}" if last_seq >= 0 else f"{base}/detections"
+            else:
+                url = f"{base}/detections"
+            try:
+                status, body, etag = fetch(url, etag if mode != "poll" else None)
+            except (OSError, ValueError):
+                with stats_lock:
+                    stats["errors"] += 1
+                time.sleep(0.2)
+                continue
+            received = time.time()
+            lag = None
+            if status == 200:
+                data = json.loads(body)
+                seq = data.get("seq", -1)
+                if seq != last_seq:
+                    last_seq = seq
+                    seen += 1
+                    if data.get("timestamp"):
+                        lag = received - data["timestamp"]
+            with stats_lock:
+                stats["requests"] += 1
+                stats["bytes"] += len(body)
+                stats["not_modified"] += status == 304
+                if lag is not None:
+                    staleness.append(lag)
+            if mode != "longpoll":
+                time.sleep(max(0.0, interval_s - (time.time() - t_req)))
+        with stats_lock:
+            frames_seen.append(seen)
+
+    threads = [threading.Thread(target=poller) for _ in range(pollers)]
+    t0 = time.time()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.time() - t0
+    return {
+        "mode": mode,
+        "req_per_s": round(stats["requests"] / wall, 1),
+        "kb_per_s": round(stats["bytes"] / wall / 1024, 1),
+        "not_modified_pct": round(100 * stats["not_modified"] / max(1, stats["requests"]), 1),
+        "frames_per_s_per_poller": round(sum(frames_seen) / max(1, len(frames_seen)) / wall, 1),
+        "stale_p50_ms": round(percentile(staleness, 50) * 1000),
+        "stale_p95_ms": round(percentile(staleness, 95) * 1000),
+        "errors": stats["errors"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="/detections polling benchmark")
+    parser.add_argument("--url", default="http://192.168.50.4:8080", help="node base URL")
+    parser.add_argument("--pollers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=20.0, help="per mode")
+    parser.add_argument("--modes", default="poll,etag,longpoll")
+    parser.add_argument("--interval-ms", type=float, default=100.0, help="poll/etag request interval")
+    parser.add_argument("--wait-ms", type=int, default=5000, help="longpoll wait")
+    args = parser.parse_args()
+
+    base = args.url.rstrip("/")
+    print(f"{base}/detections, {args.pollers} pollers, {args.seconds:g}s per mode")
+    for mode in args.modes.split(","):
+        r = run_mode(base, mode, args.pollers, args.seconds, args.interval_ms / 1000, args.wait_ms)
+        print(f"  {r['mode']:8} {r['req_per_s']:7.1f} req/s  {r['kb_per_s']:8.1f} KB/s  "
+              f"304 {r['not_modified_pct']:5.1f}%  frames/poller {r['frames_per_s_per_poller']:5.1f}/s  "
+              f"stale p50 {r['stale_p50_ms']:4} ms p95 {r['stale_p95_ms']:4} ms  errors {r['errors']}")
+
+
+if __name__ == "__main__":
+    main()
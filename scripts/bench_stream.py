@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Viewer-mix benchmark for a camera node's /stream variants.
+
+Opens concurrent MJPEG viewers with different (w, q, fps) profiles and
+measures what each receives: frames/s and KB/s per profile and in total.
+Scenarios run back to back for --seconds each:
+  uniform  every viewer takes the full stream (what every tile cost before)
+  mixed    viewers split across the --mix profiles
+  h264     (--h264) the same number of viewers on /stream.mp4
+
+Server cost: with --pid (run on the node itself) the node process's CPU%
+is sampled from /proc for each scenario. /stream/stats supplies MJPEG
+encodes (Spark) and the H.264 encoder's bitrate and per-frame encode time.
+For an equal-quality comparison, match --mjpeg-q against the node's
+H264_BITRATE_KBPS by eye on a snapshot, then compare the KB/s and CPU lines.
+
+  python3 scripts/bench_stream.py --url http://192.168.50.2:8090 --mix full:1,tile:4,thumb:8 [--h264] [--pid N]
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+import urllib.request
+
+PROFILES = {
+    "full": ("/stream", {}),
+    "tile": ("/stream", {"w": 480, "q": 70, "fps": 10}),
+    "thumb": ("/stream", {"w": 160, "q": 50, "fps": 2}),
+    "h264": ("/stream.mp4", {}),
+}
+BOUNDARY = b"--frame\r\n"
+
+
+def cpu_seconds(pid):
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def stream_stats(base):
+    try:
+        with urllib.request.urlopen(f"{base}/stream/stats", timeout=3) as resp:
+            return json.loads(resp.read())
+    except Exception:
+        return {}
+
+
+def viewer(url, stop_at, result):
+    """Read the stream, counting bytes and (for MJPEG) frame boundaries."""
+    frames, nbytes, tail = 0, 0, b""
+    try:
+        with urllib.request.urlopen(url, timeout=10) as resp:
+            while time.time() < stop_at:
+                chunk = resp.read1(65536) if hasattr(resp, "read1") else resp.read(65536)
+                if not chunk:
+                    break
+                nbytes += len(chunk)
+                buf = tail + chunk
+                frames += buf.count(BOUNDARY)
+                tail = buf[-(len(BOUNDARY) - 1):]
+    except OSError as e:
+        result["error"] = str(e)
+    result["frames"] = frames
+    result["bytes"] = nbytes
+
+
+def run_scenario(base, viewers, seconds, pid):
+    stop_at = time.time() + seconds
+    results = []
+    threads = []
+    for name in viewers:
+        path, params = PROFILES[name]
+        query = "&".join(f"{k}={v}" for k, v in params.items())
+        result = {"profile": name}
+        results.append(result)
+        threads.append(threading.Thread(
+            target=viewer, args=(f"{base}{path}" + (f"?{query}" if query else ""), stop_at, result)))
+
+    stats_before = stream_stats(base)
+    cpu_before = cpu_seconds(pid) if pid else None
+    t0 = time.time()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.time() - t0
+    stats_after = stream_stats(base)
+
+    summary = {"wall": wall, "profiles": {}}
+    for r in results:
+        p = summary["profiles"].setdefault(r["profile"], {"viewers": 0, "frames": 0, "bytes": 0, "errors": 0})
+        p["viewers"] += 1
+        p["frames"] += r.get("frames", 0)
+        p["bytes"] += r.get("bytes", 0)
+        p["errors"] += "error" in r
+    if pid:
+        summary["cpu_pct"] = round(100 * (cpu_seconds(pid) - cpu_before) / wall, 1)
+    mjpeg_before, mjpeg_after = stats_before.get("mjpeg"), stats_after.get("mjpeg")
+    if mjpeg_before and mjpeg_after:
+        encodes = mjpeg_after["encodes"] - mjpeg_before["encodes"]
+        summary["encodes_per_s"] = round(encodes / wall, 1)
+        summary["encode_ms_per_s"] = round((mjpeg_after["encode_ms"] - mjpeg_before["encode_ms"]) / wall, 1)
+    if "h264" in viewers and stats_after.get("h264"):
+        summary["h264"] = stats_after["h264"]
+    return summary
+
+
+def report(name, summary):
+    wall = summary["wall"]
+    total_kb = sum(p["bytes"] for p in summary["profiles"].values()) / 1024 / wall
+    extra = ""
+    if "cpu_pct" in summary:
+        extra += f"  node CPU {summary['cpu_pct']}%"
+    if "encodes_per_s" in summary:
+        extra += f"  encodes {summary['encodes_per_s']}/s ({summary['encode_ms_per_s']} ms/s)"
+    if "h264" in summary:
+        h = summary["h264"]
+        extra += (f"  h264 {h['bitrate_kbps']} kbps (target {h['target_kbps']}), "
+                  f"encode {h['encode_ms']} ms/frame{', error: ' + h['error'] if h.get('error') else ''}")
+    print(f"{name}: {total_kb:8.1f} KB/s total{extra}")
+    for profile, p in summary["profiles"].items():
+        n = p["viewers"]
+        fps = f"{p['frames'] / n / wall:5.1f} fps/viewer" if profile != "h264" else " " * 16
+        print(f"  {profile:6} x{n:<3} {fps}  "
+              f"{p['bytes'] / n / wall / 1024:7.1f} KB/s/viewer  errors {p['errors']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="/stream viewer-mix benchmark")
+    parser.add_argument("--url", default="http://192.168.50.2:8090", help="node base URL")
+    parser.add_argument("--mix", default="full:1,tile:4,thumb:8", help="profile:count, comma separated")
+    parser.add_argument("--seconds", type=float, default=20.0, help="per scenario")
+    parser.add_argument("--pid", type=int, help="node server pid, for CPU%% (run on the node)")
+    parser.add_argument("--mjpeg-q", type=int, help="JPEG quality of the full profile")
+    parser.add_argument("--h264", action="store_true", help="also run every viewer on /stream.mp4")
+    args = parser.parse_args()
+
+    base = args.url.rstrip("/")
+    if args.mjpeg_q:
+        PROFILES["full"] = ("/stream", {"q": args.mjpeg_q})
+    mixed = []
+    for part in args.mix.split(","):
+        name, _, count = part.partition(":")
+        if name not in PROFILES:
+            parser.error(f"unknown profile {name!r} (have {', '.join(PROFILES)})")
+        mixed += [name] * int(count or 1)
+
+    report("uniform", run_scenario(base, ["full"] * len(mixed), args.seconds, args.pid))
+    report("mixed", run_scenario(base, mixed, args.seconds, args.pid))
+    if args.h264:
+        report("h264", run_scenario(base, ["h264"] * len(mixed), args.seconds, args.pid))
+
+
+if __name__ == "__main__":
+    main()
@@ -44,6 +44,24 @@ check_endpoint() {
     fi
 }
 
+# check_image URL LABEL — expects a 200 image/jpeg response
+check_image() {
+    local url="$1" label="$2"
+    local start end ms result
+
+    start=$(date +%s%3N 2>/dev/null || python3 -c 'import time; print(int(time.time()*1000))')
+    if result=$(curl -s -o /dev/null --max-time "$TIMEOUT" -w "%{http_code} %{content_type}" "$url" 2>/dev/null); then
+        end=$(date +%s%3N 2>/dev/null || python3 -c 'import time; print(int(time.time()*1000))')
+        ms=$(( end - start ))
+        case "$result" in
+            "200 image/jpeg"*) pass "$label" "$ms" ;;
+            *) fail "$label" "got $result" ;;
+        esac
+    else
+        fail "$label" "unreachable or timeout"
+    fi
+}
+
 echo ""
 echo "╔══════════════════════════════════════════╗"
 echo "║       LocalGuard Demo Preflight          ║"
@@ -60,12 +78,14 @@ echo ""
 # --- Jetson ---
 echo "Jetson ($JETSON)"
 check_endpoint "$JETSON/detections" "Detections" "person_count"
+check_image "$JETSON/snapshot.jpg?w=320" "Snapshot"
 echo ""
 
 # --- Spark ---
 echo "Spark ($SPARK)"
 check_endpoint "$SPARK/health" "Health"
 check_endpoint "$SPARK/results" "Results"
+check_image "$SPARK/snapshot.jpg?w=320" "Snapshot"
 echo ""
 
 # --- Orange Pi ---
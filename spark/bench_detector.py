@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+CPU detector backend benchmark: PyTorch vs ONNX Runtime vs OpenVINO.
+
+Loads YOLO_MODEL through spark_server.load_detector() once per backend,
+forced onto the CPU (the path the Spark falls back to without CUDA), and
+runs every backend over the same frames. Frames come from --video, --images,
+or the newest clip in CLIP_DIR. Inputs must be clean: record clips with
+CLIP_OVERLAY=0 (or save /stream?overlay=0), since boxes burned in by the
+running detector bias what every backend finds.
+
+Per backend it reports export+load time, warm-up, per-frame latency
+p50/p95 and FPS, plus agreement with PyTorch: the share of its boxes
+matched by a same-class box at IoU >= 0.5 (precision) and the share of
+PyTorch's boxes it found (recall). --threads sweeps ONNX Runtime intra-op
+thread counts; set the winner as DETECTOR_THREADS.
+
+Run on the Spark (same venv as spark_server.py):
+  python3 bench_detector.py [--video clip.avi] [--backends torch,onnx,openvino] [--threads 2,4,8] [--int8]
+"""
+
+import argparse
+import glob
+import os
+import time
+
+import cv2
+import numpy as np
+
+import spark_server
+
+
+def load_frames(args):
+    if args.images:
+        paths = sorted(glob.glob(args.images))[:args.frames]
+        return [cv2.imread(p) for p in paths], args.images
+    source = args.video
+    if not source:
+        clips = sorted(glob.glob(os.path.join(spark_server.CLIP_DIR, "*")), key=os.path.getmtime)
+        if not clips:
+            raise SystemExit(f"no --video/--images given and no clips in {spark_server.CLIP_DIR}")
+        source = clips[-1]
+        if spark_server.CLIP_OVERLAY:
+            print(f"WARNING: {source} is from CLIP_DIR and clips record overlays unless CLIP_OVERLAY=0")
+    cap = cv2.VideoCapture(source)
+    frames = []
+    while len(frames) < args.frames:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames, source
+
+
+def boxes_of(result):
+    return [(int(b.cls[0]), b.xyxy[0].tolist()) for b in result.boxes]
+
+
+def iou(a, b):
+    ix = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def agreement(reference, boxes):
+    """(matched, total boxes, total reference boxes), greedy same-class IoU >= 0.5."""
+    unused = list(reference)
+    matched = 0
+    for cls, box in boxes:
+        best = max((r for r in unused if r[0] == cls), key=lambda r: iou(r[1], box), default=None)
+        if best is not None and iou(best[1], box) >= 0.5:
+            unused.remove(best)
+            matched += 1
+    return matched, len(boxes), len(reference)
+
+
+def run(name, frames, args, threads=0):
+    t0 = time.time()
+    spark_server.detector_stats["backend"] = None
+    model, device = spark_server.load_detector(backend=name, device="cpu", threads=threads, int8=args.int8,
+                                               imgsz=args.imgsz)
+    load_s = time.time() - t0
+    if spark_server.detector_stats["backend"] != name:
+        print(f"  {name}: unavailable ({spark_server.detector_stats['error']})")
+        return None
+    times, detections = [], []
+    for frame in frames:
+        t1 = time.perf_counter()
+        result = model(frame, conf=spark_server.YOLO_CONF, imgsz=args.imgsz, device=device, verbose=False)[0]
+        times.append((time.perf_counter() - t1) * 1000)
+        detections.append(boxes_of(result))
+    return {"load_s": load_s, "warmup_ms": spark_server.detector_stats["warmup_ms"], "times": times,
+            "detections": detections}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CPU detector backend benchmark")
+    parser.add_argument("--video", help="video file to read frames from")
+    parser.add_argument("--images", help="glob of images instead of a video")
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--backends", default="torch,onnx,openvino")
+    parser.add_argument("--threads", default="0", help="ONNX Runtime intra-op threads to sweep (0 = its default)")
+    parser.add_argument("--int8", action="store_true", help="OpenVINO INT8 export")
+    parser.add_argument("--imgsz", type=int, default=spark_server.DETECTOR_IMGSZ)
+    args = parser.parse_args()
+
+    frames, source = load_frames(args)
+    if not frames:
+        raise SystemExit(f"no frames read from {source}")
+    print(f"{spark_server.YOLO_MODEL} at {args.imgsz}px on CPU, {len(frames)} frames from {source}")
+
+    runs = []
+    for name in args.backends.split(","):
+        for threads in ([int(t) for t in args.threads.split(",")] if name == "onnx" else [0]):
+            label = f"{name}/{threads}t" if name == "onnx" and threads else name
+            r = run(name, frames, args, threads)
+            if r:
+                runs.append((label, r))
+
+    reference = next((r["detections"] for label, r in runs if label == "torch"), None)
+    for label, r in runs:
+        t = r["times"]
+        line = (f"  {label:12} load {r['load_s']:6.1f}s  warm-up {r['warmup_ms']} ms  "
+                f"p50 {np.percentile(t, 50):6.1f} ms  p95 {np.percentile(t, 95):6.1f} ms  "
+                f"{1000 / np.mean(t):5.1f} FPS")
+        if reference and label != "torch":
+            matched, n, n_ref = map(sum, zip(*(agreement(ref, d) for ref, d in zip(reference, r["detections"]))))
+            line += f"  vs torch: precision {matched / max(1, n):.2f} recall {matched / max(1, n_ref):.2f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
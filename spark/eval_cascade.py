@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Cost/accuracy report for the detection cascade on a labelled clip.
+
+Runs three configurations over the same frames of a recorded clip:
+  tier1    YOLO_MODEL alone (what runs without CASCADE_MODEL)
+  tier2    CASCADE_MODEL alone, every frame
+  cascade  YOLO_MODEL every frame, CASCADE_MODEL only where spark_server's
+           Cascade escalates (borderline hits, new tracks, CASCADE_LABELS)
+
+For each it reports the average cost per frame, precision/recall/F1 against
+the labels (same label, IoU >= 0.5) and, for the cascade, how often it
+escalated, why, and the share of published boxes from each tier.
+
+The clip must be clean. Clips from /clips carry the running detector's
+boxes unless the node records with CLIP_OVERLAY=0; a clip saved from
+/stream?overlay=0 also works. Burned-in boxes bias every tier.
+
+Labels are JSON lines, one per labelled frame (unlisted frames are skipped):
+  {"frame": 12, "boxes": [["person", x1, y1, x2, y2], ...]}
+--write-labels MODEL drafts such a file from a (large) model, to be
+corrected by hand before it is used as ground truth.
+
+Run on the Spark (same venv as spark_server.py):
+  python3 eval_cascade.py clip.avi labels.jsonl --tier2 yolo11m.pt [--frames 300]
+"""
+
+import argparse
+import json
+import time
+
+import cv2
+import numpy as np
+
+import spark_server
+
+
+def read_frames(path, limit):
+    cap = cv2.VideoCapture(path)
+    frames = []
+    while not limit or len(frames) < limit:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def score(labels, predictions):
+    """(true positives, predicted, labelled) with greedy same-label IoU >= 0.5 matching."""
+    tp = n_pred = n_true = 0
+    for idx, truth in labels.items():
+        unused = list(truth)
+        preds = sorted(predictions.get(idx, []), key=lambda d: -d["confidence"])
+        n_pred += len(preds)
+        n_true += len(truth)
+        for d in preds:
+            best = max((t for t in unused if t[0] == d["label"]),
+                       key=lambda t: spark_server.box_iou(t[1:], d["bbox"]), default=None)
+            if best is not None and spark_server.box_iou(best[1:], d["bbox"]) >= 0.5:
+                unused.remove(best)
+                tp += 1
+    return tp, n_pred, n_true
+
+
+def first_tier(model, device, frame, allowed, conf):
+    boxes = spark_server.parse_boxes(
+        model([frame], conf=conf, imgsz=spark_server.DETECTOR_IMGSZ, device=device, verbose=False)[0], allowed)
+    detections = [{"label": l, "confidence": round(c, 3), "bbox": b} for l, c, b in boxes
+                  if c >= spark_server.YOLO_CONF]
+    weak = [(l, c, b) for l, c, b in boxes if c < spark_server.YOLO_CONF]
+    return detections, weak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="detection cascade cost/accuracy report")
+    parser.add_argument("clip", help="clean recorded clip (CLIP_OVERLAY=0 or /stream?overlay=0)")
+    parser.add_argument("labels", help="JSON-lines labels (written instead with --write-labels)")
+    parser.add_argument("--tier1", default=spark_server.YOLO_MODEL)
+    parser.add_argument("--tier2", default=spark_server.CASCADE_MODEL or "yolo11m.pt")
+    parser.add_argument("--frames", type=int, default=0, help="stop after this many frames")
+    parser.add_argument("--write-labels", metavar="MODEL", help="draft labels with MODEL and exit")
+    args = parser.parse_args()
+
+    frames = read_frames(args.clip, args.frames)
+    if not frames:
+        raise SystemExit(f"no frames read from {args.clip}")
+    allowed = spark_server.parse_label_filter(spark_server.YOLO_LABEL_FILTER)
+
+    if args.write_labels:
+        model, device = spark_server.load_detector(weights=args.write_labels, batch=1)
+        with open(args.labels, "w") as f:
+            for idx, frame in enumerate(frames):
+                detections, _ = first_tier(model, device, frame, allowed, spark_server.YOLO_CONF)
+                f.write(json.dumps({"frame": idx, "boxes": [[d["label"]] + d["bbox"] for d in detections]}) + "\n")
+        print(f"Drafted labels for {len(frames)} frames in {args.labels}; correct them before evaluating")
+        return
+
+    labels = {}
+    with open(args.labels) as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                if row["frame"] < len(frames):
+                    labels[row["frame"]] = [tuple(b) for b in row["boxes"]]
+
+    tier1, device1 = spark_server.load_detector(weights=args.tier1, batch=1)
+    tier2, device2 = spark_server.load_detector(weights=args.tier2, batch=spark_server.CASCADE_MAX_REGIONS)
+    cascade = spark_server.Cascade(tier2, device2, allowed)
+    low_conf = min(spark_server.YOLO_CONF, spark_server.CASCADE_WEAK_CONF)
+
+    predictions = {"tier1": {}, "tier2": {}, "cascade": {}}
+    cost_ms = {"tier1": [], "tier2": [], "cascade": []}
+    escalated, reasons, tiers = 0, {}, {1: 0, 2: 0}
+    for idx, frame in enumerate(frames):
+        t0 = time.perf_counter()
+        detections, weak = first_tier(tier1, device1, frame, allowed, low_conf)
+        t1 = time.perf_counter()
+        predictions["tier1"][idx] = [dict(d) for d in detections]
+        published, found = cascade.run(frame, detections, weak)
+        t2 = time.perf_counter()
+        predictions["cascade"][idx] = published
+        cost_ms["tier1"].append((t1 - t0) * 1000)
+        cost_ms["cascade"].append((t2 - t0) * 1000)
+        escalated += bool(found)
+        for reason, _ in found:
+            reasons[reason] = reasons.get(reason, 0) + 1
+        for d in published:
+            tiers[d["tier"]] += 1
+
+        t0 = time.perf_counter()
+        predictions["tier2"][idx], _ = first_tier(tier2, device2, frame, allowed, spark_server.YOLO_CONF)
+        cost_ms["tier2"].append((time.perf_counter() - t0) * 1000)
+
+    print(f"{args.clip}: {len(frames)} frames, {len(labels)} labelled; tier1 {args.tier1}, tier2 {args.tier2}")
+    for name in ("tier1", "tier2", "cascade"):
+        tp, n_pred, n_true = score(labels, predictions[name])
+        precision, recall = tp / max(1, n_pred), tp / max(1, n_true)
+        f1 = 2 * precision * recall / max(1e-9, precision + recall)
+        print(f"  {name:8} {np.mean(cost_ms[name]):7.1f} ms/frame (p95 {np.percentile(cost_ms[name], 95):6.1f})  "
+              f"precision {precision:.3f}  recall {recall:.3f}  F1 {f1:.3f}")
+    total = max(1, sum(tiers.values()))
+    print(f"  cascade escalated {escalated / len(frames):.1%} of frames "
+          f"({', '.join(f'{k} {v}' for k, v in sorted(reasons.items())) or 'no triggers'}); "
+          f"boxes from tier1 {tiers[1] / total:.0%}, tier2 {tiers[2] / total:.0%}")
+
+
+if __name__ == "__main__":
+    main()
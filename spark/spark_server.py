@@ -6,28 +6,46 @@ Runs YOLO object detection on the AKASO camera, plus two VLM inference loops
 (fast + deep) against Cosmos-Reason2 models served by vLLM containers.
 
 Serves:
-  GET /stream          — live MJPEG feed from AKASO Brave 4 (annotated with YOLO boxes)
-  GET /detections      — JSON YOLO detections (matches Jetson format, no depth_m)
+  GET /stream          — live MJPEG feed from AKASO Brave 4 (annotated with YOLO boxes;
+                         ?w= width, ?q= JPEG quality, ?fps= cap per client,
+                         ?overlay=0 clean frames with X-Seq for client-side boxes)
+  GET /stream.mp4      — H.264 fragmented MP4 over chunked HTTP (one encoder, needs PyAV)
+  GET /stream/stats    — MJPEG variant and H.264 encoder stats
+  GET /snapshot.jpg    — latest frame as one JPEG (?w=, ?q=, ?overlay=0;
+                         ETag/Last-Modified)
+  GET /detections      — JSON YOLO detections (matches Jetson format, no depth_m);
+                         ETag/If-None-Match, ?after_seq=N&wait=ms long-poll
   GET /results         — combined fast+deep results sorted by timestamp desc
   GET /results/fast    — fast inference results only
   GET /results/deep    — deep inference results only
-  GET /health          — health check
+  GET /history         — stored detection summaries, events and VLM outputs
+                         (?since=&until=&label=&step=, unix seconds)
+  GET /clips           — recorded event clips (?since=&until=&label=)
+  GET /clips/<id>      — clip file (supports Range requests)
+  GET /health          — health check (capture stats and latency, detector backend)
 
 Run on the Spark:
   cd ~/cam-inference && source .venv/bin/activate && python3 spark_server.py
 """
 
 import os
+import re
 import cv2
+import shutil
+import platform
+import importlib.util
 import base64
 import time
 import threading
 import json
 import uuid
+import queue
+import sqlite3
 import urllib.request
 import numpy as np
 from collections import deque
-from flask import Flask, Response, jsonify
+from fractions import Fraction
+from flask import Flask, Response, jsonify, request, send_file
 from openai import OpenAI
 from ultralytics import YOLO
 
@@ -47,7 +65,7 @@ DEEP_VLLM_URL  = "http://localhost:8002/v1"   # Cosmos-8B
 FAST_MODEL     = "cosmos-fast"
 DEEP_MODEL     = "cosmos-deep"
 CAMERA_INDEX   = int(os.environ.get("CAMERA_INDEX", "1"))
-JETSON_STREAM  = "http://192.168.50.4:8080/stream"
+JETSON_SNAPSHOT = "http://192.168.50.4:8080/snapshot.jpg?overlay=0"  # clean frame for the VLM
 FAST_INTERVAL  = 1.5   # seconds
 DEEP_INTERVAL  = 20.0  # seconds
 FAST_MAX_TOKENS = 150
@@ -58,6 +76,36 @@ YOLO_MODEL     = os.environ.get("YOLO_MODEL", "yolo11n.pt")  # nano model, auto-
 YOLO_CONF      = float(os.environ.get("YOLO_MIN_CONF", "0.25"))
 YOLO_LABEL_FILTER = os.environ.get("YOLO_LABEL_FILTER", "person")  # "person", "all", or comma-separated
 YOLO_DEVICE    = os.environ.get("YOLO_DEVICE", "0")  # GPU device
+DETECTOR_BACKEND = os.environ.get("DETECTOR_BACKEND", "auto")  # auto, tensorrt, openvino, onnx, torch
+DETECTOR_IMGSZ = int(os.environ.get("DETECTOR_IMGSZ", "640"))
+DETECTOR_INT8  = os.environ.get("DETECTOR_INT8", "0") == "1"   # OpenVINO INT8 (calibrated at export)
+DETECTOR_THREADS = int(os.environ.get("DETECTOR_THREADS", "0"))  # ONNX Runtime intra-op threads, 0 = its default
+DETECTOR_CACHE = os.environ.get("DETECTOR_CACHE", os.path.expanduser("~/cam-inference/engines"))
+DETECTOR_WARMUP = 3  # inferences run before the loop publishes
+
+# Tiled detection: extra native-resolution passes on zones of interest and around weak hits (env-overridable)
+TILE_ZONES     = os.environ.get("TILE_ZONES", "")  # "door=880,40,1280,560;drive=0,360,640,720" (frame pixels)
+TILE_BUDGET_MS = float(os.environ.get("TILE_BUDGET_MS", "0"))  # extra compute per frame for tiles, 0 = off
+TILE_SIZE      = 640   # tiles are cropped at native resolution, so they reach the model without downscaling
+TILE_OVERLAP   = 0.2   # between neighbouring tiles of a zone wider/taller than TILE_SIZE
+TILE_MAX       = 4     # tiles per frame at most
+TILE_LOW_CONF  = 0.1   # full-frame hits between this and YOLO_MIN_CONF get a focus tile
+TILE_FOCUS_HOLD_S = 2.0
+TILE_NMS_IOU   = 0.5
+TILE_NMS_IOS   = 0.8   # a box mostly inside a stronger one (cut at a tile edge) is merged into it
+DETECTOR_BATCH = 1 + TILE_MAX if TILE_BUDGET_MS > 0 else 1  # exported models take the frame plus its tiles
+
+# Model cascade: a larger second-tier model runs only where the first tier is unsure (env-overridable)
+CASCADE_MODEL  = os.environ.get("CASCADE_MODEL", "")  # e.g. "yolo11m.pt"; empty = off
+CASCADE_WEAK_CONF = float(os.environ.get("CASCADE_WEAK_CONF", "0.15"))  # sub-threshold hits from here up are candidates...
+CASCADE_WEAK_FRAMES = 2      # ...once seen in this many consecutive frames (one-frame noise never escalates)
+CASCADE_CONFIRM_CONF = float(os.environ.get("CASCADE_CONFIRM_CONF", "0.5"))  # below this a hit is borderline
+CASCADE_LABELS = {l.strip().lower() for l in os.environ.get(
+    "CASCADE_LABELS", "knife,scissors,baseball bat,gun,pistol,rifle").split(",") if l.strip()}  # always escalated
+CASCADE_TRACK_IOU = 0.3      # a hit overlapping a last-frame box of its label this much is not a new track
+CASCADE_PAD    = 0.5         # regions extend this share of the box size on each side...
+CASCADE_MIN_REGION = 320     # ...and are at least this many pixels across
+CASCADE_MAX_REGIONS = 4      # more (or regions covering half the frame) escalate the whole frame
 FAST_PROMPT = "Describe what you see in this image. Be concise (2-3 sentences)."
 DEEP_PROMPT = (
     "You are analyzing security camera feeds. Image 1 is the AKASO scene camera. "
@@ -66,11 +114,69 @@ DEEP_PROMPT = (
     "concerns. Be specific and actionable (4-6 sentences)."
 )
 
+# Camera capture (env-overridable)
+CAMERA_SOURCE  = os.environ.get("CAMERA_SOURCE", "v4l2")  # "v4l2", or "sim:fps=30,stall_every=20,..." for testing
+CAMERA_WIDTH   = int(os.environ.get("CAMERA_WIDTH", "1280"))
+CAMERA_HEIGHT  = int(os.environ.get("CAMERA_HEIGHT", "720"))
+CAMERA_FPS     = float(os.environ.get("CAMERA_FPS", "30"))
+CAMERA_MAX_FAILURES = 10      # consecutive failed grabs before the device is reopened
+CAMERA_REOPEN_MIN_S = 0.5     # reopen backoff doubles from here...
+CAMERA_REOPEN_MAX_S = 8.0     # ...up to here
+CAMERA_STALL_S = 2.0          # no frame for this long is reported as a stall
+
+# Stream / snapshot variants
+JPEG_QUALITY   = 80    # /stream and /snapshot.jpg default
+VARIANT_MIN_WIDTH = 64
+STREAM_MAX_FPS = 30.0
+
+# H.264 stream (env-overridable; needs PyAV with libx264)
+H264_FPS       = float(os.environ.get("H264_FPS", "15"))
+H264_GOP       = int(os.environ.get("H264_GOP", "15"))           # frames per keyframe; bounds join latency
+H264_BITRATE_KBPS = int(os.environ.get("H264_BITRATE_KBPS", "1500"))
+H264_PRESET    = os.environ.get("H264_PRESET", "veryfast")
+H264_OVERLAY   = os.environ.get("H264_OVERLAY", "1") != "0"
+H264_IDLE_S    = 10.0  # encoder stops this long after the last client leaves
+H264_CLIENT_QUEUE = 120  # fragments buffered per client before it is dropped
+H264_AVAILABLE = importlib.util.find_spec("av") is not None  # checked before a client subscribes
+
+# Event history (env-overridable)
+HISTORY_DB = os.environ.get("HISTORY_DB", os.path.expanduser("~/cam-inference/history.db"))
+HISTORY_RETENTION_H = float(os.environ.get("HISTORY_RETENTION_H", "72"))
+HISTORY_FLUSH_S = 1.0        # writer batches everything queued in this window
+HISTORY_FRAME_EVERY_S = 0.2  # frame summaries kept at most 5/s unless counts change
+HISTORY_EVENT_HOLD_S = 0.5   # a count change must hold this long to become an event
+HISTORY_MAX_POINTS = 500     # /history downsamples to about this many buckets
+
+# Clip recording (env-overridable)
+CLIP_RECORD = os.environ.get("CLIP_RECORD", "1") != "0"
+CLIP_DIR = os.environ.get("CLIP_DIR", os.path.expanduser("~/cam-inference/clips"))
+CLIP_PRE_S = float(os.environ.get("CLIP_PRE_S", "5"))    # pre-roll before the event
+CLIP_POST_S = float(os.environ.get("CLIP_POST_S", "5"))  # kept after the last trigger
+CLIP_MAX_S = 60.0            # repeated triggers extend a clip up to this length
+CLIP_FPS = float(os.environ.get("CLIP_FPS", "10"))       # ring sampling rate of /stream JPEGs
+CLIP_FORMAT = os.environ.get("CLIP_FORMAT", "avi")       # avi (MJPG) or mp4 (mp4v)
+CLIP_OVERLAY = os.environ.get("CLIP_OVERLAY", "1") != "0"  # 0 records clean frames (eval / benchmark input)
+CLIP_RING_MAX_MB = 64        # pre-roll memory cap
+CLIP_MAX_DISK_MB = float(os.environ.get("CLIP_MAX_DISK_MB", "4096"))
+CLIP_TRIGGER_LABELS = set(
+    l.strip() for l in os.environ.get(
+        "CLIP_TRIGGER_LABELS", "person,knife,scissors,baseball bat,gun,pistol,rifle").split(",")
+    if l.strip()
+)
+
 # --- Shared state ---
 lock = threading.Lock()
-latest_frame = None       # raw JPEG bytes for MJPEG stream (annotated with YOLO boxes)
+latest_frame = None       # numpy array YOLO last ran on (clean; overlays drawn per variant on request)
 latest_frame_raw = None   # numpy array for inference (AKASO, clean — no overlays)
-latest_jetson_frame = None  # numpy array from Jetson MJPEG
+latest_frame_raw_seq = 0
+latest_frame_raw_ts = 0.0  # capture time (when the frame was grabbed)
+camera_cond = threading.Condition(lock)
+camera_wanted = threading.Event()  # set by consumers; the capture thread decodes only then
+camera_stats = {"source": None, "opened": False, "fourcc": None, "resolution": None, "fps": None,
+                "grabs": 0, "decodes": 0, "skipped": 0, "failed_grabs": 0, "reopens": 0,
+                "stalled": False, "last_grab_ts": 0.0, "last_error": None}
+frame_latencies = deque(maxlen=300)  # (capture→inference start, capture→publish) in ms
+latest_jetson_frame = None  # JPEG bytes from Jetson /snapshot.jpg
 fast_results = deque(maxlen=5)
 deep_results = deque(maxlen=3)
 
@@ -84,27 +190,550 @@ yolo_detections = {
     "nearest_person_m": None,
     "detections": [],
 }
+# Each publish gets a sequence number and a body serialized once; /detections
+# serves the bytes as-is and long-pollers wait on detections_cond.
+detections_seq = 0
+detections_body = json.dumps(dict(yolo_detections, seq=0)).encode()
+detections_cond = threading.Condition(lock)
+ETAG_EPOCH = uuid.uuid4().hex[:8]  # keeps ETags unique across restarts
+DETECTIONS_MAX_WAIT_MS = 10000
+
+
+class SimulatedCamera:
+    """Stand-in for cv2.VideoCapture that paces synthetic frames like a camera.
+
+    Selected with CAMERA_SOURCE="sim:fps=30,decode_ms=8,stall_every=20,stall_s=3,fail_after=60":
+    every stall_every seconds grab() blocks for stall_s, and after fail_after
+    seconds grab() fails until the device is reopened.
+    """
+
+    def __init__(self, fps=30.0, decode_ms=8.0, stall_every=0.0, stall_s=0.0, fail_after=0.0):
+        self.fps = fps
+        self.decode_s = decode_ms / 1000
+        self.stall_every = stall_every
+        self.stall_s = stall_s
+        self.fail_after = fail_after
+        self.opened_at = self.last_stall = self.next_frame = time.time()
+        self.count = 0
+
+    @classmethod
+    def from_spec(cls, spec):
+        _, _, params = spec.partition(":")
+        return cls(**{k: float(v) for k, v in (p.split("=", 1) for p in params.split(",") if p)})
+
+    def isOpened(self):
+        return True
+
+    def set(self, prop, value):
+        return False
+
+    def get(self, prop):
+        return {
+            cv2.CAP_PROP_FRAME_WIDTH: CAMERA_WIDTH,
+            cv2.CAP_PROP_FRAME_HEIGHT: CAMERA_HEIGHT,
+            cv2.CAP_PROP_FPS: self.fps,
+            cv2.CAP_PROP_FOURCC: cv2.VideoWriter_fourcc(*"MJPG"),
+        }.get(prop, 0)
+
+    def grab(self):
+        now = time.time()
+        if self.fail_after and now - self.opened_at > self.fail_after:
+            time.sleep(0.1)
+            return False
+        if self.stall_every and now - self.last_stall >= self.stall_every:
+            time.sleep(self.stall_s)
+            self.last_stall = time.time()
+        delay = self.next_frame - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        self.next_frame = max(self.next_frame + 1.0 / self.fps, time.time())
+        self.count += 1
+        return True
+
+    def retrieve(self):
+        time.sleep(self.decode_s)
+        frame = np.full((CAMERA_HEIGHT, CAMERA_WIDTH, 3), 40, dtype=np.uint8)
+        cv2.putText(frame, f"sim {self.count} {time.strftime('%H:%M:%S')}", (40, 80),
+                    cv2.FONT_HERSHEY_SIMPLEX, 2, (255, 255, 255), 3)
+        return True, frame
+
+    def release(self):
+        pass
+
+
+def open_camera():
+    """Open CAMERA_SOURCE; V4L2 is asked for MJPG at CAMERA_WIDTH x CAMERA_HEIGHT with one buffer."""
+    if CAMERA_SOURCE.startswith("sim"):
+        return SimulatedCamera.from_spec(CAMERA_SOURCE)
+    cap = cv2.VideoCapture(CAMERA_INDEX, cv2.CAP_V4L2)
+    # FOURCC before size: the AKASO only offers 1280x720@30 as MJPG, not YUYV
+    cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*"MJPG"))
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, CAMERA_WIDTH)
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, CAMERA_HEIGHT)
+    cap.set(cv2.CAP_PROP_FPS, CAMERA_FPS)
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    return cap
 
 
 def camera_loop():
-    """Continuously capture frames from the AKASO camera."""
-    global latest_frame, latest_frame_raw
-    cap = cv2.VideoCapture(CAMERA_INDEX)
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
-
-    if not cap.isOpened():
-        print("ERROR: Cannot open camera")
-        return
+    """Grab every frame to keep the driver queue empty; decode only when wanted."""
+    global latest_frame_raw, latest_frame_raw_seq, latest_frame_raw_ts
+    source = CAMERA_SOURCE if CAMERA_SOURCE.startswith("sim") else f"v4l2 device {CAMERA_INDEX}"
+    camera_stats["source"] = source
+    backoff = CAMERA_REOPEN_MIN_S
 
-    print(f"Camera opened (device {CAMERA_INDEX})")
     while True:
-        ret, frame = cap.read()
-        if not ret:
-            time.sleep(0.1)
+        cap = open_camera()
+        if not cap.isOpened():
+            camera_stats["last_error"] = f"cannot open {source}"
+            print(f"ERROR: Cannot open camera ({source}), retrying in {backoff:g}s")
+            time.sleep(backoff)
+            backoff = min(backoff * 2, CAMERA_REOPEN_MAX_S)
             continue
-        with lock:
-            latest_frame_raw = frame
+
+        fourcc = int(cap.get(cv2.CAP_PROP_FOURCC))
+        camera_stats.update(
+            opened=True,
+            fourcc="".join(chr((fourcc >> 8 * i) & 0xFF) for i in range(4)),
+            resolution=[int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))],
+            fps=cap.get(cv2.CAP_PROP_FPS),
+        )
+        print(f"Camera opened ({source}, {camera_stats['fourcc']} "
+              f"{camera_stats['resolution'][0]}x{camera_stats['resolution'][1]} @ {camera_stats['fps']:g})")
+
+        failures = 0
+        while failures < CAMERA_MAX_FAILURES:
+            if not cap.grab():
+                failures += 1
+                camera_stats["failed_grabs"] += 1
+                time.sleep(0.05)
+                continue
+            ts = time.time()
+            failures = 0
+            backoff = CAMERA_REOPEN_MIN_S
+            camera_stats["grabs"] += 1
+            camera_stats["last_grab_ts"] = ts
+            if not camera_wanted.is_set():
+                camera_stats["skipped"] += 1
+                continue
+            ok, frame = cap.retrieve()
+            if not ok:
+                failures += 1
+                continue
+            camera_wanted.clear()
+            with camera_cond:
+                latest_frame_raw = frame
+                latest_frame_raw_seq += 1
+                latest_frame_raw_ts = ts
+                camera_cond.notify_all()
+            camera_stats["decodes"] += 1
+
+        cap.release()
+        camera_stats.update(opened=False, last_error=f"{failures} failed grabs")
+        camera_stats["reopens"] += 1
+        print(f"Camera read failing ({source}), reopening in {backoff:g}s")
+        time.sleep(backoff)
+        backoff = min(backoff * 2, CAMERA_REOPEN_MAX_S)
+
+
+def camera_frame(after_seq=None, timeout=1.0):
+    """(seq, capture ts, frame) for a frame newer than after_seq, or captured after the call if None.
+
+    The frame is None if the camera delivers nothing within timeout.
+    """
+    with camera_cond:
+        target = latest_frame_raw_seq if after_seq is None else after_seq
+        if latest_frame_raw_seq <= target:
+            camera_wanted.set()
+            camera_cond.wait_for(lambda: latest_frame_raw_seq > target, timeout=timeout)
+        if latest_frame_raw_seq <= target:
+            return target, 0.0, None
+        return latest_frame_raw_seq, latest_frame_raw_ts, latest_frame_raw
+
+
+def camera_snapshot():
+    """Camera stats plus capture→inference latency percentiles."""
+    samples = list(frame_latencies)  # one C-level copy; the YOLO thread appends concurrently
+    waits = [w for w, _ in samples]
+    totals = [t for _, t in samples]
+    stats = dict(camera_stats)
+    stats["stalled"] = bool(stats["last_grab_ts"]) and time.time() - stats["last_grab_ts"] > CAMERA_STALL_S
+    stats.update(
+        capture_to_inference_ms_p50=round(percentile(waits, 50), 1),
+        capture_to_inference_ms_p95=round(percentile(waits, 95), 1),
+        capture_to_publish_ms_p50=round(percentile(totals, 50), 1),
+        capture_to_publish_ms_p95=round(percentile(totals, 95), 1),
+    )
+    return stats
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+# --- Detector backends ---
+# YOLO_MODEL (.pt) is exported once per (model, input size, device, backend) into DETECTOR_CACHE and loaded from
+# there; a YOLO_MODEL that is already an .engine/.onnx/_openvino_model is used as-is.
+
+BACKEND_SUFFIX = {"tensorrt": ".engine", "onnx": ".onnx", "openvino": "_openvino_model", "torch": ".pt"}
+BACKEND_FORMAT = {"tensorrt": "engine", "onnx": "onnx", "openvino": "openvino"}
+detector_stats = {"backend": None, "device": None, "model": None, "imgsz": DETECTOR_IMGSZ,
+                  "load_s": 0.0, "warmup_ms": [], "threads": None, "error": None}
+
+
+def cuda_device(device):
+    """The device YOLO should run on: `device`, or "cpu" if CUDA is unavailable."""
+    if device == "cpu":
+        return device
+    import torch
+    if not torch.cuda.is_available():
+        print(f"WARNING: CUDA not available (torch {torch.__version__}), falling back to CPU for YOLO")
+        return "cpu"
+    return device
+
+
+def available_backends(device):
+    """Backends usable on this host, fastest first."""
+    if device != "cpu":
+        return (["tensorrt"] if importlib.util.find_spec("tensorrt") else []) + ["torch"]
+    return [name for name, module in (("openvino", "openvino"), ("onnx", "onnxruntime"))
+            if importlib.util.find_spec(module)] + ["torch"]
+
+
+def engine_path(weights, backend, imgsz, device, int8=False, batch=1):
+    """Cache location for an exported model, keyed by model, input size, batch, device and backend."""
+    if backend == "tensorrt":
+        import torch
+        import tensorrt
+        tag = f"{torch.cuda.get_device_name(int(device))}-trt{tensorrt.__version__}-fp16"
+    else:
+        tag = platform.machine() + ("-int8" if int8 and backend == "openvino" else "")
+    stem = os.path.splitext(os.path.basename(weights))[0]
+    key = re.sub(r"[^A-Za-z0-9._-]+", "_", f"{stem}-{imgsz}{f'-b{batch}' if batch > 1 else ''}-{tag}")
+    return os.path.join(DETECTOR_CACHE, key + BACKEND_SUFFIX[backend])
+
+
+def export_model(weights, backend, imgsz, device, int8=False, batch=1):
+    """Path of the cached export, exporting it first if missing (dynamic batch up to `batch` if > 1)."""
+    path = engine_path(weights, backend, imgsz, device, int8, batch)
+    if os.path.exists(path):
+        return path
+    print(f"Exporting {weights} for {backend} at {imgsz} (one-off, cached as {path})")
+    t0 = time.time()
+    out = YOLO(weights).export(format=BACKEND_FORMAT[backend], imgsz=imgsz, device=device,
+                               half=backend == "tensorrt", int8=int8 and backend == "openvino",
+                               dynamic=batch > 1, batch=batch, verbose=False)
+    os.makedirs(DETECTOR_CACHE, exist_ok=True)
+    shutil.move(str(out), path)
+    print(f"Exported {path} in {time.time() - t0:.0f}s")
+    return path
+
+
+def tune_onnx_threads(model, path, threads):
+    """Replace the ONNX Runtime session ultralytics built with one using `threads` intra-op threads."""
+    import onnxruntime as ort
+    opts = ort.SessionOptions()
+    opts.intra_op_num_threads = threads
+    opts.inter_op_num_threads = 1
+    opts.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    model.predictor.model.session = ort.InferenceSession(path, opts, providers=["CPUExecutionProvider"])
+
+
+def load_detector(weights=YOLO_MODEL, backend=DETECTOR_BACKEND, imgsz=DETECTOR_IMGSZ, device=YOLO_DEVICE,
+                  threads=DETECTOR_THREADS, int8=DETECTOR_INT8, warmup=DETECTOR_WARMUP, batch=DETECTOR_BATCH,
+                  stats=None):
+    """Load the fastest usable backend for `weights` and warm it up. Returns (model, device).
+
+    A backend that fails to export or load is skipped for the next one; PyTorch is always last.
+    The outcome is recorded in `stats` (default detector_stats).
+    """
+    stats = detector_stats if stats is None else stats
+    device = cuda_device(str(device))
+    suffix = next((b for b, suf in BACKEND_SUFFIX.items() if weights.rstrip("/").endswith(suf)), "torch")
+    if suffix != "torch":
+        candidates = [suffix]
+    elif backend == "auto":
+        candidates = available_backends(device)
+    else:
+        candidates = [backend] + (["torch"] if backend != "torch" else [])
+
+    for name in candidates:
+        t0 = time.time()
+        try:
+            path = weights if name == "torch" or suffix != "torch" else export_model(weights, name, imgsz, device, int8, batch)
+            run_device = device if name in ("tensorrt", "torch") else "cpu"
+            model = YOLO(path, task="detect")
+            blank = np.zeros((CAMERA_HEIGHT, CAMERA_WIDTH, 3), dtype=np.uint8)
+            model(blank, imgsz=imgsz, device=run_device, verbose=False)  # builds the predictor
+            if name == "onnx" and threads:
+                tune_onnx_threads(model, path, threads)
+            load_s = time.time() - t0
+            warmup_ms = []
+            for _ in range(warmup):
+                t1 = time.perf_counter()
+                model(blank, imgsz=imgsz, device=run_device, verbose=False)
+                warmup_ms.append(round((time.perf_counter() - t1) * 1000, 1))
+        except Exception as e:
+            stats["error"] = f"{name}: {e}"
+            print(f"Detector backend {name} unavailable: {e}")
+            continue
+        stats.update(backend=name, device=run_device, model=path, imgsz=imgsz, load_s=round(load_s, 1),
+                              warmup_ms=warmup_ms, threads=threads if name == "onnx" and threads else None)
+        print(f"Detector ready: {name} on {run_device} ({path}, {imgsz}px), "
+              f"loaded in {load_s:.1f}s, warm-up {warmup_ms} ms")
+        return model, run_device
+    raise RuntimeError(f"no detector backend could load {weights}")
+
+
+# --- Tiled detection ---
+# With TILE_BUDGET_MS set, each frame's model call also carries up to TILE_MAX native-resolution crops: tiles
+# around recent low-confidence full-frame hits first, then TILE_ZONES tiles in rotation, as many as the measured
+# per-tile cost fits in the budget. Tile boxes are shifted back to frame coordinates and merged by class-wise NMS.
+
+tile_stats = {"frames": 0, "tiles": 0, "tile_boxes": 0}  # frames that ran tiles, tiles run, merged boxes won by a tile
+tile_planner = None
+
+
+def parse_tile_zones(raw):
+    """"name=x1,y1,x2,y2;..." -> [(name, (x1, y1, x2, y2))]."""
+    zones = []
+    for part in raw.split(";"):
+        name, _, coords = part.strip().partition("=")
+        try:
+            x1, y1, x2, y2 = (int(v) for v in coords.split(","))
+        except ValueError:
+            if part.strip():
+                print(f"Ignoring TILE_ZONES entry {part.strip()!r} (want name=x1,y1,x2,y2)")
+            continue
+        zones.append((name.strip(), (x1, y1, x2, y2)))
+    return zones
+
+
+def tile_spans(lo, hi):
+    """Overlapping [start, end) spans of at most TILE_SIZE covering lo..hi."""
+    if hi - lo <= TILE_SIZE:
+        return [(lo, hi)]
+    step = TILE_SIZE * (1 - TILE_OVERLAP)
+    n = int(np.ceil((hi - lo - TILE_SIZE) / step)) + 1
+    return [(int(s), int(s) + TILE_SIZE) for s in np.linspace(lo, hi - TILE_SIZE, n)]
+
+
+class TilePlanner:
+    """Chooses each frame's extra tiles within TILE_BUDGET_MS."""
+
+    def __init__(self, zones, width, height):
+        self.width, self.height = width, height
+        self.zone_tiles = []
+        for name, (x1, y1, x2, y2) in zones:
+            x1, y1, x2, y2 = max(0, x1), max(0, y1), min(width, x2), min(height, y2)
+            if x2 > x1 and y2 > y1:
+                self.zone_tiles += [(name, (tx1, ty1, tx2, ty2))
+                                    for ty1, ty2 in tile_spans(y1, y2) for tx1, tx2 in tile_spans(x1, x2)]
+        self.next_zone = 0
+        self.focus = []       # (expires, rect) around recent low-confidence hits
+        self.full_ms = None   # EMA of a frame-only call
+        self.tile_ms = None   # EMA of what one extra tile adds to a batched call
+
+    def plan(self, now):
+        self.focus = [f for f in self.focus if f[0] > now]
+        if self.full_ms is None:
+            return []  # measure the frame alone first
+        n = min(TILE_MAX, int(TILE_BUDGET_MS // (self.tile_ms or self.full_ms)))
+        tiles = [("focus", rect) for _, rect in self.focus][:n]
+        for _ in range(min(n - len(tiles), len(self.zone_tiles))):
+            tiles.append(self.zone_tiles[self.next_zone])
+            self.next_zone = (self.next_zone + 1) % len(self.zone_tiles)
+        return tiles
+
+    def note_hit(self, now, bbox):
+        cx, cy = (bbox[0] + bbox[2]) // 2, (bbox[1] + bbox[3]) // 2
+        for i, (_, (x1, y1, x2, y2)) in enumerate(self.focus):
+            if x1 <= cx < x2 and y1 <= cy < y2:
+                self.focus[i] = (now + TILE_FOCUS_HOLD_S, self.focus[i][1])
+                return
+        size = min(TILE_SIZE, self.width, self.height)
+        x1 = min(max(0, cx - size // 2), self.width - size)
+        y1 = min(max(0, cy - size // 2), self.height - size)
+        self.focus.append((now + TILE_FOCUS_HOLD_S, (x1, y1, x1 + size, y1 + size)))
+
+    def record(self, n_tiles, ms):
+        if n_tiles == 0:
+            self.full_ms = ms if self.full_ms is None else 0.9 * self.full_ms + 0.1 * ms
+        elif self.full_ms is not None:
+            per_tile = max(0.0, ms - self.full_ms) / n_tiles
+            self.tile_ms = per_tile if self.tile_ms is None else 0.9 * self.tile_ms + 0.1 * per_tile
+
+
+def tile_snapshot():
+    planner = tile_planner
+    if planner is None:
+        return None
+    return dict(tile_stats, budget_ms=TILE_BUDGET_MS,
+                full_ms=round(planner.full_ms or 0.0, 1), tile_ms=round(planner.tile_ms or 0.0, 1),
+                zone_tiles=len(planner.zone_tiles), focus=len(planner.focus),
+                tiles_per_frame=round(tile_stats["tiles"] / max(1, tile_stats["frames"]), 2))
+
+
+def merge_detections(dets):
+    """Class-wise greedy NMS over frame and tile boxes; highest confidence wins."""
+    dets = sorted(dets, key=lambda d: -d["confidence"])
+    boxes = np.array([d["bbox"] for d in dets], dtype=np.float32).reshape(-1, 4)
+    labels = np.array([d["label"] for d in dets])
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    suppressed = np.zeros(len(dets), dtype=bool)
+    kept = []
+    for i, det in enumerate(dets):
+        if suppressed[i]:
+            continue
+        kept.append(det)
+        iw = np.clip(np.minimum(boxes[:, 2], boxes[i, 2]) - np.maximum(boxes[:, 0], boxes[i, 0]), 0, None)
+        ih = np.clip(np.minimum(boxes[:, 3], boxes[i, 3]) - np.maximum(boxes[:, 1], boxes[i, 1]), 0, None)
+        inter = iw * ih
+        iou = inter / np.maximum(areas + areas[i] - inter, 1e-6)
+        ios = inter / np.maximum(np.minimum(areas, areas[i]), 1e-6)
+        suppressed |= (labels == det["label"]) & ((iou > TILE_NMS_IOU) | (ios > TILE_NMS_IOS))
+    return kept
+
+
+# --- Model cascade ---
+# With CASCADE_MODEL set, the first-tier model still runs on every frame. The larger model runs only on regions
+# around borderline hits, hits that match no box of the previous frame (new tracks) and CASCADE_LABELS candidates,
+# batched in one call, or on the whole frame when the regions are many or large. Inside an escalated region its
+# boxes replace the first tier's; every published box records the tier that produced it.
+
+cascade_stats = {"frames": 0, "escalated": 0, "full_frame": 0, "regions": 0, "tier1_ms": 0.0, "tier2_ms": 0.0,
+                 "reasons": {"borderline": 0, "new": 0, "restricted": 0}}
+cascade_detector_stats = dict(detector_stats)
+
+
+def parse_boxes(result, allowed_labels, offset=(0, 0)):
+    """[(label, confidence, bbox)] of one ultralytics result, label-filtered and shifted by `offset`."""
+    ox, oy = offset
+    boxes = []
+    for box in result.boxes:
+        label = result.names[int(box.cls[0])]
+        if allowed_labels is not None and label.lower() not in allowed_labels:
+            continue
+        x1, y1, x2, y2 = [int(v) for v in box.xyxy[0].tolist()]
+        boxes.append((label, float(box.conf[0]), [x1 + ox, y1 + oy, x2 + ox, y2 + oy]))
+    return boxes
+
+
+def box_iou(a, b):
+    iw = max(0, min(a[2], b[2]) - max(a[0], b[0]))
+    ih = max(0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = iw * ih
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+class Cascade:
+    """Second-tier detector, run where the first tier is unsure."""
+
+    def __init__(self, model, device, allowed_labels):
+        self.model = model
+        self.device = device
+        self.allowed_labels = allowed_labels
+        self.previous = []  # (label, bbox) published for the last frame
+        self.weak_seen = []  # (label, bbox, consecutive frames) of the last frame's sub-threshold candidates
+
+    def triggers(self, detections, weak):
+        """[(reason, bbox)] for first-tier hits worth a second look."""
+        found = []
+        for d in detections:
+            if d["label"].lower() in CASCADE_LABELS:
+                found.append(("restricted", d["bbox"]))
+            elif d["confidence"] < CASCADE_CONFIRM_CONF:
+                found.append(("borderline", d["bbox"]))
+            elif not any(label == d["label"] and box_iou(bbox, d["bbox"]) >= CASCADE_TRACK_IOU
+                         for label, bbox in self.previous):
+                found.append(("new", d["bbox"]))
+        seen = []
+        for label, conf, bbox in weak:
+            if conf < CASCADE_WEAK_CONF:
+                continue
+            frames = 1 + max((n for l, b, n in self.weak_seen if l == label and box_iou(b, bbox) >= CASCADE_TRACK_IOU),
+                             default=0)
+            seen.append((label, bbox, frames))
+            if frames >= CASCADE_WEAK_FRAMES:
+                found.append(("restricted" if label.lower() in CASCADE_LABELS else "borderline", bbox))
+        self.weak_seen = seen
+        return found
+
+    @staticmethod
+    def regions(boxes, width, height):
+        """Padded, merged regions around `boxes`, or None when the whole frame should be escalated."""
+        rects = []
+        for x1, y1, x2, y2 in boxes:
+            pw = max((x2 - x1) * CASCADE_PAD, (CASCADE_MIN_REGION - (x2 - x1)) / 2)
+            ph = max((y2 - y1) * CASCADE_PAD, (CASCADE_MIN_REGION - (y2 - y1)) / 2)
+            rects.append([max(0, int(x1 - pw)), max(0, int(y1 - ph)), min(width, int(x2 + pw)), min(height, int(y2 + ph))])
+        merged = True
+        while merged:
+            merged = False
+            for i in range(len(rects)):
+                for j in range(i + 1, len(rects)):
+                    a, b = rects[i], rects[j]
+                    if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                        rects[i] = [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+                        del rects[j]
+                        merged = True
+                        break
+                if merged:
+                    break
+        area = sum((r[2] - r[0]) * (r[3] - r[1]) for r in rects)
+        if len(rects) > CASCADE_MAX_REGIONS or area > 0.5 * width * height:
+            return None
+        return rects
+
+    def run(self, frame, detections, weak):
+        """Reconciled detections (each with its "tier") and the trigger reasons that fired."""
+        found = self.triggers(detections, weak)
+        for d in detections:
+            d["tier"] = 1
+        if found:
+            height, width = frame.shape[:2]
+            rects = self.regions([bbox for _, bbox in found], width, height)
+            full = rects is None
+            if full:
+                rects = [[0, 0, width, height]]
+                images = [frame]
+            else:
+                images = [np.ascontiguousarray(frame[y1:y2, x1:x2]) for x1, y1, x2, y2 in rects]
+            results = self.model(images, conf=YOLO_CONF, imgsz=DETECTOR_IMGSZ, device=self.device, verbose=False)
+
+            def escalated(d):
+                if full and "tile" in d:
+                    return False  # tiles saw it at a resolution the whole-frame pass doesn't have
+                cx, cy = (d["bbox"][0] + d["bbox"][2]) / 2, (d["bbox"][1] + d["bbox"][3]) / 2
+                return any(x1 <= cx < x2 and y1 <= cy < y2 for x1, y1, x2, y2 in rects)
+
+            detections = [d for d in detections if not escalated(d)]
+            for (x1, y1, _, _), result in zip(rects, results):
+                detections += [{"label": label, "confidence": round(conf, 3), "bbox": bbox, "tier": 2}
+                               for label, conf, bbox in parse_boxes(result, self.allowed_labels, (x1, y1))]
+            detections = merge_detections(detections)
+            cascade_stats["escalated"] += 1
+            cascade_stats["full_frame"] += full
+            cascade_stats["regions"] += 0 if full else len(rects)
+            for reason, _ in found:
+                cascade_stats["reasons"][reason] += 1
+        self.previous = [(d["label"], d["bbox"]) for d in detections]
+        return detections, found
+
+
+def cascade_snapshot():
+    if not CASCADE_MODEL:
+        return None
+    frames = max(1, cascade_stats["frames"])
+    return dict(cascade_stats, model=CASCADE_MODEL, detector=cascade_detector_stats,
+                escalation_rate=round(cascade_stats["escalated"] / frames, 3),
+                tier1_ms=round(cascade_stats["tier1_ms"] / frames, 1),  # averaged over every frame
+                tier2_ms=round(cascade_stats["tier2_ms"] / frames, 1))
 
 
 def parse_label_filter(filter_str):
@@ -116,56 +745,79 @@ def parse_label_filter(filter_str):
 
 def yolo_detection_loop():
     """Run YOLO inference on AKASO frames and update detection state."""
-    global yolo_detections
-
-    import torch
-    device = YOLO_DEVICE
-    if device != "cpu" and not torch.cuda.is_available():
-        print(f"WARNING: CUDA not available (torch {torch.__version__}), falling back to CPU for YOLO")
-        device = "cpu"
+    global yolo_detections, tile_planner
 
-    print(f"YOLO detection loop starting (model: {YOLO_MODEL}, device: {device}, conf: {YOLO_CONF})")
-    model = YOLO(YOLO_MODEL)
+    print(f"YOLO detection loop starting (model: {YOLO_MODEL}, backend: {DETECTOR_BACKEND}, conf: {YOLO_CONF})")
+    model, device = load_detector()
     allowed_labels = parse_label_filter(YOLO_LABEL_FILTER)
     print(f"YOLO model loaded. Label filter: {allowed_labels or 'all'}")
+    cascade = None
+    if CASCADE_MODEL:
+        tier2, tier2_device = load_detector(weights=CASCADE_MODEL, batch=CASCADE_MAX_REGIONS,
+                                            stats=cascade_detector_stats)
+        cascade = Cascade(tier2, tier2_device, allowed_labels)
+        print(f"Model cascade on: {YOLO_MODEL} every frame, {CASCADE_MODEL} when unsure")
+    first_conf = min([YOLO_CONF] + ([TILE_LOW_CONF] if TILE_BUDGET_MS > 0 else [])
+                     + ([CASCADE_WEAK_CONF] if cascade else []))
 
     fps_counter = 0
     fps_timer = time.time()
     current_fps = 0.0
+    seq = 0
+    frame_seq = 0
 
     while True:
-        with lock:
-            frame = latest_frame_raw
-
+        frame_seq, captured_at, frame = camera_frame(frame_seq)
         if frame is None:
-            time.sleep(0.05)
             continue
+        inference_start = time.time()
+        if TILE_BUDGET_MS > 0 and tile_planner is None:
+            # Sized from the first frame: the camera may not have negotiated CAMERA_WIDTH x CAMERA_HEIGHT
+            tile_planner = TilePlanner(parse_tile_zones(TILE_ZONES), frame.shape[1], frame.shape[0])
+            print(f"Tiled detection on ({len(tile_planner.zone_tiles)} zone tiles, budget {TILE_BUDGET_MS:g} ms/frame)")
+        planner = tile_planner
 
         try:
-            results = model(frame, conf=YOLO_CONF, device=device, verbose=False)
-            result = results[0]
+            tiles = planner.plan(inference_start) if planner else []
+            images = [frame] + [np.ascontiguousarray(frame[y1:y2, x1:x2]) for _, (x1, y1, x2, y2) in tiles]
+            t0 = time.perf_counter()
+            results = model(images, conf=first_conf, imgsz=DETECTOR_IMGSZ, device=device, verbose=False)
+            tier1_ms = (time.perf_counter() - t0) * 1000
+            if planner:
+                planner.record(len(tiles), tier1_ms)
 
             detections = []
-            counts = {}
-            person_count = 0
-
-            for box in result.boxes:
-                cls_id = int(box.cls[0])
-                label = result.names[cls_id]
-                conf = float(box.conf[0])
-                x1, y1, x2, y2 = [int(v) for v in box.xyxy[0].tolist()]
-
-                if allowed_labels is not None and label.lower() not in allowed_labels:
-                    continue
+            weak = []  # below YOLO_CONF: focus-tile and cascade candidates, never published
+            for (tile, (ox, oy, _, _)), result in zip([(None, (0, 0, 0, 0))] + tiles, results):
+                for label, conf, bbox in parse_boxes(result, allowed_labels, (ox, oy)):
+                    if conf < YOLO_CONF:
+                        if planner and tile is None and conf >= TILE_LOW_CONF:
+                            planner.note_hit(inference_start, bbox)
+                        weak.append((label, conf, bbox))
+                        continue
+
+                    det = {"label": label, "confidence": round(conf, 3), "bbox": bbox}
+                    if tile is not None:
+                        det["tile"] = tile
+                    detections.append(det)
+
+            if tiles:
+                detections = merge_detections(detections)
+                tile_stats["frames"] += 1
+                tile_stats["tiles"] += len(tiles)
+                tile_stats["tile_boxes"] += sum("tile" in d for d in detections)
+
+            if cascade:
+                t0 = time.perf_counter()
+                detections, _ = cascade.run(frame, detections, weak)
+                cascade_stats["frames"] += 1
+                cascade_stats["tier1_ms"] += tier1_ms
+                cascade_stats["tier2_ms"] += (time.perf_counter() - t0) * 1000
 
-                detections.append({
-                    "label": label,
-                    "confidence": round(conf, 3),
-                    "bbox": [x1, y1, x2, y2],
-                })
-                counts[label] = counts.get(label, 0) + 1
-                if label == "person":
-                    person_count += 1
+            counts = {}
+            for det in detections:
+                counts[det["label"]] = counts.get(det["label"], 0) + 1
+            person_count = counts.get("person", 0)
 
             # FPS tracking
             fps_counter += 1
@@ -175,34 +827,30 @@ def yolo_detection_loop():
                 fps_counter = 0
                 fps_timer = time.time()
 
+            now = time.time()
+            history_put("frame", (now, counts, None, round(current_fps, 1)))
+            seq += 1
             detection_payload = {
+                "seq": seq,
                 "fps": round(current_fps, 1),
-                "timestamp": time.time(),
+                "timestamp": now,
+                "capture_ts": captured_at,
                 "source": "spark",
                 "counts": counts,
                 "person_count": person_count,
                 "nearest_person_m": None,  # no depth sensor on AKASO
                 "detections": detections,
             }
-
-            # Draw bounding boxes on the frame for the MJPEG stream
-            annotated = frame.copy()
-            for det in detections:
-                x1, y1, x2, y2 = det["bbox"]
-                color = (0, 255, 0) if det["label"] == "person" else (0, 200, 255)
-                cv2.rectangle(annotated, (x1, y1), (x2, y2), color, 2)
-                text = f"{det['label']} {det['confidence']:.2f}"
-                (tw, th), _ = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1)
-                cv2.rectangle(annotated, (x1, y1 - th - 6), (x1 + tw, y1), color, -1)
-                cv2.putText(annotated, text, (x1, y1 - 4),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 1, cv2.LINE_AA)
-
-            _, buf = cv2.imencode(".jpg", annotated, [cv2.IMWRITE_JPEG_QUALITY, 80])
+            detection_body = json.dumps(detection_payload).encode()
 
             with lock:
-                global latest_frame
-                latest_frame = buf.tobytes()
+                global latest_frame, detections_seq, detections_body
+                latest_frame = frame
                 yolo_detections = detection_payload
+                detections_seq = seq
+                detections_body = detection_body
+                detections_cond.notify_all()
+            frame_latencies.append(((inference_start - captured_at) * 1000, (time.time() - captured_at) * 1000))
 
         except Exception as e:
             print(f"YOLO inference error: {e}")
@@ -210,39 +858,22 @@ def yolo_detection_loop():
 
 
 def jetson_snapshot_fetcher():
-    """Periodically grab a single frame from the Jetson MJPEG stream."""
+    """Periodically fetch the Jetson's latest still, skipping unchanged frames."""
     global latest_jetson_frame
-    print(f"Jetson snapshot fetcher started ({JETSON_STREAM})")
+    print(f"Jetson snapshot fetcher started ({JETSON_SNAPSHOT})")
+    etag = None
 
     while True:
         time.sleep(2.0)
         try:
-            req = urllib.request.Request(JETSON_STREAM)
+            req = urllib.request.Request(JETSON_SNAPSHOT, headers={"If-None-Match": etag} if etag else {})
             with urllib.request.urlopen(req, timeout=3) as resp:
-                # Read enough bytes to get one JPEG frame from the MJPEG stream
-                buf = b""
-                while True:
-                    chunk = resp.read(4096)
-                    if not chunk:
-                        break
-                    buf += chunk
-                    # Look for JPEG end marker
-                    end = buf.find(b"\xff\xd9")
-                    if end != -1:
-                        # Find JPEG start marker
-                        start = buf.find(b"\xff\xd8")
-                        if start != -1 and start < end:
-                            jpeg_data = buf[start:end + 2]
-                            frame = cv2.imdecode(
-                                np.frombuffer(jpeg_data, dtype=np.uint8),
-                                cv2.IMREAD_COLOR,
-                            )
-                            if frame is not None:
-                                with lock:
-                                    latest_jetson_frame = frame
-                        break
-        except Exception as e:
-            # Jetson may be offline — that's fine
+                jpeg = resp.read()
+                etag = resp.headers.get("ETag")
+            with lock:
+                latest_jetson_frame = jpeg
+        except Exception:
+            # 304 (no new frame since the last fetch) or Jetson offline — keep what we have
             pass
 
 
@@ -260,9 +891,7 @@ def fast_inference_loop():
     while True:
         time.sleep(FAST_INTERVAL)
 
-        with lock:
-            frame = latest_frame_raw
-
+        _, _, frame = camera_frame()
         if frame is None:
             continue
 
@@ -312,6 +941,7 @@ def fast_inference_loop():
             with lock:
                 entry["output"] = f"Error: {e}"
                 entry["status"] = "error"
+        history_put("vlm", (entry["timestamp"], "fast", entry["status"], entry.get("elapsed"), entry["output"]))
 
 
 def deep_inference_loop():
@@ -322,8 +952,8 @@ def deep_inference_loop():
     while True:
         time.sleep(DEEP_INTERVAL)
 
+        _, _, akaso_frame = camera_frame()
         with lock:
-            akaso_frame = latest_frame_raw
             jetson_frame = latest_jetson_frame
 
         if akaso_frame is None and jetson_frame is None:
@@ -355,7 +985,7 @@ def deep_inference_loop():
             content.append({
                 "type": "image_url",
                 "image_url": {
-                    "url": f"data:image/jpeg;base64,{frame_to_b64(jetson_frame)}",
+                    "url": f"data:image/jpeg;base64,{base64.b64encode(jetson_frame).decode('utf-8')}",
                 },
             })
             cameras_used.append("jetson")
@@ -395,21 +1025,666 @@ def deep_inference_loop():
             with lock:
                 entry["output"] = f"Error: {e}"
                 entry["status"] = "error"
+        history_put("vlm", (entry["timestamp"], "deep", entry["status"], entry.get("elapsed"), entry["output"]))
+
+
+# --- Event history ---
+# Inference threads only enqueue; one writer thread owns the SQLite (WAL)
+# connection, batches rows per flush and applies retention.
+
+history_queue = queue.Queue(maxsize=5000)
+history_stats = {"frames": 0, "events": 0, "vlm": 0, "dropped": 0, "flushes": 0, "last_flush_ms": 0.0}
+
+HISTORY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS frames (ts REAL NOT NULL, person_count INTEGER, nearest_m REAL, fps REAL, counts TEXT);
+CREATE INDEX IF NOT EXISTS frames_ts ON frames (ts);
+CREATE TABLE IF NOT EXISTS events (ts REAL NOT NULL, kind TEXT, label TEXT, count INTEGER);
+CREATE INDEX IF NOT EXISTS events_ts ON events (ts);
+CREATE TABLE IF NOT EXISTS vlm (ts REAL NOT NULL, model TEXT, status TEXT, elapsed REAL, output TEXT);
+CREATE INDEX IF NOT EXISTS vlm_ts ON vlm (ts);
+CREATE TABLE IF NOT EXISTS clips (id TEXT PRIMARY KEY, ts REAL NOT NULL, labels TEXT, start REAL, end REAL,
+                                  frames INTEGER, bytes INTEGER, path TEXT);
+CREATE INDEX IF NOT EXISTS clips_ts ON clips (ts);
+"""
+
 
+def history_put(kind, row):
+    """Queue a row for the writer without blocking; drops when the queue is full."""
+    try:
+        history_queue.put_nowait((kind, row))
+    except queue.Full:
+        history_stats["dropped"] += 1
+
+
+class HistoryTracker:
+    """Turns per-frame label counts into debounced appeared/left/count events."""
+
+    def __init__(self):
+        self.stable = {}
+        self.pending = {}  # label -> (count, first seen)
+        self.last_frame_ts = 0.0
+        self.last_counts = {}  # counts of the last kept frame summary
+
+    def update(self, ts, counts):
+        events = []
+        for label in set(counts) | set(self.stable) | set(self.pending):
+            value = counts.get(label, 0)
+            before = self.stable.get(label, 0)
+            if value == before:
+                self.pending.pop(label, None)
+                continue
+            if self.pending.get(label, (None,))[0] != value:
+                self.pending[label] = (value, ts)
+            elif ts - self.pending[label][1] >= HISTORY_EVENT_HOLD_S:
+                kind = "appeared" if before == 0 else "left" if value == 0 else "count"
+                events.append((self.pending[label][1], kind, label, value))  # onset time
+                del self.pending[label]
+                if value:
+                    self.stable[label] = value
+                else:
+                    self.stable.pop(label, None)
+        keep = bool(events) or counts != self.last_counts or ts - self.last_frame_ts >= HISTORY_FRAME_EVERY_S
+        if keep:
+            self.last_frame_ts = ts
+            self.last_counts = dict(counts)
+        return keep, events
+
+
+def history_writer_loop():
+    """Background thread: batch queued rows into SQLite and prune old ones."""
+    os.makedirs(os.path.dirname(HISTORY_DB) or ".", exist_ok=True)
+    db = sqlite3.connect(HISTORY_DB)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    db.executescript(HISTORY_SCHEMA)
+    tracker = HistoryTracker()
+    last_prune = 0.0
+    print(f"History writer started ({HISTORY_DB}, retention {HISTORY_RETENTION_H:g}h)")
 
-def generate_mjpeg():
-    """Yield MJPEG frames for the /stream endpoint."""
     while True:
-        with lock:
-            frame = latest_frame
-        if frame is None:
-            time.sleep(0.05)
-            continue
-        yield (
-            b"--frame\r\n"
-            b"Content-Type: image/jpeg\r\n\r\n" + frame + b"\r\n"
+        time.sleep(HISTORY_FLUSH_S)
+        frames, events, vlm = [], [], []
+        while True:
+            try:
+                kind, row = history_queue.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "frame":
+                ts, counts, nearest, fps = row
+                keep, new_events = tracker.update(ts, counts)
+                events.extend(new_events)
+                for event_ts, event_kind, label, _ in new_events:
+                    if CLIP_RECORD and event_kind == "appeared" and label in CLIP_TRIGGER_LABELS:
+                        clip_trigger(event_ts, label)
+                if keep:
+                    frames.append((ts, counts.get("person", 0), nearest, fps, json.dumps(counts)))
+            elif kind == "vlm":
+                vlm.append(row)
+
+        try:
+            if frames or events or vlm:
+                t0 = time.time()
+                with db:
+                    db.executemany("INSERT INTO frames VALUES (?, ?, ?, ?, ?)", frames)
+                    db.executemany("INSERT INTO events VALUES (?, ?, ?, ?)", events)
+                    db.executemany("INSERT INTO vlm VALUES (?, ?, ?, ?, ?)", vlm)
+                history_stats["frames"] += len(frames)
+                history_stats["events"] += len(events)
+                history_stats["vlm"] += len(vlm)
+                history_stats["flushes"] += 1
+                history_stats["last_flush_ms"] = round((time.time() - t0) * 1000, 1)
+            if time.time() - last_prune > 60:
+                cutoff = time.time() - HISTORY_RETENTION_H * 3600
+                with db:
+                    for table in ("frames", "events", "vlm"):
+                        db.execute(f"DELETE FROM {table} WHERE ts < ?", (cutoff,))
+                last_prune = time.time()
+        except sqlite3.Error as e:
+            print(f"History write error: {e}")
+
+
+def query_history(since, until, step, label):
+    """Downsampled count series plus the events and VLM outputs in [since, until)."""
+    db = sqlite3.connect(f"file:{HISTORY_DB}?mode=ro", uri=True, timeout=2)
+    try:
+        if label:
+            value, value_args = "COALESCE(json_extract(counts, ?), 0)", [f'$."{label}"'] * 2
+        else:
+            value, value_args = "person_count", []
+        series = [
+            {"t": round(bucket * step, 3), "max": peak, "avg": round(avg, 2),
+             "nearest_m": nearest, "samples": n}
+            for bucket, peak, avg, nearest, n in db.execute(
+                f"SELECT CAST(ts / ? AS INTEGER) AS b, MAX({value}), AVG({value}), MIN(nearest_m), COUNT(*) "
+                "FROM frames WHERE ts >= ? AND ts < ? GROUP BY b ORDER BY b",
+                [step, *value_args, since, until],
+            )
+        ]
+        event_sql = (
+            "SELECT ts, kind, label, count, "
+            "(SELECT id FROM clips WHERE events.ts BETWEEN clips.start AND clips.end LIMIT 1) "
+            "FROM events WHERE ts >= ? AND ts < ?"
         )
-        time.sleep(0.033)  # ~30fps cap
+        event_args = [since, until]
+        if label:
+            event_sql += " AND label = ?"
+            event_args.append(label)
+        events = [
+            {"timestamp": ts, "kind": kind, "label": lbl, "count": count, "clip": clip}
+            for ts, kind, lbl, count, clip in db.execute(event_sql + " ORDER BY ts DESC LIMIT 500", event_args)
+        ]
+        vlm = [
+            {"timestamp": ts, "model": model, "status": status, "elapsed": elapsed, "output": output}
+            for ts, model, status, elapsed, output in db.execute(
+                "SELECT ts, model, status, elapsed, output FROM vlm WHERE ts >= ? AND ts < ? "
+                "ORDER BY ts DESC LIMIT 100", (since, until))
+        ]
+    finally:
+        db.close()
+    return series, events, vlm
+
+
+# --- Clip recording ---
+# The recorder thread samples the annotated /stream JPEG into a pre-roll
+# ring. A trigger starts a recording seeded from the ring, which
+# keeps collecting frames until CLIP_POST_S after the last trigger; the
+# writer thread then muxes it to disk. Only references to existing JPEG
+# bytes are held, and both the ring and the write queue are bounded.
+
+clip_lock = threading.Lock()
+clip_ring = deque()   # (ts, jpeg bytes), oldest first
+clip_ring_bytes = 0
+clip_active = []      # recordings still collecting frames
+clip_jobs = queue.Queue(maxsize=4)
+clip_stats = {"triggers": 0, "extended": 0, "written": 0, "dropped": 0, "errors": 0,
+              "ring_frames": 0, "ring_mb": 0.0, "last_write_s": 0.0}
+
+
+def clip_trigger(event_ts, label):
+    """Start a recording around an event, or extend the one covering it."""
+    with clip_lock:
+        clip_stats["triggers"] += 1
+        for rec in clip_active:
+            if event_ts <= rec["end"] < rec["start"] + CLIP_MAX_S:
+                rec["end"] = min(max(rec["end"], event_ts + CLIP_POST_S), rec["start"] + CLIP_MAX_S)
+                rec["labels"].add(label)
+                clip_stats["extended"] += 1
+                return rec["id"]
+        start = event_ts - CLIP_PRE_S
+        rec = {
+            "id": uuid.uuid4().hex[:12],
+            "ts": event_ts,
+            "labels": {label},
+            "start": start,
+            "end": event_ts + CLIP_POST_S,
+            "frames": [f for f in clip_ring if f[0] >= start],
+        }
+        clip_active.append(rec)
+        return rec["id"]
+
+
+def recorder_loop():
+    """Background thread: keep the pre-roll ring and feed active recordings."""
+    global clip_ring_bytes
+    # Triggers come from the history writer, up to a flush + debounce late
+    ring_s = CLIP_PRE_S + HISTORY_FLUSH_S + HISTORY_EVENT_HOLD_S + 1.0
+    last = None
+    print(f"Clip recorder started ({CLIP_FPS:g} fps, {CLIP_PRE_S:g}s pre / {CLIP_POST_S:g}s post, {CLIP_DIR})")
+
+    while True:
+        time.sleep(1.0 / CLIP_FPS)
+        entry = frame_variant(CLIP_OVERLAY)
+        if entry is None or entry[0] == last:
+            continue
+        last, _, jpeg = entry
+        now = time.time()
+
+        with clip_lock:
+            clip_ring.append((now, jpeg))
+            clip_ring_bytes += len(jpeg)
+            while clip_ring and (clip_ring[0][0] < now - ring_s or clip_ring_bytes > CLIP_RING_MAX_MB * 1e6):
+                clip_ring_bytes -= len(clip_ring.popleft()[1])
+            finished = []
+            for rec in clip_active:
+                rec["frames"].append((now, jpeg))
+                if now >= rec["end"]:
+                    finished.append(rec)
+            for rec in finished:
+                clip_active.remove(rec)
+            clip_stats["ring_frames"] = len(clip_ring)
+            clip_stats["ring_mb"] = round(clip_ring_bytes / 1e6, 1)
+
+        for rec in finished:
+            try:
+                clip_jobs.put_nowait(rec)
+            except queue.Full:
+                clip_stats["dropped"] += 1
+
+
+def write_clip(rec):
+    """Decode the JPEGs and mux them into CLIP_DIR; returns (file name, bytes)."""
+    fourcc, ext = ("mp4v", "mp4") if CLIP_FORMAT == "mp4" else ("MJPG", "avi")
+    frames = rec["frames"]
+    span = frames[-1][0] - frames[0][0]
+    fps = (len(frames) - 1) / span if len(frames) > 1 and span > 0 else CLIP_FPS
+    name = f"{rec['id']}.{ext}"
+    tmp = os.path.join(CLIP_DIR, f"{rec['id']}.tmp.{ext}")
+    writer = None
+    try:
+        for _, jpeg in frames:
+            img = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if img is None:
+                continue
+            if writer is None:
+                h, w = img.shape[:2]
+                writer = cv2.VideoWriter(tmp, cv2.VideoWriter_fourcc(*fourcc), fps, (w, h))
+            writer.write(img)
+    finally:
+        if writer is not None:
+            writer.release()
+    path = os.path.join(CLIP_DIR, name)
+    os.replace(tmp, path)
+    return name, os.path.getsize(path)
+
+
+def prune_clips(db):
+    """Drop clips past HISTORY_RETENTION_H or beyond CLIP_MAX_DISK_MB, oldest first."""
+    cutoff = time.time() - HISTORY_RETENTION_H * 3600
+    total = 0
+    doomed = []
+    for clip_id, ts, size, name in db.execute("SELECT id, ts, bytes, path FROM clips ORDER BY ts DESC"):
+        total += size or 0
+        if ts < cutoff or total > CLIP_MAX_DISK_MB * 1e6:
+            doomed.append((clip_id, name))
+    for _, name in doomed:
+        try:
+            os.remove(os.path.join(CLIP_DIR, name))
+        except FileNotFoundError:
+            pass
+    if doomed:
+        with db:
+            db.executemany("DELETE FROM clips WHERE id = ?", [(clip_id,) for clip_id, _ in doomed])
+
+
+def clip_writer_loop():
+    """Background thread: write finished recordings and index them by event id."""
+    os.makedirs(CLIP_DIR, exist_ok=True)
+    db = sqlite3.connect(HISTORY_DB, timeout=5)
+    db.executescript(HISTORY_SCHEMA)
+
+    while True:
+        rec = clip_jobs.get()
+        if not rec["frames"]:
+            continue
+        t0 = time.time()
+        try:
+            name, size = write_clip(rec)
+            with db:
+                db.execute(
+                    "INSERT OR REPLACE INTO clips VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (rec["id"], rec["ts"], ",".join(sorted(rec["labels"])), rec["frames"][0][0],
+                     rec["frames"][-1][0], len(rec["frames"]), size, name),
+                )
+            prune_clips(db)
+            clip_stats["written"] += 1
+            clip_stats["last_write_s"] = round(time.time() - t0, 2)
+            print(f"[{time.strftime('%H:%M:%S')}] Clip {name} ({len(rec['frames'])} frames, "
+                  f"{','.join(sorted(rec['labels']))}) written in {time.time() - t0:.1f}s")
+        except Exception as e:
+            clip_stats["errors"] += 1
+            print(f"Clip write error: {e}")
+
+
+# --- Frame variants ---
+# /stream and /snapshot.jpg clients ask for (overlay, size, quality) variants
+# of the frame YOLO last ran on. Each variant is encoded at most once per
+# frame, on the first request after it is published, so variants nobody is
+# watching cost nothing. Overlays are lazy the same way: drawn once per frame
+# into a reused buffer, and only when an annotated variant is requested.
+
+variant_lock = threading.Lock()
+variant_cache = {}   # (overlay, width, quality) -> (seq, ts, jpeg bytes) of the newest frame served
+variant_locks = {}   # (overlay, width, quality) -> lock held while that variant encodes
+overlay_lock = threading.Lock()
+overlay_buf = None   # annotated copy of the frame with seq overlay_seq
+overlay_seq = -1
+stream_stats = {"clients": 0, "encodes": 0, "encode_ms": 0.0, "overlays": 0}
+
+
+def parse_variant_args(args):
+    """(width, quality) from ?w=&q=, snapped so nearby requests share a variant."""
+    width = int(args.get("w", 0))
+    quality = int(args.get("q", JPEG_QUALITY))
+    width = max(VARIANT_MIN_WIDTH, width - width % 16) if width > 0 else 0
+    quality = min(95, max(20, quality - quality % 5))
+    return width, quality
+
+
+def wants_overlay(args):
+    """?overlay=0 (or the older ?raw=1) asks for the clean frame."""
+    return args.get("overlay", "1") != "0" and args.get("raw") != "1"
+
+
+def draw_overlays(buf, detections):
+    """Draw YOLO boxes and labels onto buf in place."""
+    for det in detections:
+        x1, y1, x2, y2 = det["bbox"]
+        color = (0, 255, 0) if det["label"] == "person" else (0, 200, 255)
+        cv2.rectangle(buf, (x1, y1), (x2, y2), color, 2)
+        text = f"{det['label']} {det['confidence']:.2f}"
+        (tw, th), _ = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1)
+        cv2.rectangle(buf, (x1, y1 - th - 6), (x1 + tw, y1), color, -1)
+        cv2.putText(buf, text, (x1, y1 - 4),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 1, cv2.LINE_AA)
+
+
+def overlay_image(seq, frame, detections):
+    """Annotated copy of frame in the shared buffer; call with overlay_lock held."""
+    global overlay_buf, overlay_seq
+    if overlay_seq != seq:
+        if overlay_buf is None or overlay_buf.shape != frame.shape:
+            overlay_buf = np.empty_like(frame)
+        np.copyto(overlay_buf, frame)
+        draw_overlays(overlay_buf, detections)
+        overlay_seq = seq
+        stream_stats["overlays"] += 1
+    return overlay_buf
+
+
+def encode_variant(frame, width, quality):
+    h, w = frame.shape[:2]
+    if width and width < w:
+        frame = cv2.resize(frame, (width, max(1, round(h * width / w))), interpolation=cv2.INTER_AREA)
+    _, buf = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return buf.tobytes()
+
+
+def frame_variant(overlay, width=0, quality=JPEG_QUALITY):
+    """Latest frame as (seq, ts, jpeg), annotated or clean, downscaled to width if set."""
+    with lock:
+        seq, ts, frame = detections_seq, yolo_detections["timestamp"], latest_frame
+        dets = yolo_detections["detections"]
+    if frame is None:
+        return None
+
+    if width >= frame.shape[1]:
+        width = 0  # no upscaling: every width at or above the frame's is the full-size variant
+    key = (overlay, width, quality)
+    with variant_lock:
+        cached = variant_cache.get(key)
+        if cached and cached[0] == seq:
+            return cached
+        key_lock = variant_locks.setdefault(key, threading.Lock())
+    with key_lock:
+        cached = variant_cache.get(key)
+        if cached and cached[0] == seq:
+            return cached  # another client encoded it while we waited
+        t0 = time.time()
+        if overlay:
+            with overlay_lock:
+                jpeg = encode_variant(overlay_image(seq, frame, dets), width, quality)
+        else:
+            jpeg = encode_variant(frame, width, quality)
+        entry = (seq, ts, jpeg)
+        with variant_lock:
+            if len(variant_cache) >= 32:
+                variant_cache.clear()
+                for k in [k for k, l in variant_locks.items() if not l.locked()]:
+                    del variant_locks[k]
+            variant_cache[key] = entry
+            stream_stats["encodes"] += 1
+            stream_stats["encode_ms"] += (time.time() - t0) * 1000
+        return entry
+
+
+def generate_mjpeg(overlay=True, width=0, quality=JPEG_QUALITY, fps=STREAM_MAX_FPS):
+    """Yield one MJPEG variant, sending each new frame at most fps times a second."""
+    interval = 1.0 / fps
+    last_seq = -1
+    next_due = 0.0
+    with variant_lock:
+        stream_stats["clients"] += 1
+    try:
+        while True:
+            delay = next_due - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            with detections_cond:
+                detections_cond.wait_for(lambda: detections_seq != last_seq, timeout=1.0)
+            entry = frame_variant(overlay, width, quality)
+            if entry is None or entry[0] == last_seq:
+                continue
+            last_seq, _, jpeg = entry
+            # Pace from the previous slot, but never bank time while the source is slower
+            next_due = max(next_due + interval, time.time())
+            # X-Seq pairs the frame with the /detections result of the same seq
+            yield (
+                b"--frame\r\n"
+                b"Content-Type: image/jpeg\r\nX-Seq: %d\r\n\r\n" % last_seq + jpeg + b"\r\n"
+            )
+    finally:
+        with variant_lock:
+            stream_stats["clients"] -= 1
+
+
+# --- H.264 stream ---
+# Optional low-bandwidth mode: one libx264 encoder per camera, started by the
+# first /stream.mp4 client and stopped H264_IDLE_S after the last one leaves.
+# The muxer writes fragmented MP4 with one moof+mdat per frame; fragments are
+# fanned out to per-client queues, and a client that joins mid-GOP starts at
+# the next keyframe fragment after the init segment (ftyp+moov).
+
+
+def mp4_boxes(buf):
+    """Split complete top-level MP4 boxes off buf; returns ([(type, box)], rest)."""
+    boxes = []
+    pos = 0
+    while len(buf) - pos >= 8:
+        size = int.from_bytes(buf[pos:pos + 4], "big")
+        if size == 1:
+            if len(buf) - pos < 16:
+                break
+            size = int.from_bytes(buf[pos + 8:pos + 16], "big")
+        if size < 8 or len(buf) - pos < size:
+            break
+        boxes.append((buf[pos + 4:pos + 8], buf[pos:pos + size]))
+        pos += size
+    return boxes, buf[pos:]
+
+
+class H264Stream:
+    """Shared H.264 encoder feeding every /stream.mp4 client."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clients = []            # one queue of (keyframe, fragment) per client
+        self.init_segment = None
+        self.thread = None
+        self.last_client = 0.0
+        self.pending = b""
+        self.header = b""
+        self.moof = b""
+        self.packet_keys = deque()   # keyframe flag of each muxed packet, in fragment order
+        self.sent = deque()          # (ts, bytes) of recent fragments, for bitrate
+        self.av = None               # PyAV module, imported by the encoder thread
+        self.stats = {"running": False, "clients": 0, "frames": 0, "fragments": 0, "bytes": 0,
+                      "bitrate_kbps": 0.0, "encode_ms": 0.0, "dropped_clients": 0, "error": None}
+
+    def subscribe(self):
+        q = queue.Queue(maxsize=H264_CLIENT_QUEUE)
+        with self.lock:
+            self.clients.append(q)
+            self.stats["clients"] = len(self.clients)
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, daemon=True)
+                self.thread.start()
+        return q
+
+    def unsubscribe(self, q):
+        with self.lock:
+            if q in self.clients:
+                self.clients.remove(q)
+            self.stats["clients"] = len(self.clients)
+            self.last_client = time.time()
+
+    def write(self, data):
+        """File-like sink for the muxer: regroup its output into fragments."""
+        boxes, self.pending = mp4_boxes(self.pending + bytes(data))
+        for kind, box in boxes:
+            if kind == b"moof":
+                self.moof = box
+            elif kind == b"mdat" and self.moof:
+                keyframe = self.packet_keys.popleft() if self.packet_keys else False
+                self.publish(keyframe, self.moof + box)
+                self.moof = b""
+            else:
+                self.header += box
+                if kind == b"moov":
+                    self.init_segment = self.header
+        return len(data)
+
+    def publish(self, keyframe, fragment):
+        now = time.time()
+        self.sent.append((now, len(fragment)))
+        while self.sent and self.sent[0][0] < now - 5.0:
+            self.sent.popleft()
+        span = max(1.0, now - self.sent[0][0])
+        self.stats["fragments"] += 1
+        self.stats["bytes"] += len(fragment)
+        self.stats["bitrate_kbps"] = round(sum(n for _, n in self.sent) * 8 / 1000 / span, 1)
+        with self.lock:
+            clients = list(self.clients)
+        for q in clients:
+            try:
+                q.put_nowait((keyframe, fragment))
+            except queue.Full:
+                # Too far behind to catch up live; end it so the player reconnects
+                self.unsubscribe(q)
+                self.stats["dropped_clients"] += 1
+                self.close_client(q)
+
+    @staticmethod
+    def close_client(q):
+        while True:
+            try:
+                q.get_nowait()
+            except queue.Empty:
+                break
+        q.put_nowait(None)
+
+    def next_image(self, last_seq):
+        """(seq, VideoFrame) for the newest frame, or (seq, None) if nothing new."""
+        with detections_cond:
+            detections_cond.wait_for(lambda: detections_seq != last_seq, timeout=1.0)
+            seq, frame, dets = detections_seq, latest_frame, yolo_detections["detections"]
+        if frame is None or seq == last_seq:
+            return last_seq, None
+        with overlay_lock:
+            img = overlay_image(seq, frame, dets) if H264_OVERLAY else frame
+            h, w = img.shape[:2]
+            if h % 2 or w % 2:  # yuv420p needs even dimensions
+                img = np.ascontiguousarray(img[:h - h % 2, :w - w % 2])
+            # from_ndarray copies, so the shared overlay buffer is free once this returns
+            return seq, self.av.VideoFrame.from_ndarray(img, format="bgr24")
+
+    def run(self):
+        try:
+            import av
+        except ImportError:
+            self.stats["error"] = "PyAV not installed (pip install av)"
+            print(f"H.264 stream unavailable: {self.stats['error']}")
+            with self.lock:
+                clients, self.clients = self.clients, []
+            for q in clients:
+                self.close_client(q)
+            return
+
+        self.av = av
+        self.pending, self.header, self.moof, self.init_segment = b"", b"", b"", None
+        self.packet_keys.clear()
+        self.stats.update(running=True, error=None)
+        container = av.open(self, mode="w", format="mp4", options={
+            "movflags": "frag_every_frame+empty_moov+default_base_moof",
+            "flush_packets": "1",
+        })
+        stream = None
+        interval = 1.0 / H264_FPS
+        last_seq, next_due, pts = -1, 0.0, -1
+        t_start = time.time()
+        print(f"H.264 encoder started ({H264_FPS:g} fps, GOP {H264_GOP}, {H264_BITRATE_KBPS} kbps, {H264_PRESET})")
+
+        try:
+            while True:
+                with self.lock:
+                    if not self.clients and time.time() - self.last_client > H264_IDLE_S:
+                        break
+                delay = next_due - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+                last_seq, image = self.next_image(last_seq)
+                if image is None:
+                    continue
+                next_due = max(next_due + interval, time.time())
+
+                if stream is None:
+                    stream = container.add_stream("libx264", rate=Fraction(H264_FPS).limit_denominator(1000))
+                    stream.width, stream.height = image.width, image.height
+                    stream.pix_fmt = "yuv420p"
+                    stream.bit_rate = H264_BITRATE_KBPS * 1000
+                    stream.options = {"preset": H264_PRESET, "tune": "zerolatency",
+                                      "g": str(H264_GOP), "bf": "0"}
+                # Wall-clock timestamps keep playback speed right when the source is slower than H264_FPS
+                pts = max(pts + 1, round((time.time() - t_start) * H264_FPS))
+                image.pts = pts
+
+                t0 = time.time()
+                for packet in stream.encode(image):
+                    self.packet_keys.append(packet.is_keyframe)
+                    container.mux(packet)
+                elapsed_ms = (time.time() - t0) * 1000
+                self.stats["frames"] += 1
+                self.stats["encode_ms"] = round(0.9 * self.stats["encode_ms"] + 0.1 * elapsed_ms, 2)
+        except Exception as e:
+            self.stats["error"] = str(e)
+            print(f"H.264 encoder error: {e}")
+        finally:
+            try:
+                container.close()
+            except Exception:
+                pass
+            self.stats["running"] = False
+            with self.lock:
+                clients, self.clients = self.clients, []
+                self.stats["clients"] = 0
+            for q in clients:
+                self.close_client(q)
+            print("H.264 encoder stopped")
+
+
+h264_stream = H264Stream()
+
+
+def generate_h264():
+    """Yield the init segment, then fragments from the first keyframe on."""
+    q = h264_stream.subscribe()
+    started = False
+    try:
+        while True:
+            try:
+                item = q.get(timeout=5.0)
+            except queue.Empty:
+                continue
+            if item is None:
+                return
+            keyframe, fragment = item
+            if not started:
+                if not keyframe or h264_stream.init_segment is None:
+                    continue
+                yield h264_stream.init_segment
+                started = True
+            yield fragment
+    finally:
+        h264_stream.unsubscribe(q)
 
 
 def format_result(r):
@@ -429,17 +1704,68 @@ def format_result(r):
 
 @app.route("/stream")
 def stream():
+    try:
+        width, quality = parse_variant_args(request.args)
+        fps = min(STREAM_MAX_FPS, max(0.2, float(request.args.get("fps", STREAM_MAX_FPS))))
+    except ValueError:
+        return jsonify({"error": "w, q and fps must be numbers"}), 400
     return Response(
-        generate_mjpeg(),
+        generate_mjpeg(wants_overlay(request.args), width, quality, fps),
         mimetype="multipart/x-mixed-replace; boundary=frame",
     )
 
 
+@app.route("/stream.mp4")
+def stream_h264():
+    if not H264_AVAILABLE:
+        return jsonify({"error": "PyAV not installed (pip install av)"}), 503
+    return Response(generate_h264(), mimetype="video/mp4", headers={"Cache-Control": "no-cache"})
+
+
+@app.route("/stream/stats")
+def get_stream_stats():
+    return jsonify({
+        "mjpeg": dict(stream_stats, encode_ms=round(stream_stats["encode_ms"]), variants=len(variant_cache)),
+        "h264": dict(h264_stream.stats, fps=H264_FPS, gop=H264_GOP, target_kbps=H264_BITRATE_KBPS),
+    })
+
+
+@app.route("/snapshot.jpg")
+def get_snapshot():
+    try:
+        width, quality = parse_variant_args(request.args)
+    except ValueError:
+        return jsonify({"error": "w and q must be integers"}), 400
+    overlay = wants_overlay(request.args)
+    entry = frame_variant(overlay, width, quality)
+    if entry is None:
+        return jsonify({"error": "no frame yet"}), 503
+    seq, ts, jpeg = entry
+    response = Response(jpeg, mimetype="image/jpeg")
+    response.set_etag(f"{ETAG_EPOCH}-{'ann' if overlay else 'raw'}-{width}-{quality}-{seq}")
+    response.headers["X-Seq"] = str(seq)
+    response.last_modified = ts
+    response.headers["Cache-Control"] = "no-cache"
+    return response.make_conditional(request)
+
+
 @app.route("/detections")
 def get_detections():
-    with lock:
-        data = dict(yolo_detections)
-    return jsonify(data)
+    """Latest detections; ?after_seq=N&wait=ms blocks until a newer publish."""
+    try:
+        after_seq = int(request.args.get("after_seq", -1))
+        wait_s = min(float(request.args.get("wait", 0)), DETECTIONS_MAX_WAIT_MS) / 1000
+    except ValueError:
+        return jsonify({"error": "after_seq and wait must be numbers"}), 400
+    with detections_cond:
+        if after_seq >= 0 and wait_s > 0:
+            # != rather than > so a client holding a seq from before a restart returns at once
+            detections_cond.wait_for(lambda: detections_seq != after_seq, timeout=wait_s)
+        seq, body = detections_seq, detections_body
+    response = Response(body, mimetype="application/json")
+    response.set_etag(f"{ETAG_EPOCH}-{seq}")
+    response.headers["Cache-Control"] = "no-cache"
+    return response.make_conditional(request)
 
 
 @app.route("/results")
@@ -464,6 +1790,89 @@ def get_results_deep():
     return jsonify([format_result(r) for r in data])
 
 
+@app.route("/history")
+def get_history():
+    now = time.time()
+    try:
+        until = float(request.args.get("until", now))
+        since = float(request.args.get("since", until - 3600))
+        step = float(request.args.get("step", 0)) or max(1.0, (until - since) / HISTORY_MAX_POINTS)
+    except ValueError:
+        return jsonify({"error": "since, until and step are unix seconds"}), 400
+    label = request.args.get("label", "").strip().lower() or None
+    if label and not re.fullmatch(r"[a-z0-9 _-]+", label):
+        return jsonify({"error": "invalid label"}), 400
+    try:
+        series, events, vlm = query_history(since, until, step, label)
+    except sqlite3.Error as e:
+        return jsonify({"error": f"history unavailable: {e}"}), 503
+    return jsonify({
+        "source": "spark",
+        "since": since,
+        "until": until,
+        "step": step,
+        "label": label,
+        "series": series,
+        "events": events,
+        "vlm": vlm,
+        "writer": dict(history_stats, queued=history_queue.qsize()),
+    })
+
+
+@app.route("/clips")
+def list_clips():
+    now = time.time()
+    try:
+        until = float(request.args.get("until", now))
+        since = float(request.args.get("since", until - 24 * 3600))
+    except ValueError:
+        return jsonify({"error": "since and until are unix seconds"}), 400
+    label = request.args.get("label", "").strip().lower()
+    sql = "SELECT id, ts, labels, start, end, frames, bytes FROM clips WHERE ts >= ? AND ts < ?"
+    args = [since, until]
+    if label:
+        sql += " AND instr(',' || labels || ',', ?) > 0"
+        args.append(f",{label},")
+    try:
+        db = sqlite3.connect(f"file:{HISTORY_DB}?mode=ro", uri=True, timeout=2)
+        try:
+            rows = db.execute(sql + " ORDER BY ts DESC LIMIT 200", args).fetchall()
+        finally:
+            db.close()
+    except sqlite3.Error as e:
+        return jsonify({"error": f"clips unavailable: {e}"}), 503
+    with clip_lock:
+        stats = dict(clip_stats, recording=len(clip_active), queued=clip_jobs.qsize())
+    return jsonify({
+        "source": "spark",
+        "clips": [
+            {"id": clip_id, "timestamp": ts, "labels": labels.split(","), "start": start, "end": end,
+             "duration_s": round(end - start, 1), "frames": frames, "bytes": size, "url": f"/clips/{clip_id}"}
+            for clip_id, ts, labels, start, end, frames, size in rows
+        ],
+        "recorder": stats,
+    })
+
+
+@app.route("/clips/<clip_id>")
+def get_clip(clip_id):
+    if not re.fullmatch(r"[0-9a-f]{12}", clip_id):
+        return jsonify({"error": "not found"}), 404
+    try:
+        db = sqlite3.connect(f"file:{HISTORY_DB}?mode=ro", uri=True, timeout=2)
+        try:
+            row = db.execute("SELECT path FROM clips WHERE id = ?", (clip_id,)).fetchone()
+        finally:
+            db.close()
+    except sqlite3.Error:
+        row = None
+    path = os.path.join(CLIP_DIR, row[0]) if row else None
+    if path is None or not os.path.exists(path):
+        return jsonify({"error": "not found"}), 404
+    # conditional=True answers Range requests with 206 partial content
+    return send_file(path, conditional=True)
+
+
 @app.route("/health")
 def health():
     with lock:
@@ -479,10 +1888,20 @@ def health():
         "fast_results": n_fast,
         "deep_results": n_deep,
         "yolo_fps": yolo_fps,
+        "capture": camera_snapshot(),
+        "detector": detector_stats,
+        "tiling": tile_snapshot(),
+        "cascade": cascade_snapshot(),
+        "history": dict(history_stats, queued=history_queue.qsize()),
+        "stream": dict(stream_stats, encode_ms=round(stream_stats["encode_ms"]), variants=len(variant_cache)),
     })
 
 
 if __name__ == "__main__":
+    threading.Thread(target=history_writer_loop, daemon=True).start()
+    if CLIP_RECORD:
+        threading.Thread(target=recorder_loop, daemon=True).start()
+        threading.Thread(target=clip_writer_loop, daemon=True).start()
     threading.Thread(target=camera_loop, daemon=True).start()
     threading.Thread(target=yolo_detection_loop, daemon=True).start()
     threading.Thread(target=jetson_snapshot_fetcher, daemon=True).start()
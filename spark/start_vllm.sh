@@ -84,6 +84,7 @@ launch_nemotron() {
     --enable-auto-tool-choice \
     --tool-call-parser qwen3_coder \
     --kv-cache-dtype fp8 \
+    --enable-prompt-tokens-details \
     --max-num-seqs 4
 }
 